@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.database import requests_collection
+from app.geo_feeds import EPOCH, OPEN_STATUSES
+from app.rollups import RESOLVED_STATUSES, drop_rollups, naive_utc, sla_threshold_hours
+
+logger = logging.getLogger(__name__)
+
+# Seconds between incremental refreshes; 0 disables the engine.
+ANALYTICS_ENGINE_REFRESH_SECONDS = float(os.getenv("ANALYTICS_ENGINE_REFRESH_SECONDS", "10"))
+# Seconds between full reloads; a refresh also reloads once it sees a delete
+# made by another worker.
+ANALYTICS_ENGINE_RELOAD_SECONDS = float(os.getenv("ANALYTICS_ENGINE_RELOAD_SECONDS", "3600"))
+# updated_at is stamped before the write lands, and by other workers' clocks,
+# so each refresh re-reads this far behind where the previous one started.
+ANALYTICS_ENGINE_OVERLAP_SECONDS = float(os.getenv("ANALYTICS_ENGINE_OVERLAP_SECONDS", "5"))
+ANALYTICS_ENGINE_BATCH_SIZE = 10000
+
+ENGINE_PROJECTION = {
+    "status": 1,
+    "category": 1,
+    "priority": 1,
+    "location.zone_id": 1,
+    "timestamps.created_at": 1,
+    "timestamps.resolved_at": 1,
+    "assignment.assigned_agent_id": 1,
+    "sla_policy.breach_threshold_hours": 1,
+}
+CATEGORICAL = ("status", "category", "zone", "priority", "agent")
+TIMESTAMPS = ("created_ms", "resolved_ms")
+HOUR_MS = 3_600_000
+
+Change = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def _ms(dt: datetime) -> float:
+    """Epoch milliseconds, keeping sub-millisecond precision for range bounds."""
+    return (naive_utc(dt) - EPOCH) / timedelta(milliseconds=1)
+
+
+def _timestamp(value: Any) -> Optional[datetime]:
+    return naive_utc(value) if isinstance(value, datetime) else None
+
+
+class RequestTable:
+    """Analytics fields of every request, one NumPy array per field.
+
+    Categorical fields are dictionary-encoded to int32 codes, with code 0
+    standing for a missing value; timestamps are epoch milliseconds and the
+    SLA threshold is hours as sla_threshold_hours gives it, NaN where that is
+    None. Rows are never moved: a deleted request only clears its `live`
+    flag until the next full load.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.rows: Dict[Any, int] = {}
+        self.values: Dict[str, List[Any]] = {name: [None] for name in CATEGORICAL}
+        self.codes: Dict[str, Dict[Any, int]] = {name: {None: 0} for name in CATEGORICAL}
+        self.columns: Dict[str, np.ndarray] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        old = self.columns
+        self.columns = {
+            **{name: np.zeros(capacity, dtype="int32") for name in CATEGORICAL},
+            **{name: np.full(capacity, np.nan) for name in (*TIMESTAMPS, "sla_hours")},
+            "live": np.zeros(capacity, dtype=bool),
+        }
+        for name, column in old.items():
+            self.columns[name][:len(column)] = column
+
+    def code(self, field: str, value: Any) -> int:
+        codes = self.codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[field])
+            self.values[field].append(value)
+        return code
+
+    def upsert(self, docs: List[Dict[str, Any]]):
+        """Insert or overwrite the rows of `docs` (projected on ENGINE_PROJECTION)."""
+        if not docs:
+            return
+        rows = []
+        for doc in docs:
+            row = self.rows.get(doc["_id"])
+            if row is None:
+                row = self.rows[doc["_id"]] = self.size
+                self.size += 1
+            rows.append(row)
+        if self.size > len(self.columns["live"]):
+            self._allocate(max(self.size, 2 * len(self.columns["live"])))
+
+        fields: Dict[str, List[Any]] = {name: [] for name in (*CATEGORICAL, *TIMESTAMPS, "sla_hours")}
+        for doc in docs:
+            timestamps = doc.get("timestamps") or {}
+            agent = (doc.get("assignment") or {}).get("assigned_agent_id")
+            threshold = (doc.get("sla_policy") or {}).get("breach_threshold_hours")
+            fields["status"].append(self.code("status", doc.get("status")))
+            fields["category"].append(self.code("category", doc.get("category")))
+            fields["zone"].append(self.code("zone", (doc.get("location") or {}).get("zone_id")))
+            fields["priority"].append(self.code("priority", doc.get("priority")))
+            fields["agent"].append(self.code("agent", None if agent is None else str(agent)))
+            fields["created_ms"].append(_timestamp(timestamps.get("created_at")))
+            fields["resolved_ms"].append(_timestamp(timestamps.get("resolved_at")))
+            fields["sla_hours"].append(sla_threshold_hours(threshold))
+
+        index = np.array(rows, dtype="int64")
+        for name in CATEGORICAL:
+            self.columns[name][index] = fields[name]
+        for name in TIMESTAMPS:
+            # datetime -> datetime64 happens in C; missing times become NaT.
+            stamps = np.array(fields[name], dtype="datetime64[ms]")
+            millis = stamps.astype("int64").astype("float64")
+            millis[np.isnat(stamps)] = np.nan
+            self.columns[name][index] = millis
+        self.columns["sla_hours"][index] = np.array(fields["sla_hours"], dtype="float64")
+        self.columns["live"][index] = True
+
+    def delete(self, request_id: Any):
+        row = self.rows.get(request_id)
+        if row is not None:
+            self.columns["live"][row] = False
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name][:self.size]
+
+    def live_count(self) -> int:
+        return int(self.column("live").sum())
+
+    def codes_of(self, field: str, values: Iterable[Any]) -> List[int]:
+        return [self.codes[field][value] for value in values if value in self.codes[field]]
+
+
+class AnalyticsEngine:
+    """In-process columnar snapshot of service_requests for /analytics.
+
+    Loaded in full at startup and every ANALYTICS_ENGINE_RELOAD_SECONDS, and
+    refreshed in between from requests whose `timestamps.updated_at` moved.
+    This worker's own writes are applied immediately. Queries are NumPy
+    masks and bincount group-bys over the table and never touch Mongo.
+
+    /analytics is answered by, in order: this engine once loaded; rollup
+    buckets, only while the engine is disabled (they are neither kept nor
+    read while it runs); the aggregation pipelines. The last two go through
+    the router's ResultCache.
+    """
+
+    def __init__(self):
+        self._table = RequestTable()
+        self._since: Optional[datetime] = None
+        self.loaded_at: Optional[datetime] = None
+        self.refreshed_at: Optional[datetime] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded_at is not None
+
+    async def _read(self, table: RequestTable, query: Dict[str, Any]) -> int:
+        cursor = requests_collection.find(query, ENGINE_PROJECTION, batch_size=ANALYTICS_ENGINE_BATCH_SIZE)
+        count = 0
+        while True:
+            docs = await cursor.to_list(ANALYTICS_ENGINE_BATCH_SIZE)
+            if not docs:
+                return count
+            table.upsert(docs)
+            count += len(docs)
+
+    async def load(self):
+        """Build a new table from every request and swap it in."""
+        started = datetime.utcnow()
+        table = RequestTable()
+        await self._read(table, {})
+        self._table = table
+        self._since = started
+        self.loaded_at = self.refreshed_at = started
+
+    async def refresh(self) -> int:
+        """Re-read requests updated since the previous load or refresh began.
+
+        Requests deleted by other workers leave nothing to re-read. Every
+        insert is picked up here, so a table with more live rows than the
+        collection has documents has missed a delete, and is reloaded.
+        """
+        started = datetime.utcnow()
+        since = self._since - timedelta(seconds=ANALYTICS_ENGINE_OVERLAP_SECONDS)
+        count = await self._read(self._table, {"timestamps.updated_at": {"$gte": since}})
+        self._since = started
+        self.refreshed_at = started
+        # Read from collection metadata, so this costs no scan per refresh.
+        if await requests_collection.estimated_document_count() < self._table.live_count():
+            await self.load()
+        return count
+
+    async def run_refresh_loop(self, interval: float = ANALYTICS_ENGINE_REFRESH_SECONDS):
+        while True:
+            try:
+                if not self.ready:
+                    # Rollups are not kept while the engine runs (see main.py).
+                    await drop_rollups()
+                    await self.load()
+                elif datetime.utcnow() - self.loaded_at >= timedelta(seconds=ANALYTICS_ENGINE_RELOAD_SECONDS):
+                    await self.load()
+                else:
+                    await self.refresh()
+            except Exception:
+                logger.exception("Analytics engine refresh failed")
+            await asyncio.sleep(interval)
+
+    def apply_changes(self, changes: Iterable[Change]):
+        """Patch in this worker's writes; `after` is None for a delete."""
+        if not self.ready:
+            return
+        for before, after in changes:
+            if after is not None:
+                self._table.upsert([after])
+            elif before is not None:
+                self._table.delete(before["_id"])
+
+    def _mask(
+        self,
+        category: Optional[str] = None,
+        zone: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> np.ndarray:
+        """Live rows matching the same filters as the analytics $match."""
+        table = self._table
+        mask = table.column("live").copy()
+        for field, value in (("category", category), ("zone", zone)):
+            if value:
+                code = table.codes[field].get(value)
+                mask &= table.column(field) == code if code is not None else False
+        created = table.column("created_ms")
+        if start:
+            mask &= created >= _ms(start)
+        if end:
+            mask &= created <= _ms(end)
+        return mask
+
+    def _group(self, field: str, mask: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """Per-code count (or sum of `weights`) of `field` over masked rows."""
+        table = self._table
+        return np.bincount(
+            table.column(field)[mask],
+            weights=None if weights is None else weights[mask],
+            minlength=len(table.values[field]),
+        )
+
+    def kpis(self, *filters) -> Dict[str, Any]:
+        table = self._table
+        mask = self._mask(*filters)
+        status = table.column("status")
+        counts = self._group("status", mask)
+
+        hours = (table.column("resolved_ms") - table.column("created_ms")) / HOUR_MS
+        timed = mask & ~np.isnan(hours)
+        resolved = timed & np.isin(status, table.codes_of("status", RESOLVED_STATUSES))
+        # A missing threshold compares as null, below any number: a breach.
+        # Non-numeric ones sort above numbers and are stored as inf: never.
+        breached = timed & ~(hours <= table.column("sla_hours"))
+        total = int(mask.sum())
+        return {
+            "backlog": {table.values["status"][code]: int(counts[code]) for code in np.flatnonzero(counts)},
+            "avg_resolution_hours": float(hours[resolved].mean()) if resolved.any() else None,
+            "sla_breach_rate": int(breached.sum()) / total if total else None,
+        }
+
+    def cohorts(self, *filters) -> Dict[str, Any]:
+        table = self._table
+        mask = self._mask(*filters)
+        resolved = np.isin(table.column("status"), table.codes_of("status", RESOLVED_STATUSES))
+
+        created = table.column("created_ms")[mask]
+        is_resolved = resolved[mask]
+        dated = ~np.isnan(created)
+        time_series = []
+        if not dated.all():
+            # $year of a missing created_at is null, which sorts first.
+            time_series.append({
+                "year": None, "month": None,
+                "count": int((~dated).sum()), "resolved": int(is_resolved[~dated].sum()),
+            })
+        if dated.any():
+            months = created[dated].astype("int64").astype("datetime64[ms]").astype("datetime64[M]").astype("int64")
+            first = int(months.min())
+            counts = np.bincount(months - first)
+            resolved_counts = np.bincount(months - first, weights=is_resolved[dated])
+            for offset in np.flatnonzero(counts):
+                year, month = divmod(first + int(offset), 12)
+                time_series.append({
+                    "year": 1970 + year, "month": month + 1,
+                    "count": int(counts[offset]), "resolved": int(resolved_counts[offset]),
+                })
+
+        zones = self._group("zone", mask)
+        top = [code for code in np.argsort(-zones, kind="stable")[:10] if zones[code]]
+        hotspots = [{"zone_id": table.values["zone"][code], "count": int(zones[code])} for code in top]
+        return {"time_series": time_series, "hotspots": hotspots}
+
+    def agents(self, *filters) -> List[Dict[str, Any]]:
+        """Per assigned agent: agent_id, open and resolved counts, most open first."""
+        table = self._table
+        mask = self._mask(*filters) & (table.column("agent") != 0)
+        status = table.column("status")
+        is_open = np.isin(status, table.codes_of("status", OPEN_STATUSES)).astype("float64")
+        is_resolved = np.isin(status, table.codes_of("status", RESOLVED_STATUSES)).astype("float64")
+        counts = self._group("agent", mask)
+        open_counts = self._group("agent", mask, is_open)
+        resolved_counts = self._group("agent", mask, is_resolved)
+        order = [code for code in np.argsort(-open_counts, kind="stable") if counts[code]]
+        return [
+            {
+                "agent_id": table.values["agent"][code],
+                "open": int(open_counts[code]),
+                "resolved": int(resolved_counts[code]),
+            }
+            for code in order
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        table = self._table
+        return {
+            "ready": self.ready,
+            "rows": table.size,
+            "live_rows": table.live_count(),
+            "loaded_at": self.loaded_at,
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+analytics_engine = AnalyticsEngine()
@@ -1,13 +1,43 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 import os
 from dotenv import load_dotenv
+from app.pool_metrics import PoolStatsListener
 
 load_dotenv()
 
+
+def _int_env(name: str, default=None):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "cst_db")
 
-client = MongoClient(MONGO_URI)
+# Connection pool and timeout settings, tunable per deployment. Unset values
+# fall back to the driver defaults.
+POOL_SETTINGS = {
+    "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE", 100),
+    "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE", 0),
+    "maxIdleTimeMS": _int_env("MONGO_MAX_IDLE_TIME_MS"),
+    "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000),
+    "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS", 20000),
+    "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS"),
+}
+
+# Server-side budget for analytics aggregations, passed as maxTimeMS.
+ANALYTICS_MAX_TIME_MS = _int_env("ANALYTICS_MAX_TIME_MS", 15000)
+
+pool_stats = PoolStatsListener()
+
+# The API talks to Mongo through PyMongo's native asyncio client so that
+# no handler blocks the event loop while waiting on the server.
+client = AsyncMongoClient(
+    MONGO_URI,
+    event_listeners=[pool_stats],
+    **{key: value for key, value in POOL_SETTINGS.items() if value is not None},
+)
 db = client[DATABASE_NAME]
 
 requests_collection = db["service_requests"]
@@ -15,43 +45,18 @@ categories_collection = db["categories"]
 users_collection = db["users"]
 citizens_collection = db["citizens"]
 performance_logs_collection = db["performance_logs"]
+performance_log_events_collection = db["performance_log_events"]
+performance_log_dead_letters_collection = db["performance_log_dead_letters"]
 geo_feeds_collection = db["geo_feeds"]
 comments_collection = db["comments"]
 ratings_collection = db["ratings"]
 service_agents_collection = db["service_agents"]
+evidence_blobs_collection = db["evidence_blobs"]
+analytics_rollups_collection = db["analytics_rollups"]
 
-requests_collection.create_index([("location", "2dsphere")])
-requests_collection.create_index("status")
-requests_collection.create_index("category")
-requests_collection.create_index("request_id")
-requests_collection.create_index("timestamps.created_at")
-
-categories_collection.create_index("name")
-categories_collection.create_index("active")
-
-users_collection.create_index("email", unique=True)
-users_collection.create_index("username", unique=True)
-users_collection.create_index("role")
-
-performance_logs_collection.create_index("request_id")
-performance_logs_collection.create_index("event_stream.at")
-
-citizens_collection.create_index("email", unique=True, sparse=True)
-citizens_collection.create_index("phone")
-citizens_collection.create_index("city")
-citizens_collection.create_index("verification_state")
-
-geo_feeds_collection.create_index("generated_at")
-
-comments_collection.create_index("request_id")
-comments_collection.create_index("author_id")
-comments_collection.create_index("parent_comment_id")
-comments_collection.create_index("created_at")
 
-ratings_collection.create_index("request_id", unique=True)
-ratings_collection.create_index("citizen_id")
-ratings_collection.create_index("created_at")
+def get_sync_database():
+    """Blocking database handle for command-line scripts (seeding, setup checks)."""
+    settings = {key: value for key, value in POOL_SETTINGS.items() if value is not None}
+    return MongoClient(MONGO_URI, **settings)[DATABASE_NAME]
 
-service_agents_collection.create_index("name")
-service_agents_collection.create_index("skills")
-service_agents_collection.create_index("coverage_zones")
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Set
+
+from PIL import Image, ImageOps
+
+from app.database import evidence_blobs_collection, requests_collection
+from app.evidence import UPLOAD_DIR, UPLOAD_URL_PREFIX, blob_url
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels per derivative; images are never upscaled.
+DERIVATIVE_SIZES = {"thumb": 320, "medium": 1280}
+IMAGE_DERIVATIVE_FORMAT = os.getenv("IMAGE_DERIVATIVE_FORMAT", "webp").lower()
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".gif", ".webp")
+_FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+
+
+def is_image_blob(blob: Dict[str, Any]) -> bool:
+    return os.path.splitext(blob["path"])[1] in IMAGE_EXTENSIONS
+
+
+def derivative_path(blob_path: str, name: str, ext: str) -> str:
+    """Derivatives sit next to the original: ab/cd/<sha256>.<name><ext>."""
+    return f"{os.path.splitext(blob_path)[0]}.{name}{ext}"
+
+
+def render_derivatives(blob_path: str, fmt: str = IMAGE_DERIVATIVE_FORMAT,
+                       quality: int = IMAGE_DERIVATIVE_QUALITY) -> Dict[str, Dict[str, Any]]:
+    """Write resized copies of one stored image; runs in a worker process.
+
+    EXIF orientation is applied to the pixels and then all metadata is
+    dropped, so derivatives carry no camera or location data.
+    """
+    pil_format, ext = _FORMATS[fmt]
+    source = os.path.join(UPLOAD_DIR, blob_path)
+    results = {}
+    with Image.open(source) as original:
+        original.seek(0)
+        image = ImageOps.exif_transpose(original)
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        mode = "RGBA" if has_alpha and pil_format != "JPEG" else "RGB"
+        if image.mode != mode:
+            image = image.convert(mode)
+        for name, edge in DERIVATIVE_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            relative_path = derivative_path(blob_path, name, ext)
+            destination = os.path.join(UPLOAD_DIR, relative_path)
+            temp = f"{destination}.tmp-{os.getpid()}"
+            resized.save(temp, pil_format, quality=quality)
+            os.replace(temp, destination)
+            results[name] = {
+                "path": relative_path,
+                "width": resized.width,
+                "height": resized.height,
+                "size": os.path.getsize(destination),
+            }
+    return results
+
+
+def derivative_urls(blob: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    derivatives = blob.get("derivatives")
+    if not derivatives:
+        return None
+    return {name: UPLOAD_URL_PREFIX + info["path"] for name, info in derivatives.items()}
+
+
+class DerivativePipeline:
+    """Generates evidence image derivatives in a process pool.
+
+    submit() returns immediately; the resize runs in a worker process and,
+    when done, the blob and every evidence entry pointing at it gain the
+    derivative URLs. Jobs are keyed by content hash so concurrent uploads of
+    the same image share one job.
+    """
+
+    def __init__(self, workers: int = IMAGE_WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, asyncio.Task] = {}
+        # Every background task, held until it finishes so it is not
+        # garbage-collected mid-flight and its failure gets logged.
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        if self._pool is None:
+            # Spawned workers: forking a process that runs Mongo client
+            # threads and an event loop is not safe.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, blob: Dict[str, Any]):
+        if self._pool is None or not is_image_blob(blob):
+            return
+        sha256 = blob["_id"]
+        job = self._jobs.get(sha256)
+        if job is not None:
+            # Entries added while the job runs are linked once it finishes.
+            job.add_done_callback(lambda done: done.cancelled() or self._spawn(self._relink(sha256)))
+            return
+        job = self._spawn(self._run(blob))
+        self._jobs[sha256] = job
+        job.add_done_callback(lambda _: self._jobs.pop(sha256, None))
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Derivative task failed", exc_info=task.exception())
+
+    async def _run(self, blob: Dict[str, Any]):
+        loop = asyncio.get_running_loop()
+        try:
+            derivatives = await loop.run_in_executor(self._pool, render_derivatives, blob["path"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Derivatives for blob %s failed", blob["_id"])
+            return
+        await evidence_blobs_collection.update_one({"_id": blob["_id"]}, {"$set": {"derivatives": derivatives}})
+        await self._link(blob, derivative_urls({"derivatives": derivatives}))
+
+    async def _relink(self, sha256: str):
+        blob = await evidence_blobs_collection.find_one({"_id": sha256})
+        if blob and blob.get("derivatives"):
+            await self._link(blob, derivative_urls(blob))
+
+    async def _link(self, blob: Dict[str, Any], urls: Dict[str, str]):
+        url = blob_url(blob)
+        await requests_collection.update_many(
+            {"evidence.url": url},
+            {"$set": {"evidence.$[e].derivatives": urls}},
+            array_filters=[{"e.url": url}],
+        )
+
+
+def backfill_derivatives(db, workers: int = IMAGE_WORKERS) -> int:
+    """Render missing derivatives for stored images; returns how many blobs.
+
+    Takes a blocking database handle.
+    """
+    blobs = [blob for blob in db["evidence_blobs"].find({"derivatives": None}) if is_image_blob(blob)]
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {blob["_id"]: pool.submit(render_derivatives, blob["path"]) for blob in blobs}
+        for blob in blobs:
+            try:
+                derivatives = futures[blob["_id"]].result()
+            except Exception:
+                logger.exception("Derivatives for blob %s failed", blob["_id"])
+                continue
+            db["evidence_blobs"].update_one({"_id": blob["_id"]}, {"$set": {"derivatives": derivatives}})
+            url = blob_url(blob)
+            db["service_requests"].update_many(
+                {"evidence.url": url},
+                {"$set": {"evidence.$[e].derivatives": derivative_urls({"derivatives": derivatives})}},
+                array_filters=[{"e.url": url}],
+            )
+            done += 1
+    return done
+
+
+derivative_pipeline = DerivativePipeline()
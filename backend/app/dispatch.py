@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.database import requests_collection, service_agents_collection
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_REFRESH_SECONDS = int(os.getenv("DISPATCH_REFRESH_SECONDS", "60"))
+
+AGENT_PROJECTION = {"name": 1, "skills": 1, "coverage_zones": 1, "active": 1, "open_workload": 1}
+
+# Requests in these states count towards an agent's open workload.
+OPEN_WORKLOAD_STATUSES = ("assigned", "in_progress")
+
+
+async def fill_missing_workloads(agents: List[Dict[str, Any]]):
+    """Count open tickets for agents stored before open_workload existed.
+
+    `python manage.py migrate` writes the counter; until then it is counted
+    here so those agents do not look idle.
+    """
+    missing = [agent for agent in agents if "open_workload" not in agent]
+    if not missing:
+        return
+    agent_ids = [str(agent["_id"]) for agent in missing]
+    pipeline = [
+        {"$match": {
+            "status": {"$in": list(OPEN_WORKLOAD_STATUSES)},
+            "assignment.assigned_agent_id": {"$in": agent_ids + [agent["_id"] for agent in missing]},
+        }},
+        {"$group": {"_id": "$assignment.assigned_agent_id", "count": {"$sum": 1}}},
+    ]
+    counts: Dict[str, int] = defaultdict(int)
+    cursor = await requests_collection.aggregate(pipeline)
+    for doc in await cursor.to_list(None):
+        counts[str(doc["_id"])] += doc["count"]
+    for agent in missing:
+        agent["open_workload"] = counts[str(agent["_id"])]
+
+
+class DispatchIndex:
+    """In-process inverted index from (skill, zone) to active agents.
+
+    Holds each active agent's skills, zones and open workload so auto-assignment
+    can pick an agent without querying service_agents. It is rebuilt in the
+    background every DISPATCH_REFRESH_SECONDS (picking up writes made by other
+    workers) and patched immediately by this worker's agent and workload writes.
+    """
+
+    def __init__(self):
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._by_skill_zone: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._by_skill: Dict[str, Set[str]] = defaultdict(set)
+        self.loaded_at: Optional[datetime] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded_at is not None
+
+    async def load(self):
+        agents = await service_agents_collection.find({"active": True}, AGENT_PROJECTION).to_list(None)
+        await fill_missing_workloads(agents)
+        self._agents.clear()
+        self._by_skill_zone.clear()
+        self._by_skill.clear()
+        for agent in agents:
+            self.add(agent)
+        self.loaded_at = datetime.utcnow()
+
+    async def refresh_agent(self, agent_id: str):
+        """Re-read one agent after it was created, updated or deleted."""
+        agent = await service_agents_collection.find_one({"_id": ObjectId(agent_id)}, AGENT_PROJECTION)
+        # The same rule as load's {"active": True} filter: no flag, no dispatch.
+        if agent and agent.get("active") is True:
+            await fill_missing_workloads([agent])
+            self.add(agent)
+        else:
+            self.remove(agent_id)
+
+    def add(self, agent: Dict[str, Any]):
+        agent_id = str(agent["_id"])
+        self.remove(agent_id)
+        self._agents[agent_id] = {
+            "_id": agent["_id"],
+            "name": agent.get("name"),
+            "skills": list(agent.get("skills") or []),
+            "coverage_zones": list(agent.get("coverage_zones") or []),
+            "open_workload": agent.get("open_workload", 0),
+        }
+        for skill in self._agents[agent_id]["skills"]:
+            self._by_skill[skill].add(agent_id)
+            for zone in self._agents[agent_id]["coverage_zones"]:
+                self._by_skill_zone[(skill, zone)].add(agent_id)
+
+    def remove(self, agent_id: str):
+        agent = self._agents.pop(agent_id, None)
+        if not agent:
+            return
+        for skill in agent["skills"]:
+            self._by_skill[skill].discard(agent_id)
+            for zone in agent["coverage_zones"]:
+                self._by_skill_zone[(skill, zone)].discard(agent_id)
+
+    def adjust_workload(self, agent_id: str, delta: int):
+        agent = self._agents.get(agent_id)
+        if agent:
+            agent["open_workload"] = agent.get("open_workload", 0) + delta
+
+    def best_agent(self, zone_id: str, skill_needed: str) -> Optional[Dict[str, Any]]:
+        """Least-loaded agent with the skill in the zone, else anywhere."""
+        candidates = self._by_skill_zone.get((skill_needed, zone_id)) or self._by_skill.get(skill_needed)
+        if not candidates:
+            return None
+        agent_id = min(candidates, key=lambda a: (self._agents[a]["open_workload"], a))
+        return dict(self._agents[agent_id])
+
+    def plan_assignments(self, wants: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """best_agent for each (zone_id, skill) in order, as if each pick were
+        already counted against the agent. The index itself is not changed.
+        """
+        planned: Dict[str, int] = defaultdict(int)
+        picks = []
+        for zone_id, skill_needed in wants:
+            candidates = self._by_skill_zone.get((skill_needed, zone_id)) or self._by_skill.get(skill_needed)
+            if not candidates:
+                picks.append(None)
+                continue
+            agent_id = min(candidates, key=lambda a: (self._agents[a]["open_workload"] + planned[a], a))
+            planned[agent_id] += 1
+            picks.append(self._agents[agent_id])
+        return picks
+
+    async def run_refresh_loop(self, interval: int = DISPATCH_REFRESH_SECONDS):
+        while True:
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Dispatch index refresh failed")
+            await asyncio.sleep(interval)
+
+
+dispatch_index = DispatchIndex()
@@ -0,0 +1,212 @@
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.database import performance_log_events_collection, performance_logs_collection
+
+# Lifecycle events are stored in bucket documents in performance_log_events,
+# one UTC day per bucket. Each request-day has one open bucket (full: false)
+# that new events are appended to; it is closed once it holds
+# EVENTS_PER_BUCKET events, so no bucket holds 2x that or more. The matching
+# performance_logs document is a small summary head (counts, first/last event)
+# that never grows with the history.
+EVENTS_PER_BUCKET = int(os.getenv("EVENTS_PER_BUCKET", "100"))
+BUCKET_WRITE_ATTEMPTS = 3
+DUPLICATE_KEY = 11000
+
+
+def _bucket_day(at: datetime) -> datetime:
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def event_write_ops(items: List[Tuple[ObjectId, Dict[str, Any]]]) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+    """Bucket upserts and head upserts that record a batch of events.
+
+    Events for the same request and day are pushed together, at most
+    EVENTS_PER_BUCKET at a time, and each request's head gets a single
+    update. The bucket ops must run in order.
+    """
+    grouped: Dict[Tuple[ObjectId, datetime], List[Dict[str, Any]]] = defaultdict(list)
+    heads: Dict[ObjectId, Dict[str, Any]] = {}
+    for request_id, event in items:
+        at = event["at"]
+        grouped[(request_id, _bucket_day(at))].append(event)
+        head = heads.setdefault(request_id, {"count": 0, "first": at, "last": at, "type": None})
+        head["count"] += 1
+        head["first"] = min(head["first"], at)
+        if at >= head["last"]:
+            head["last"], head["type"] = at, event.get("type")
+
+    bucket_ops = []
+    for (request_id, day), events in grouped.items():
+        for start in range(0, len(events), EVENTS_PER_BUCKET):
+            chunk = events[start:start + EVENTS_PER_BUCKET]
+            # Always append to the day's one open bucket, then close it once
+            # it holds EVENTS_PER_BUCKET or more; the next chunk opens a new one.
+            # A unique partial index keeps a second open bucket from appearing.
+            open_bucket = {"request_id": request_id, "day": day, "full": False}
+            bucket_ops.append(UpdateOne(
+                open_bucket,
+                {
+                    "$push": {"events": {"$each": chunk}},
+                    "$inc": {"count": len(chunk)},
+                    "$min": {"first_at": min(e["at"] for e in chunk)},
+                    "$max": {"last_at": max(e["at"] for e in chunk)},
+                },
+                upsert=True,
+            ))
+            bucket_ops.append(UpdateOne(
+                {**open_bucket, "count": {"$gte": EVENTS_PER_BUCKET}},
+                {"$set": {"full": True}},
+            ))
+
+    head_ops = [
+        UpdateOne(
+            {"request_id": request_id},
+            {
+                "$inc": {"event_count": head["count"]},
+                "$min": {"first_event_at": head["first"]},
+                "$max": {"last_event_at": head["last"]},
+                "$set": {"last_event_type": head["type"]},
+                "$setOnInsert": {"created_at": head["first"]},
+            },
+            upsert=True,
+        )
+        for request_id, head in heads.items()
+    ]
+    return bucket_ops, head_ops
+
+
+async def _write_buckets(bucket_ops: List[UpdateOne], session=None):
+    """Apply bucket ops in order, retrying where another writer opened the bucket first.
+
+    Two writers upserting into a day with no open bucket both try to insert
+    one; the unique index rejects the second, whose retry then matches the
+    bucket the first one created.
+    """
+    for _ in range(BUCKET_WRITE_ATTEMPTS - 1):
+        try:
+            await performance_log_events_collection.bulk_write(bucket_ops, session=session)
+            return
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors") or []
+            if session is not None or not errors or errors[0].get("code") != DUPLICATE_KEY:
+                raise
+            bucket_ops = bucket_ops[errors[0]["index"]:]
+    await performance_log_events_collection.bulk_write(bucket_ops, session=session)
+
+
+async def write_events(items: List[Tuple[ObjectId, Dict[str, Any]]], session=None):
+    bucket_ops, head_ops = event_write_ops(items)
+    if session is not None:
+        # Operations inside one transaction must not run concurrently.
+        await _write_buckets(bucket_ops, session=session)
+        await performance_logs_collection.bulk_write(head_ops, session=session)
+        return
+    await asyncio.gather(
+        _write_buckets(bucket_ops),
+        performance_logs_collection.bulk_write(head_ops, ordered=False),
+    )
+
+
+async def record_event(request_id: ObjectId, event: Dict[str, Any], session=None):
+    await write_events([(request_id, event)], session=session)
+
+
+# Position of one stored event: (at, bucket id, index in the bucket).
+EventKey = Tuple[datetime, ObjectId, int]
+
+
+async def read_events(
+    request_id: ObjectId,
+    limit: int,
+    before: Optional[EventKey] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[EventKey]]:
+    """Page through a request's events newest first, ordered by event time.
+
+    `before` is the key of the oldest event already returned. Buckets are
+    streamed newest `last_at` first. Their time ranges can overlap when events
+    arrive late, so an event is only emitted once no unread bucket can hold a
+    newer one; a page touches only the buckets it needs. Returns the page and
+    the key to continue from (None at the end).
+    """
+    query: Dict[str, Any] = {"request_id": request_id}
+    if before:
+        query["first_at"] = {"$lte": before[0]}
+    cursor = performance_log_events_collection.find(
+        query, {"events": 1, "last_at": 1}, batch_size=4
+    ).sort([("last_at", -1), ("_id", -1)])
+
+    page: List[Tuple[EventKey, Dict[str, Any]]] = []
+    # Events read but not yet safe to emit, oldest first.
+    pool: List[Tuple[EventKey, Dict[str, Any]]] = []
+    more = False
+    try:
+        async for bucket in cursor:
+            # Unread buckets hold nothing newer than this bucket's last_at.
+            while pool and len(page) < limit and pool[-1][0][0] > bucket["last_at"]:
+                page.append(pool.pop())
+            if len(page) == limit:
+                more = True
+                break
+            for index, event in enumerate(bucket.get("events") or []):
+                key = (event["at"], bucket["_id"], index)
+                if before is None or key < before:
+                    pool.append((key, event))
+            pool.sort(key=lambda item: item[0])
+    finally:
+        await cursor.close()
+    while pool and len(page) < limit:
+        page.append(pool.pop())
+    more = more or bool(pool)
+    return [event for _, event in page], page[-1][0] if more and page else None
+
+
+def split_legacy_event_streams(db) -> int:
+    """Move events embedded in old performance_logs documents into buckets.
+
+    Takes a blocking database handle; returns how many heads were converted.
+    """
+    converted = 0
+    for log in db["performance_logs"].find({"event_stream.0": {"$exists": True}}):
+        events = sorted(log.get("event_stream") or [], key=lambda e: e.get("at") or datetime.min)
+        buckets: List[Dict[str, Any]] = []
+        for event in events:
+            at = event.get("at") or log.get("created_at") or datetime.utcnow()
+            event["at"] = at
+            current = buckets[-1] if buckets else None
+            if not current or current["day"] != _bucket_day(at) or current["count"] >= EVENTS_PER_BUCKET:
+                current = {
+                    "request_id": log["request_id"],
+                    "day": _bucket_day(at),
+                    "count": 0,
+                    "full": True,
+                    "first_at": at,
+                    "events": [],
+                }
+                buckets.append(current)
+            current["events"].append(event)
+            current["count"] += 1
+            current["last_at"] = at
+        if buckets:
+            db["performance_log_events"].insert_many(buckets)
+        db["performance_logs"].update_one(
+            {"_id": log["_id"]},
+            {
+                "$set": {
+                    "event_count": len(events),
+                    "first_event_at": events[0]["at"] if events else None,
+                    "last_event_at": events[-1]["at"] if events else None,
+                    "last_event_type": events[-1].get("type") if events else None,
+                },
+                "$unset": {"event_stream": ""},
+            },
+        )
+        converted += 1
+    return converted
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.database import performance_log_dead_letters_collection
+from app.event_log import record_event, write_events
+
+logger = logging.getLogger(__name__)
+
+EVENT_SINK_BATCH_SIZE = int(os.getenv("EVENT_SINK_BATCH_SIZE", "500"))
+EVENT_SINK_FLUSH_INTERVAL_MS = int(os.getenv("EVENT_SINK_FLUSH_INTERVAL_MS", "1000"))
+EVENT_SINK_MAX_QUEUE = int(os.getenv("EVENT_SINK_MAX_QUEUE", "10000"))
+EVENT_SINK_FLUSH_ATTEMPTS = int(os.getenv("EVENT_SINK_FLUSH_ATTEMPTS", "5"))
+
+_STOP = object()
+
+
+class EventSink:
+    """Write-behind queue for performance-log events.
+
+    Handlers enqueue events and return; a background task flushes them with
+    bulk upserts once EVENT_SINK_BATCH_SIZE events are waiting or
+    EVENT_SINK_FLUSH_INTERVAL_MS has passed. A failed flush is retried with
+    backoff (at-least-once: a retried batch may be applied twice), up to
+    EVENT_SINK_FLUSH_ATTEMPTS times; after that the batch is counted as lost
+    and its events are stored in performance_log_dead_letters where possible,
+    so one unwritable batch cannot stall the sink. The queue is bounded, so a
+    stalled database pushes back on emitters instead of growing memory.
+    stop() drains and flushes the queue.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = EVENT_SINK_BATCH_SIZE,
+        flush_interval_ms: int = EVENT_SINK_FLUSH_INTERVAL_MS,
+        max_queue: int = EVENT_SINK_MAX_QUEUE,
+        flush_attempts: int = EVENT_SINK_FLUSH_ATTEMPTS,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.flush_attempts = flush_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.lost = 0
+        self.dead_lettered = 0
+        self.last_flush_ms: Optional[float] = None
+        self.last_batch_size = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def emit(self, request_id: ObjectId, event: Dict[str, Any]):
+        if not self.running:
+            # No background writer (scripts, tests): write through.
+            await record_event(request_id, event)
+            return
+        await self._queue.put((request_id, event))
+        self.enqueued += 1
+
+    async def emit_many(self, items: List[Tuple[ObjectId, Dict[str, Any]]]):
+        """Enqueue `items` as one queue entry, so a bulk call waits for one slot."""
+        if not items:
+            return
+        if not self.running:
+            await write_events(items)
+            return
+        await self._queue.put(list(items))
+        self.enqueued += len(items)
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = item if isinstance(item, list) else [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                if isinstance(item, list):
+                    batch.extend(item)
+                else:
+                    batch.append(item)
+            await self._flush_all(batch, final=stopping)
+
+        # Anything still queued behind the stop marker.
+        leftovers = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if isinstance(item, list):
+                leftovers.extend(item)
+            elif item is not _STOP:
+                leftovers.append(item)
+        await self._flush_all(leftovers, final=True)
+
+    async def _flush_all(self, events: List[Tuple[ObjectId, Dict[str, Any]]], final: bool = False):
+        for start in range(0, len(events), self.batch_size):
+            await self._flush(events[start:start + self.batch_size], final=final)
+
+    async def _flush(self, batch: List[Tuple[ObjectId, Dict[str, Any]]], final: bool = False):
+        delay = 0.1
+        # Shutdown should not wait out a long backoff.
+        attempts = min(self.flush_attempts, 3) if final else self.flush_attempts
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            try:
+                await write_events(batch)
+            except Exception as e:
+                self.flush_failures += 1
+                logger.exception("Event sink flush of %d events failed", len(batch))
+                if attempt == attempts:
+                    await self._dead_letter(batch, e)
+                    return
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+            self.flushes += 1
+            self.written += len(batch)
+            self.last_batch_size = len(batch)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+            return
+
+    async def _dead_letter(self, batch: List[Tuple[ObjectId, Dict[str, Any]]], error: Exception):
+        """Give up on `batch`, keeping what can be kept for a manual replay."""
+        self.lost += len(batch)
+        failed_at = datetime.utcnow()
+        docs = [
+            {"request_id": request_id, "event": event, "error": repr(error), "failed_at": failed_at}
+            for request_id, event in batch
+        ]
+        try:
+            await performance_log_dead_letters_collection.insert_many(docs, ordered=False)
+            self.dead_lettered += len(docs)
+        except BulkWriteError as e:
+            # Documents that cannot be stored at all (too large, say) are skipped.
+            self.dead_lettered += e.details.get("nInserted", 0)
+        except Exception:
+            logger.exception("Could not dead-letter %d events", len(batch))
+        logger.error("Dropped %d events from the event log after repeated flush failures", len(batch))
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "lost": self.lost,
+            "dead_lettered": self.dead_lettered,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+event_sink = EventSink()
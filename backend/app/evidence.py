@@ -0,0 +1,358 @@
+import asyncio
+import gzip
+import hashlib
+import re
+import shutil
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from fastapi import UploadFile
+from pymongo import ReturnDocument, UpdateOne
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.database import evidence_blobs_collection
+
+UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
+UPLOAD_URL_PREFIX = "/uploads/"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# Unreferenced blobs and stray files younger than this are left alone by the
+# collector, so uploads whose evidence entry is still being written survive.
+EVIDENCE_GC_GRACE_SECONDS = int(os.getenv("EVIDENCE_GC_GRACE_SECONDS", "3600"))
+
+ALLOWED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".pdf")
+# Formats that are not already compressed get a .gz sibling for serving.
+PRECOMPRESS_EXTENSIONS = (".pdf",)
+TEMP_PREFIX = ".upload-"
+UPLOAD_ROUTE = re.compile(r"^/requests/[^/]+/evidence/upload/?$")
+# Room in a multipart body for boundaries, part headers and the small form fields.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """Stop oversized evidence uploads while the body is still arriving.
+
+    Starlette reads and spools the whole multipart body before the handler
+    runs, so stream_to_temp's limit alone would only fire once every byte had
+    been received and written to disk. On the upload route this answers 413
+    straight away when Content-Length is over MAX_UPLOAD_BYTES plus multipart
+    overhead, and otherwise (chunked bodies, lying clients) counts body bytes
+    as they are received and stops reading once they pass that limit.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not UPLOAD_ROUTE.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        limit = self.max_bytes + MULTIPART_OVERHEAD_BYTES
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            # Whatever the app makes of the aborted body is replaced by the 413.
+            if exceeded and not started:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            pass
+        if exceeded and not started:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse({"detail": f"File exceeds {self.max_bytes} bytes"}, status_code=413)
+        await response(scope, receive, send)
+
+
+def safe_extension(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".jpeg":
+        ext = ".jpg"
+    return ext if ext in ALLOWED_EXTENSIONS else ""
+
+
+def blob_path(sha256: str, ext: str) -> str:
+    """Path of a blob relative to UPLOAD_DIR, sharded as ab/cd/<sha256><ext>."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def blob_url(blob: Dict[str, Any]) -> str:
+    return UPLOAD_URL_PREFIX + blob["path"]
+
+
+def _open_temp():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, prefix=TEMP_PREFIX, delete=False)
+
+
+def _write_chunk(handle, hasher, chunk: bytes):
+    hasher.update(chunk)
+    handle.write(chunk)
+
+
+def _close(handle):
+    handle.flush()
+    os.fsync(handle.fileno())
+    handle.close()
+
+
+def _remove(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _move_into_place(temp_path: str, relative_path: str):
+    destination = os.path.join(UPLOAD_DIR, relative_path)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    os.replace(temp_path, destination)
+
+
+def _precompress(relative_path: str) -> bool:
+    """Write <file>.gz next to a stored blob if that saves at least 10%."""
+    source = os.path.join(UPLOAD_DIR, relative_path)
+    temp = f"{source}.gz.tmp"
+    with open(source, "rb") as src, gzip.open(temp, "wb", compresslevel=9) as dst:
+        shutil.copyfileobj(src, dst, UPLOAD_CHUNK_BYTES)
+    if os.path.getsize(temp) > os.path.getsize(source) * 0.9:
+        os.unlink(temp)
+        return False
+    os.replace(temp, f"{source}.gz")
+    return True
+
+
+async def stream_to_temp(file: UploadFile, max_bytes: Optional[int] = None) -> Tuple[str, str, int]:
+    """Copy an upload to a temp file in UPLOAD_DIR; returns (path, sha256 hex, size).
+
+    The body is read in UPLOAD_CHUNK_BYTES pieces and hashed as it goes, with
+    file I/O on worker threads. Going over max_bytes aborts the copy with
+    UploadTooLarge and removes the partial file.
+
+    `file` is Starlette's already-received upload (spooled to disk past 1 MB),
+    so this is a second copy, and the limit here is the exact per-file check;
+    UploadLimitMiddleware is what bounds bandwidth and spool space.
+    """
+    if max_bytes is None:
+        max_bytes = MAX_UPLOAD_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge()
+    hasher = hashlib.sha256()
+    size = 0
+    handle = await asyncio.to_thread(_open_temp)
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge()
+            await asyncio.to_thread(_write_chunk, handle, hasher, chunk)
+        await asyncio.to_thread(_close, handle)
+    except BaseException:
+        handle.close()
+        await asyncio.to_thread(_remove, handle.name)
+        raise
+    return handle.name, hasher.hexdigest(), size
+
+
+async def reference_blob(sha256: str) -> Optional[Dict[str, Any]]:
+    """Count one more reference to an existing blob; None if it is unknown."""
+    return await evidence_blobs_collection.find_one_and_update(
+        {"_id": sha256},
+        {"$inc": {"ref_count": 1}, "$set": {"last_referenced_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def store_upload(file: UploadFile, content_type: Optional[str] = None) -> Dict[str, Any]:
+    """Store an upload in the content-addressed tree and take a reference to it.
+
+    Identical content is kept once: if a blob with the same SHA-256 exists the
+    temp copy is dropped and the existing blob gains a reference. Returns the
+    blob document.
+    """
+    temp_path, sha256, size = await stream_to_temp(file)
+    try:
+        blob = await reference_blob(sha256)
+        if blob:
+            return blob
+
+        ext = safe_extension(file.filename)
+        relative_path = blob_path(sha256, ext)
+        await asyncio.to_thread(_move_into_place, temp_path, relative_path)
+        if ext in PRECOMPRESS_EXTENSIONS:
+            await asyncio.to_thread(_precompress, relative_path)
+        now = datetime.utcnow()
+        blob = await evidence_blobs_collection.find_one_and_update(
+            {"_id": sha256},
+            {
+                "$inc": {"ref_count": 1},
+                "$set": {"last_referenced_at": now},
+                "$setOnInsert": {
+                    "path": relative_path,
+                    "size": size,
+                    "content_type": content_type,
+                    "created_at": now,
+                },
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if blob["path"] != relative_path:
+            # A concurrent upload of the same bytes under another extension won.
+            await asyncio.to_thread(_remove, os.path.join(UPLOAD_DIR, relative_path))
+            await asyncio.to_thread(_remove, os.path.join(UPLOAD_DIR, relative_path) + ".gz")
+        return blob
+    finally:
+        await asyncio.to_thread(_remove, temp_path)
+
+
+async def release_blobs(evidence: Iterable[Dict[str, Any]]):
+    """Drop the references held by removed evidence entries."""
+    counts: Dict[str, int] = {}
+    for item in evidence or []:
+        sha256 = item.get("sha256")
+        if sha256 and (item.get("url") or "").startswith(UPLOAD_URL_PREFIX):
+            counts[sha256] = counts.get(sha256, 0) + 1
+    if counts:
+        await evidence_blobs_collection.bulk_write(
+            [UpdateOne({"_id": sha}, {"$inc": {"ref_count": -n}}) for sha, n in counts.items()],
+            ordered=False,
+        )
+
+
+def _idle_since(cutoff: datetime) -> Dict[str, Any]:
+    """Blobs not referenced after `cutoff` (by creation time for older blobs)."""
+    return {"$or": [
+        {"last_referenced_at": {"$lte": cutoff}},
+        {"last_referenced_at": None, "created_at": {"$lte": cutoff}},
+        {"last_referenced_at": None, "created_at": None},
+    ]}
+
+
+def collect_garbage(db, grace_seconds: int = EVIDENCE_GC_GRACE_SECONDS, dry_run: bool = False) -> Dict[str, int]:
+    """Recount blob references and delete what nothing points to.
+
+    Takes a blocking database handle. Reference counts are rebuilt from the
+    evidence URLs stored on requests, so drift from crashes or deleted
+    requests is corrected. Blobs with no references, and files under
+    UPLOAD_DIR that are neither a live blob nor referenced by URL (legacy
+    uploads, abandoned temp files), are removed once older than grace_seconds.
+
+    The recount is a snapshot, so it decides nothing on its own: blobs
+    referenced since it began are skipped, and a blob is only deleted by a
+    filter on its live ref_count and last_referenced_at, which every new
+    reference bumps in the same update.
+    """
+    started = datetime.utcnow()
+    referenced: Dict[str, int] = {}
+    pipeline = [
+        {"$match": {"evidence.url": {"$regex": f"^{UPLOAD_URL_PREFIX}"}}},
+        {"$unwind": "$evidence"},
+        {"$group": {"_id": "$evidence.url", "count": {"$sum": 1}}},
+    ]
+    for doc in db["service_requests"].aggregate(pipeline):
+        if doc["_id"]:
+            referenced[doc["_id"]] = doc["count"]
+
+    cutoff = started - timedelta(seconds=grace_seconds)
+    stats = {"blobs_recounted": 0, "blobs_deleted": 0, "files_deleted": 0, "bytes_freed": 0}
+    live_paths = set()
+    for blob in db["evidence_blobs"].find({}):
+        refs = referenced.get(blob_url(blob), 0)
+        paths = [
+            blob["path"], blob["path"] + ".gz",
+            *(d["path"] for d in (blob.get("derivatives") or {}).values()),
+        ]
+        live_paths.update(paths)
+        last_referenced = blob.get("last_referenced_at") or blob.get("created_at")
+        if last_referenced and last_referenced >= started:
+            # Referenced after the recount began, which may have missed it.
+            continue
+        if blob.get("ref_count") != refs:
+            stats["blobs_recounted"] += 1
+            if not dry_run:
+                db["evidence_blobs"].update_one(
+                    {
+                        "_id": blob["_id"],
+                        "ref_count": blob.get("ref_count"),
+                        "last_referenced_at": blob.get("last_referenced_at"),
+                    },
+                    {"$set": {"ref_count": refs}},
+                )
+        if refs or (last_referenced and last_referenced > cutoff):
+            continue
+        if dry_run:
+            deleted = True
+        else:
+            result = db["evidence_blobs"].delete_one(
+                {"_id": blob["_id"], "ref_count": {"$lte": 0}, **_idle_since(cutoff)}
+            )
+            deleted = bool(result.deleted_count)
+            if deleted:
+                for path in paths:
+                    _remove(os.path.join(UPLOAD_DIR, path))
+                live_paths.difference_update(paths)
+        if deleted:
+            stats["blobs_deleted"] += 1
+            stats["bytes_freed"] += blob.get("size") or 0
+
+    oldest_allowed = time.time() - grace_seconds
+    for root, _, files in os.walk(UPLOAD_DIR, topdown=False):
+        for name in files:
+            if name.startswith(".") and not name.startswith(TEMP_PREFIX):
+                continue
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, UPLOAD_DIR).replace(os.sep, "/")
+            if relative_path in live_paths or UPLOAD_URL_PREFIX + relative_path in referenced:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > oldest_allowed:
+                continue
+            stats["files_deleted"] += 1
+            stats["bytes_freed"] += stat.st_size
+            if not dry_run:
+                _remove(path)
+        if root != UPLOAD_DIR and not dry_run:
+            try:
+                os.rmdir(root)  # only succeeds for emptied shard directories
+            except OSError:
+                pass
+    return stats
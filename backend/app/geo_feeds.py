@@ -0,0 +1,349 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta
+from json.encoder import encode_basestring
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+
+from app.database import ANALYTICS_MAX_TIME_MS, geo_feeds_collection, requests_collection
+
+logger = logging.getLogger(__name__)
+
+HEATMAP_FEED_NAME = "open_requests_heatmap"
+HEATMAP_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("HEATMAP_SNAPSHOT_INTERVAL_SECONDS", "300"))
+HEATMAP_SNAPSHOT_RETENTION_DAYS = int(os.getenv("HEATMAP_SNAPSHOT_RETENTION_DAYS", "7"))
+# Every Nth stored snapshot is a full copy; the ones between are deltas.
+HEATMAP_SNAPSHOT_KEYFRAME_EVERY = int(os.getenv("HEATMAP_SNAPSHOT_KEYFRAME_EVERY", "24"))
+
+OPEN_STATUSES = ["new", "triaged", "assigned", "in_progress"]
+PRIORITY_WEIGHTS = {"P0": 4.0, "P1": 3.0, "P2": 2.0, "P3": 1.0}
+FEED_PROJECTION = {"location": 1, "priority": 1, "timestamps.created_at": 1, "category": 1, "status": 1}
+HEATMAP_BATCH_SIZE = int(os.getenv("HEATMAP_BATCH_SIZE", "10000"))
+EPOCH = datetime(1970, 1, 1)
+
+_PRIORITY_CODES = {name: code for code, name in enumerate(PRIORITY_WEIGHTS)}
+# Weight per priority code; the extra last slot is for unknown priorities.
+_PRIORITY_WEIGHT_TABLE = np.array([*PRIORITY_WEIGHTS.values(), 1.0])
+_UNKNOWN_PRIORITY = len(PRIORITY_WEIGHTS)
+_FEATURE = (
+    '{"type":"Feature","properties":{"request_id":%s,"category":%s,"priority":%s,"status":%s,'
+    '"weight":%r,"age_hours":%r},"geometry":{"type":"Point","coordinates":[%r,%r]}}'
+)
+
+# One open request as [request_id, lng, lat, priority, category, status,
+# created_at in epoch ms or None]. Weights are derived at render time, so a
+# feed only changes when the requests in it do.
+Record = List[Any]
+
+
+def _epoch_ms(dt: datetime) -> int:
+    return round((dt - EPOCH).total_seconds() * 1000)
+
+
+class FeedColumns(NamedTuple):
+    """The heatmap feed column-wise, one entry per request.
+
+    The columns weights are computed from are NumPy arrays, so that happens
+    in one pass; created_ms is NaN where the request has no creation time.
+    Coordinates are only copied to the output, so they stay Python lists
+    holding the stored numbers, ints included.
+    """
+
+    ids: List[str]
+    lng: List[float]
+    lat: List[float]
+    priority: List[str]
+    priority_code: np.ndarray
+    category: List[Optional[str]]
+    status: List[Optional[str]]
+    created_ms: np.ndarray
+
+    @classmethod
+    def from_docs(cls, docs: List[Dict[str, Any]]) -> "FeedColumns":
+        ids, lng, lat, priority, category, status, created = [], [], [], [], [], [], []
+        for doc in docs:
+            coords = (doc.get("location") or {}).get("coordinates")
+            if not coords or len(coords) != 2:
+                continue
+            ids.append(str(doc["_id"]))
+            lng.append(coords[0])
+            lat.append(coords[1])
+            priority.append((doc.get("priority") or "P3").upper())
+            category.append(doc.get("category"))
+            status.append(doc.get("status"))
+            created.append((doc.get("timestamps") or {}).get("created_at"))
+        # datetime -> datetime64 happens in C; missing times become NaT.
+        created_at = np.array(created, dtype="datetime64[ms]")
+        created_ms = created_at.astype("int64").astype("float64")
+        created_ms[np.isnat(created_at)] = np.nan
+        return cls._build(ids, lng, lat, priority, category, status, created_ms)
+
+    @classmethod
+    def from_records(cls, records: List[Record]) -> "FeedColumns":
+        columns = list(zip(*records)) or [()] * 7
+        ids, lng, lat, priority, category, status, created = columns
+        created_ms = np.array([np.nan if value is None else value for value in created], dtype="float64")
+        return cls._build(list(ids), list(lng), list(lat), list(priority), list(category), list(status), created_ms)
+
+    @classmethod
+    def _build(cls, ids, lng, lat, priority, category, status, created_ms) -> "FeedColumns":
+        codes = np.array([_PRIORITY_CODES.get(name, _UNKNOWN_PRIORITY) for name in priority], dtype="int8")
+        return cls(ids, lng, lat, priority, codes, category, status, created_ms)
+
+    @classmethod
+    def concat(cls, parts: List["FeedColumns"]) -> "FeedColumns":
+        if not parts:
+            return cls.from_records([])
+        if len(parts) == 1:
+            return parts[0]
+        return cls(*(
+            np.concatenate(column) if isinstance(column[0], np.ndarray) else [v for part in column for v in part]
+            for column in zip(*parts)
+        ))
+
+    def to_records(self) -> List[Record]:
+        created = [None if value != value else int(value) for value in self.created_ms.tolist()]
+        return [list(row) for row in zip(
+            self.ids, self.lng, self.lat, self.priority, self.category, self.status, created
+        )]
+
+
+async def load_feed(match: Dict[str, Any], batch_size: int = HEATMAP_BATCH_SIZE) -> FeedColumns:
+    """Matching requests as FeedColumns, read from the cursor batch by batch."""
+    cursor = requests_collection.find(match, FEED_PROJECTION, batch_size=batch_size).max_time_ms(ANALYTICS_MAX_TIME_MS)
+    parts = []
+    while True:
+        docs = await cursor.to_list(batch_size)
+        if not docs:
+            break
+        parts.append(FeedColumns.from_docs(docs))
+    return FeedColumns.concat(parts)
+
+
+async def feed_records(match: Dict[str, Any]) -> List[Record]:
+    records = (await load_feed(match)).to_records()
+    # Ordered by request id so equal feeds hash equally.
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def feed_weights(feed: FeedColumns, now: datetime):
+    """(weight, age_hours) arrays: priority weight * (1 + sqrt(age in hours))."""
+    age_hours = (_epoch_ms(now) - feed.created_ms) / 3_600_000
+    age_hours = np.where(np.isnan(age_hours), 0.0, np.maximum(age_hours, 0.0))
+    weight = _PRIORITY_WEIGHT_TABLE[feed.priority_code] * (1 + np.sqrt(age_hours))
+    return weight, age_hours
+
+
+def _json_tokens(values: List[Any]) -> List[str]:
+    """json.dumps of each value, encoding each distinct value once."""
+    cache: Dict[Any, str] = {}
+    return [
+        cache[value] if value in cache else cache.setdefault(value, json.dumps(value, ensure_ascii=False))
+        for value in values
+    ]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def render_feed(feed: FeedColumns, now: datetime, extra: Optional[Dict[str, Any]] = None) -> bytes:
+    """The heatmap FeatureCollection as JSON bytes, weighted as of `now`.
+
+    Features are formatted straight from the columns. `extra` adds
+    top-level members next to `features`. The bytes are those FastAPI's
+    JSONResponse produced for the per-request dicts this replaced: compact,
+    not ASCII-escaped, coordinates as stored, Python's round() for weight and
+    age, and an integer 0 age for requests without a past creation time.
+    """
+    weight, age_hours = feed_weights(feed, now)
+    unaged = ~(feed.created_ms <= _epoch_ms(now))
+    features = [
+        _FEATURE % row
+        for row in zip(
+            map(encode_basestring, feed.ids),
+            _json_tokens(feed.category),
+            _json_tokens(feed.priority),
+            _json_tokens(feed.status),
+            [round(value, 3) for value in weight.tolist()],
+            [0 if none else round(value, 2) for value, none in zip(age_hours.tolist(), unaged.tolist())],
+            feed.lng,
+            feed.lat,
+        )
+    ]
+    body = '{"type":"FeatureCollection","features":[' + ",".join(features) + "]"
+    if extra:
+        body += "," + json.dumps(extra, default=_json_default, ensure_ascii=False, separators=(",", ":"))[1:-1]
+    return (body + "}").encode()
+
+
+def _pack(value: Any) -> Binary:
+    return Binary(zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6))
+
+
+def _unpack(payload: bytes) -> Any:
+    return json.loads(zlib.decompress(payload))
+
+
+def content_hash(records: List[Record]) -> str:
+    return hashlib.sha256(json.dumps(records, separators=(",", ":")).encode()).hexdigest()
+
+
+def snapshot_delta(previous: Dict[str, Record], current: Dict[str, Record]) -> Dict[str, Any]:
+    """Records added or changed, and request ids removed, from `previous` to `current`."""
+    return {
+        "upsert": [record for key, record in current.items() if previous.get(key) != record],
+        "remove": [key for key in previous if key not in current],
+    }
+
+
+def apply_delta(records: Dict[str, Record], change: Dict[str, Any]) -> Dict[str, Record]:
+    """Apply a snapshot_delta to `records` in place; returns them."""
+    for key in change["remove"]:
+        records.pop(key, None)
+    for record in change["upsert"]:
+        records[record[0]] = record
+    return records
+
+
+class HeatmapSnapshots:
+    """Periodic, change-only snapshots of the open-requests heatmap feed.
+
+    Each run loads the feed and stores it only when its content hash differs
+    from the newest snapshot. The newest snapshot then gets a fresh
+    `checked_at`. Snapshots are zlib-compressed. Every
+    HEATMAP_SNAPSHOT_KEYFRAME_EVERY-th one holds the whole feed, and the rest
+    hold only the records added, changed or removed since the one before.
+    The `seq` index is unique, so two API processes running the job cannot
+    fork the chain: the loser reloads and tries again next run.
+    """
+
+    def __init__(self, feed_name: str = HEATMAP_FEED_NAME):
+        self.feed_name = feed_name
+        # (seq, records keyed by request_id) of the newest snapshot.
+        self._state: Optional[Tuple[int, Dict[str, Record]]] = None
+        # (seq, FeedColumns) of the snapshot last served.
+        self._columns: Optional[Tuple[int, FeedColumns]] = None
+
+    async def run_snapshot_loop(self, interval: int = HEATMAP_SNAPSHOT_INTERVAL_SECONDS):
+        while True:
+            try:
+                await self.take()
+                await self.prune()
+            except Exception:
+                logger.exception("Heatmap snapshot failed")
+            await asyncio.sleep(interval)
+
+    async def _head(self) -> Optional[Dict[str, Any]]:
+        return await geo_feeds_collection.find_one(
+            {"feed_name": self.feed_name, "seq": {"$exists": True}}, sort=[("seq", -1)]
+        )
+
+    async def take(self, now: Optional[datetime] = None) -> Optional[int]:
+        """Store a snapshot if the feed changed; returns its seq, else None."""
+        now = now or datetime.utcnow()
+        records = await feed_records({"status": {"$in": OPEN_STATUSES}})
+        digest = content_hash(records)
+        head = await self._head()
+        if head is not None and head["content_hash"] == digest:
+            await geo_feeds_collection.update_one({"_id": head["_id"]}, {"$set": {"checked_at": now}})
+            return None
+
+        seq = head["seq"] + 1 if head else 0
+        current = {record[0]: record for record in records}
+        doc = {
+            "feed_name": self.feed_name,
+            "seq": seq,
+            "content_hash": digest,
+            "feature_count": len(records),
+            "generated_at": now,
+            "checked_at": now,
+            "created_at": now,
+        }
+        previous = None
+        if head is not None and seq % HEATMAP_SNAPSHOT_KEYFRAME_EVERY:
+            try:
+                previous = await self._records_at(head)
+            except LookupError:
+                logger.warning("Heatmap snapshot %s has no keyframe; starting a new one", head["seq"])
+        if previous is None:
+            doc.update(kind="full", payload=_pack(records))
+        else:
+            doc.update(kind="delta", payload=_pack(snapshot_delta(previous, current)))
+        try:
+            await geo_feeds_collection.insert_one(doc)
+        except DuplicateKeyError:
+            self._state = None
+            return None
+        self._state = (seq, current)
+        return seq
+
+    async def _records_at(self, head: Dict[str, Any]) -> Dict[str, Record]:
+        """Records of snapshot `head`: its keyframe with the deltas after it applied."""
+        if self._state is not None and self._state[0] == head["seq"]:
+            return self._state[1]
+        keyframe = await geo_feeds_collection.find_one(
+            {"feed_name": self.feed_name, "kind": "full", "seq": {"$lte": head["seq"]}}, sort=[("seq", -1)]
+        )
+        if keyframe is None:
+            raise LookupError(f"No keyframe for heatmap snapshot {head['seq']}")
+        records = {record[0]: record for record in _unpack(keyframe["payload"])}
+        deltas = geo_feeds_collection.find(
+            {"feed_name": self.feed_name, "seq": {"$gt": keyframe["seq"], "$lte": head["seq"]}},
+            sort=[("seq", 1)],
+        )
+        async for delta in deltas:
+            apply_delta(records, _unpack(delta["payload"]))
+        self._state = (head["seq"], records)
+        return records
+
+    async def latest(self, now: Optional[datetime] = None, max_age: Optional[timedelta] = None) -> Optional[bytes]:
+        """Newest snapshot as heatmap GeoJSON bytes, weighted as of `now`.
+
+        None when there is no snapshot, or when `max_age` is given and the
+        feed has not been checked against it within that time.
+        """
+        now = now or datetime.utcnow()
+        head = await self._head()
+        if head is None:
+            return None
+        if max_age is not None and head.get("checked_at", head["generated_at"]) < now - max_age:
+            return None
+        if self._columns is None or self._columns[0] != head["seq"]:
+            records = await self._records_at(head)
+            self._columns = (head["seq"], FeedColumns.from_records(sorted(records.values(), key=lambda r: r[0])))
+        snapshot = {"seq": head["seq"], "generated_at": head["generated_at"], "checked_at": head.get("checked_at")}
+        return render_feed(self._columns[1], now, {"snapshot": snapshot})
+
+    async def prune(self, retention_days: int = HEATMAP_SNAPSHOT_RETENTION_DAYS) -> int:
+        """Drop snapshots older than the retention window; returns how many.
+
+        Deltas need their keyframe, so the cut is made at the newest keyframe
+        generated before the cutoff: everything after it stays readable.
+        Legacy full-GeoJSON documents are dropped by age alone.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        query: Dict[str, Any] = {"feed_name": self.feed_name, "seq": {"$exists": False}, "generated_at": {"$lt": cutoff}}
+        keyframe = await geo_feeds_collection.find_one(
+            {"feed_name": self.feed_name, "kind": "full", "generated_at": {"$lt": cutoff}}, sort=[("seq", -1)]
+        )
+        if keyframe is not None:
+            query = {"feed_name": self.feed_name, "$or": [
+                {"seq": {"$lt": keyframe["seq"]}},
+                {"seq": {"$exists": False}, "generated_at": {"$lt": cutoff}},
+            ]}
+        result = await geo_feeds_collection.delete_many(query)
+        return result.deleted_count
+
+
+heatmap_snapshots = HeatmapSnapshots()
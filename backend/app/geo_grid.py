@@ -0,0 +1,121 @@
+import math
+import os
+from typing import Any, Dict, Optional, Tuple
+
+# On-screen edge of one heatmap cell, in pixels of a 256px web-mercator tile.
+HEATMAP_CELL_PIXELS = int(os.getenv("HEATMAP_CELL_PIXELS", "32"))
+TILE_PIXELS = 256
+SQRT3 = math.sqrt(3)
+
+BBox = Tuple[float, float, float, float]
+
+
+def parse_bbox(value: str) -> BBox:
+    """`min_lng,min_lat,max_lng,max_lat` -> tuple; ValueError when malformed."""
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox needs four numbers")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError("bbox out of range")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_filter(bbox: BBox) -> Dict[str, Any]:
+    """Query clauses matching `location` points inside a lng/lat box.
+
+    The $geoWithin polygon lets the 2dsphere index pick candidates, but its
+    edges are geodesics, which bow away from a parallel. So the top and
+    bottom edges are split into segments of at most 1 degree and the polygon
+    is padded by more than that bow. Plain bounds on the coordinates then
+    trim the candidates to the exact box. Boxes a hemisphere wide or wider
+    have no unambiguous polygon and use the bounds alone.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    query: Dict[str, Any] = {
+        "location.coordinates.0": {"$gte": min_lng, "$lte": max_lng},
+        "location.coordinates.1": {"$gte": min_lat, "$lte": max_lat},
+    }
+    width = max_lng - min_lng
+    if width < 180:
+        steps = max(1, math.ceil(width))
+        pad = max((max_lat - min_lat) * 0.01, 0.002 * (width / steps) ** 2, 1e-7)
+        south, north = max(min_lat - pad, -90), min(max_lat + pad, 90)
+        lngs = [min_lng + width * i / steps for i in range(steps + 1)]
+        ring = [[lng, south] for lng in lngs] + [[lng, north] for lng in reversed(lngs)] + [[min_lng, south]]
+        query["location"] = {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}
+    return query
+
+
+def cell_degrees(zoom: int, cell_pixels: int = HEATMAP_CELL_PIXELS) -> float:
+    """Longitude span of a cell that is `cell_pixels` wide at `zoom`."""
+    return 360.0 / (2 ** zoom) * cell_pixels / TILE_PIXELS
+
+
+def lat_scale(bbox: Optional[BBox]) -> float:
+    """Latitude stretch that keeps cells visually regular on a mercator map.
+
+    Near the viewport's centre one degree of latitude is drawn 1/cos(lat)
+    times as tall as one degree of longitude.
+    """
+    if not bbox:
+        return 1.0
+    center = math.radians((bbox[1] + bbox[3]) / 2)
+    return 1.0 / max(math.cos(center), 0.01)
+
+
+def _round(expr: Any) -> Dict[str, Any]:
+    return {"$floor": {"$add": [expr, 0.5]}}
+
+
+def cell_expression(shape: str, size: float, scale: float, lng: Any, lat: Any) -> Dict[str, Any]:
+    """Aggregation expression mapping a point to its integer cell {x, y}.
+
+    Square cells are `size` wide. Hex cells are pointy-top with circumradius
+    `size`, addressed by axial (q, r) coordinates after cube rounding.
+    """
+    y = {"$multiply": [lat, scale]}
+    if shape == "square":
+        return {"x": {"$floor": {"$divide": [lng, size]}}, "y": {"$floor": {"$divide": [y, size]}}}
+    q = {"$divide": [{"$subtract": [{"$multiply": [lng, SQRT3 / 3]}, {"$divide": [y, 3]}]}, size]}
+    r = {"$divide": [{"$multiply": [y, 2 / 3]}, size]}
+    return {
+        "$let": {
+            "vars": {"q": q, "r": r},
+            "in": {
+                "$let": {
+                    "vars": {
+                        "rq": _round("$$q"),
+                        "rr": _round("$$r"),
+                        "rs": _round({"$subtract": [{"$multiply": ["$$q", -1]}, "$$r"]}),
+                    },
+                    "in": {
+                        "$let": {
+                            "vars": {
+                                "dq": {"$abs": {"$subtract": ["$$rq", "$$q"]}},
+                                "dr": {"$abs": {"$subtract": ["$$rr", "$$r"]}},
+                                "ds": {"$abs": {"$add": ["$$rs", "$$q", "$$r"]}},
+                            },
+                            # Recompute whichever coordinate rounded furthest.
+                            "in": {"$cond": [
+                                {"$and": [{"$gt": ["$$dq", "$$dr"]}, {"$gt": ["$$dq", "$$ds"]}]},
+                                {"x": {"$subtract": [{"$multiply": ["$$rr", -1]}, "$$rs"]}, "y": "$$rr"},
+                                {"$cond": [
+                                    {"$gt": ["$$dr", "$$ds"]},
+                                    {"x": "$$rq", "y": {"$subtract": [{"$multiply": ["$$rq", -1]}, "$$rs"]}},
+                                    {"x": "$$rq", "y": "$$rr"},
+                                ]},
+                            ]},
+                        }
+                    },
+                }
+            },
+        }
+    }
+
+
+def cell_center(shape: str, size: float, scale: float, x: int, y: int) -> Tuple[float, float]:
+    """(lng, lat) at the centre of cell (x, y)."""
+    if shape == "square":
+        return (x + 0.5) * size, (y + 0.5) * size / scale
+    return size * SQRT3 * (x + y / 2), size * 1.5 * y / scale
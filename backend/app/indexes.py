@@ -0,0 +1,149 @@
+from datetime import datetime
+from itertools import combinations
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Bump INDEX_VERSION whenever INDEX_MANIFEST changes; `python manage.py migrate`
+# only rebuilds when the recorded version is older than this one.
+INDEX_VERSION = 8
+
+# Equality filters accepted by GET /requests/ and the keyset sort it pages on.
+REQUEST_LIST_FILTERS = ("status", "category", "location.zone_id", "assignment.assigned_agent_id")
+REQUEST_LIST_SORT = [("timestamps.created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+# Filter combinations the UI sends (the request list by status and/or category,
+# an agent's tickets). Other combinations use one of these and filter the rest.
+REQUEST_LIST_INDEXED_FILTERS = [
+    (),
+    ("status",),
+    ("category",),
+    ("status", "category"),
+    ("assignment.assigned_agent_id",),
+]
+
+
+def _request_list_keys(fields):
+    return [(field, ASCENDING) for field in fields] + REQUEST_LIST_SORT
+
+
+def _request_list_indexes():
+    """A compound index per indexed filter combination, equality fields
+    first, so those pages are an index range scan that starts at the cursor."""
+    return [IndexModel(_request_list_keys(fields)) for fields in REQUEST_LIST_INDEXED_FILTERS]
+
+
+INDEX_MANIFEST = {
+    "service_requests": [
+        IndexModel([("location", "2dsphere")]),
+        IndexModel([("status", ASCENDING)]),
+        IndexModel([("category", ASCENDING)]),
+        IndexModel([("request_id", ASCENDING)]),
+        IndexModel([("timestamps.created_at", ASCENDING)]),
+        # Incremental refreshes of the in-process analytics engine.
+        IndexModel([("timestamps.updated_at", ASCENDING)]),
+        *_request_list_indexes(),
+    ],
+    "categories": [
+        IndexModel([("name", ASCENDING)]),
+        IndexModel([("active", ASCENDING)]),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+        IndexModel([("role", ASCENDING)]),
+    ],
+    "performance_logs": [
+        IndexModel([("request_id", ASCENDING)]),
+        IndexModel([("event_stream.at", ASCENDING)]),
+    ],
+    "performance_log_events": [
+        # At most one open bucket per request and day.
+        IndexModel(
+            [("request_id", ASCENDING), ("day", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"full": False},
+        ),
+        IndexModel([("request_id", ASCENDING), ("last_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "citizens": [
+        IndexModel([("email", ASCENDING)], unique=True, sparse=True),
+        IndexModel([("phone", ASCENDING)]),
+        IndexModel([("city", ASCENDING)]),
+        IndexModel([("verification_state", ASCENDING)]),
+    ],
+    "geo_feeds": [
+        IndexModel([("generated_at", ASCENDING)]),
+        IndexModel(
+            [("feed_name", ASCENDING), ("seq", DESCENDING)],
+            unique=True,
+            partialFilterExpression={"seq": {"$exists": True}},
+        ),
+    ],
+    "comments": [
+        IndexModel([("request_id", ASCENDING)]),
+        IndexModel([("author_id", ASCENDING)]),
+        IndexModel([("parent_comment_id", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)]),
+    ],
+    "ratings": [
+        IndexModel([("request_id", ASCENDING)], unique=True),
+        IndexModel([("citizen_id", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)]),
+    ],
+    "service_agents": [
+        IndexModel([("name", ASCENDING)]),
+        IndexModel([("skills", ASCENDING)]),
+        IndexModel([("coverage_zones", ASCENDING)]),
+    ],
+    "analytics_rollups": [
+        IndexModel(
+            [("granularity", ASCENDING), ("bucket", ASCENDING), ("category", ASCENDING),
+             ("zone_id", ASCENDING), ("status", ASCENDING)],
+            unique=True,
+        ),
+    ],
+}
+
+# Indexes built by earlier manifests and dropped by migrate: manifest v7 had
+# one per combination of REQUEST_LIST_FILTERS, each an extra write per insert.
+RETIRED_INDEXES = {
+    "service_requests": [
+        _request_list_keys(fields)
+        for size in range(len(REQUEST_LIST_FILTERS) + 1)
+        for fields in combinations(REQUEST_LIST_FILTERS, size)
+        if fields not in REQUEST_LIST_INDEXED_FILTERS
+    ],
+}
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+
+def applied_index_version(db) -> int:
+    marker = db[MIGRATIONS_COLLECTION].find_one({"_id": "indexes"})
+    return marker.get("version", 0) if marker else 0
+
+
+def apply_index_manifest(db, force: bool = False) -> bool:
+    """Build every index in the manifest once per INDEX_VERSION.
+
+    Takes a blocking database handle (see get_sync_database). MongoDB 4.2+
+    builds indexes without holding an exclusive lock, so the collections stay
+    readable and writable while this runs. Returns False when the recorded
+    version is already current.
+    """
+    if not force and applied_index_version(db) >= INDEX_VERSION:
+        return False
+
+    for collection_name, indexes in INDEX_MANIFEST.items():
+        db[collection_name].create_indexes(indexes)
+    for collection_name, retired in RETIRED_INDEXES.items():
+        for index in list(db[collection_name].list_indexes()):
+            if list(index["key"].items()) in retired:
+                db[collection_name].drop_index(index["name"])
+
+    db[MIGRATIONS_COLLECTION].update_one(
+        {"_id": "indexes"},
+        {"$set": {"version": INDEX_VERSION, "applied_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    return True
@@ -1,40 +1,101 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from app.routers import requests, categories, users, citizens, performance_logs, agents, analytics
-
-app = FastAPI(
-    title="Citizen Services Tracker API",
-    version="2.0.0",
-    description="API for managing citizen service requests"
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:3001"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Serve uploaded evidence files
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
-
-app.include_router(requests.router, prefix="/requests", tags=["Requests"])
-app.include_router(categories.router, prefix="/categories", tags=["Categories"])
-app.include_router(users.router, prefix="/users", tags=["Users"])
-app.include_router(citizens.router, prefix="/citizens", tags=["Citizens"])
-app.include_router(performance_logs.router, prefix="/performance-logs", tags=["Logs"])
-app.include_router(agents.router, prefix="/agents", tags=["Agents"])
-app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
-
-@app.get("/")
-def root():
-    return {"message": "Citizen Services API"}
-
-@app.get("/health")
-def health():
-    return {"status": "OK"}
+from app.analytics_engine import ANALYTICS_ENGINE_REFRESH_SECONDS, analytics_engine
+from app.database import client, pool_stats, POOL_SETTINGS
+from app.dispatch import dispatch_index
+from app.derivatives import derivative_pipeline
+from app.event_sink import event_sink
+from app.geo_feeds import HEATMAP_SNAPSHOT_INTERVAL_SECONDS, heatmap_snapshots
+from app.rollups import stop_rollup_upkeep
+from app.evidence import UPLOAD_DIR, UploadLimitMiddleware
+from app.static_files import EvidenceStaticFiles
+from app.routers import requests, categories, users, citizens, performance_logs, agents, analytics, tiles
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index DDL is not run here; it is applied once per manifest version by
+    # `python manage.py migrate`. The Mongo client connects lazily, and the
+    # dispatch index is built by its refresh task rather than before serving.
+    background = [asyncio.create_task(dispatch_index.run_refresh_loop())]
+    if HEATMAP_SNAPSHOT_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(heatmap_snapshots.run_snapshot_loop()))
+    if ANALYTICS_ENGINE_REFRESH_SECONDS > 0:
+        # The engine is the one serving path for /analytics while enabled.
+        stop_rollup_upkeep()
+        background.append(asyncio.create_task(analytics_engine.run_refresh_loop()))
+    event_sink.start()
+    derivative_pipeline.start()
+    yield
+    await derivative_pipeline.stop()
+    await event_sink.stop()
+    for task in background:
+        task.cancel()
+    for task in background:
+        with suppress(asyncio.CancelledError):
+            await task
+    await client.close()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title="Citizen Services Tracker API",
+        version="2.0.0",
+        description="API for managing citizen service requests",
+        lifespan=lifespan,
+    )
+
+    # Added before CORS so its 413s still carry CORS headers.
+    app.add_middleware(UploadLimitMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://localhost:3001"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
+    )
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    app.mount("/uploads", EvidenceStaticFiles(directory=UPLOAD_DIR), name="uploads")
+
+    app.include_router(requests.router, prefix="/requests", tags=["Requests"])
+    app.include_router(categories.router, prefix="/categories", tags=["Categories"])
+    app.include_router(users.router, prefix="/users", tags=["Users"])
+    app.include_router(citizens.router, prefix="/citizens", tags=["Citizens"])
+    app.include_router(performance_logs.router, prefix="/performance-logs", tags=["Logs"])
+    app.include_router(agents.router, prefix="/agents", tags=["Agents"])
+    app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+    app.include_router(tiles.router, prefix="/tiles", tags=["Tiles"])
+
+    @app.get("/")
+    def root():
+        return {"message": "Citizen Services API"}
+
+    @app.get("/health")
+    def health():
+        return {"status": "OK"}
+
+    @app.get("/health/pool")
+    def pool_health():
+        return {"settings": POOL_SETTINGS, "stats": pool_stats.snapshot()}
+
+    @app.get("/health/events")
+    def event_sink_health():
+        return event_sink.metrics()
+
+    @app.get("/health/analytics-cache")
+    def analytics_cache_health():
+        return analytics.analytics_cache.stats()
+
+    @app.get("/health/analytics-engine")
+    def analytics_engine_health():
+        return analytics_engine.stats()
+
+    return app
+
+
+app = create_app()
@@ -132,6 +132,8 @@ class Evidence(BaseModel):
     type: str
     url: str
     sha256: Optional[str] = None
+    size: Optional[int] = None
+    derivatives: Optional[Dict[str, str]] = None
     uploaded_by: str = "citizen"
     uploaded_at: Optional[datetime] = None
 
@@ -215,6 +217,10 @@ class PerformanceLog(BaseModel):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
     request_id: PyObjectId
     event_stream: List[LogEvent] = []
+    event_count: Optional[int] = None
+    first_event_at: Optional[datetime] = None
+    last_event_at: Optional[datetime] = None
+    last_event_type: Optional[str] = None
     computed_kpis: Optional[ComputedKPIs] = None
     citizen_feedback: Optional[Dict[str, Any]] = None
     created_at: Optional[datetime] = None
@@ -0,0 +1,104 @@
+import threading
+from collections import deque
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Collects connection-pool counters from PyMongo's CMAP events.
+
+    Checkout wait times come from the driver-reported `duration` of each
+    checkout; the last `window` samples are kept for percentiles.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.pools = 0
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.pool_clears = 0
+        self.max_wait_ms = 0.0
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools = max(self.pools - 1, 0)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(self.open_connections - 1, 0)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+            self._record_wait(event.duration)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self._record_wait(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def _record_wait(self, duration):
+        if duration is None:
+            return
+        wait_ms = duration * 1000
+        self._waits.append(wait_ms)
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            failures = dict(self.checkout_failures)
+            stats = {
+                "pools": self.pools,
+                "open_connections": self.open_connections,
+                "in_use": self.checked_out,
+                "idle": max(self.open_connections - self.checked_out, 0),
+                "checkouts": self.checkouts,
+                "checkout_failures": failures,
+                "pool_clears": self.pool_clears,
+            }
+            max_wait = self.max_wait_ms
+
+        def pct(p):
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))], 3)
+
+        stats["checkout_wait_ms"] = {
+            "samples": len(waits),
+            "p50": pct(50),
+            "p95": pct(95),
+            "p99": pct(99),
+            "max": round(max_wait, 3),
+        }
+        return stats
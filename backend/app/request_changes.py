@@ -0,0 +1,22 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from app.analytics_engine import analytics_engine
+from app.rollups import apply_rollup_changes
+from app.tiles import invalidate_request_tiles
+from app.workload import apply_workload_change
+
+
+async def publish(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Bring derived state in line after a request was written.
+
+    `before`/`after` are the request as it was and as it now is (None for
+    insert/delete). They need the status, assignment, coordinates and the
+    fields in ROLLUP_SOURCE_PROJECTION and ENGINE_PROJECTION.
+    """
+    invalidate_request_tiles([(before, after)])
+    analytics_engine.apply_changes([(before, after)])
+    await asyncio.gather(
+        apply_workload_change(before, after),
+        apply_rollup_changes([(before, after)]),
+    )
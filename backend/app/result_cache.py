@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "30"))
+ANALYTICS_CACHE_STALE_SECONDS = float(os.getenv("ANALYTICS_CACHE_STALE_SECONDS", "300"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "256"))
+
+
+def filter_key(name: str, match: Dict[str, Any]) -> str:
+    """Stable cache key for a query filter: same filters, same key."""
+    def default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+    return f"{name}:{json.dumps(match, sort_keys=True, default=default)}"
+
+
+class ResultCache:
+    """In-process TTL cache with stale-while-revalidate and single flight.
+
+    A fresh entry (younger than `ttl`) is returned as is. A stale one (up to
+    `ttl + stale` old) is returned immediately while one background task
+    recomputes it. Missing entries are computed once no matter how many
+    callers ask at the same time; the rest await the same task.
+    """
+
+    def __init__(
+        self,
+        ttl: float = ANALYTICS_CACHE_TTL_SECONDS,
+        stale: float = ANALYTICS_CACHE_STALE_SECONDS,
+        max_entries: int = ANALYTICS_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale:
+                self.stale_hits += 1
+                self._refresh(key, compute)
+                return value
+        self.misses += 1
+        # Shielded so a disconnecting client does not cancel the shared work.
+        return await asyncio.shield(self._refresh(key, compute))
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches; returns how many."""
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def _refresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = await compute()
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Refreshing cached result %s failed: %r", key, task.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "ttl_seconds": self.ttl,
+            "stale_seconds": self.stale,
+        }
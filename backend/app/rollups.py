@@ -0,0 +1,307 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from numbers import Real
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import Decimal128
+from pymongo import UpdateOne
+
+from app.database import ANALYTICS_MAX_TIME_MS, analytics_rollups_collection, requests_collection
+from app.database import db as async_db
+from app.indexes import INDEX_MANIFEST, MIGRATIONS_COLLECTION
+
+ROLLUP_COLLECTION = "analytics_rollups"
+RESOLVED_STATUSES = ("resolved", "closed")
+ROLLUP_METRICS = ("count", "resolution_count", "resolution_hours", "sla_breached")
+# Request fields a rollup contribution is computed from.
+ROLLUP_SOURCE_PROJECTION = {
+    "category": 1,
+    "status": 1,
+    "location.zone_id": 1,
+    "timestamps.created_at": 1,
+    "timestamps.resolved_at": 1,
+    "sla_policy.breach_threshold_hours": 1,
+}
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+_GROUP_EXPRESSIONS = {
+    "status": "$status",
+    "category": "$category",
+    "zone_id": "$zone_id",
+    "year": {"$year": "$bucket"},
+    "month": {"$month": "$bucket"},
+}
+
+Change = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def naive_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """`dt` as the naive UTC datetime Mongo hands back; aware values are converted."""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def sla_threshold_hours(threshold: Any) -> Optional[float]:
+    """An SLA threshold as the KPI pipeline's $gt compares it, in hours.
+
+    $gt orders by BSON type: a missing, null or NaN threshold sorts below
+    every number, so any resolution time breaches it (None). Strings,
+    booleans, documents and the other non-numeric types sort above numbers
+    and are never breached (inf).
+    """
+    if threshold is None:
+        return None
+    if isinstance(threshold, Decimal128):
+        threshold = threshold.to_decimal()
+    elif isinstance(threshold, bool) or not isinstance(threshold, Real):
+        return float("inf")
+    hours = float(threshold)
+    return None if hours != hours else hours
+
+
+def _floor(dt: datetime, unit: timedelta) -> datetime:
+    if unit == DAY:
+        return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil(dt: datetime, unit: timedelta) -> datetime:
+    floor = _floor(dt, unit)
+    return floor if floor == dt else floor + unit
+
+
+def rollup_contribution(doc: Optional[Dict[str, Any]]):
+    """(dims, created_at, metrics) one request adds to its buckets, or None.
+
+    Mirrors the raw KPI pipelines: resolution time counts for resolved/closed
+    requests, and a resolved request breaches a missing SLA threshold but
+    never a non-numeric one (see sla_threshold_hours).
+    """
+    if not doc:
+        return None
+    timestamps = doc.get("timestamps") or {}
+    created = timestamps.get("created_at")
+    if not isinstance(created, datetime):
+        return None
+    resolved = timestamps.get("resolved_at")
+    status = doc.get("status")
+    metrics = {"count": 1, "resolution_count": 0, "resolution_hours": 0.0, "sla_breached": 0}
+    if isinstance(resolved, datetime):
+        hours = (resolved - created).total_seconds() / 3600
+        if status in RESOLVED_STATUSES:
+            metrics["resolution_count"] = 1
+            metrics["resolution_hours"] = hours
+        threshold = sla_threshold_hours((doc.get("sla_policy") or {}).get("breach_threshold_hours"))
+        if threshold is None or hours > threshold:
+            metrics["sla_breached"] = 1
+    dims = {
+        "category": doc.get("category"),
+        "zone_id": (doc.get("location") or {}).get("zone_id"),
+        "status": status,
+    }
+    return dims, created, metrics
+
+
+def _accumulate(changes: Iterable[Change]) -> Dict[tuple, Dict[str, float]]:
+    deltas: Dict[tuple, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(ROLLUP_METRICS, 0))
+    for before, after in changes:
+        for doc, sign in ((before, -1), (after, 1)):
+            contribution = rollup_contribution(doc)
+            if contribution is None:
+                continue
+            dims, created, metrics = contribution
+            for granularity, unit in (("hour", HOUR), ("day", DAY)):
+                key = (granularity, _floor(created, unit), dims["category"], dims["zone_id"], dims["status"])
+                totals = deltas[key]
+                for name, value in metrics.items():
+                    totals[name] += sign * value
+    return deltas
+
+
+def _bucket_filter(key: tuple) -> Dict[str, Any]:
+    granularity, bucket, category, zone_id, status = key
+    return {"granularity": granularity, "bucket": bucket, "category": category, "zone_id": zone_id, "status": status}
+
+
+def rollup_ops(changes: Iterable[Change]) -> List[UpdateOne]:
+    """$inc upserts moving each request's contribution from `before` to `after`."""
+    ops = []
+    for key, totals in _accumulate(changes).items():
+        inc = {name: value for name, value in totals.items() if value}
+        if inc:
+            ops.append(UpdateOne(_bucket_filter(key), {"$inc": inc}, upsert=True))
+    return ops
+
+
+async def apply_rollup_changes(changes: Iterable[Change]):
+    if not _maintained:
+        return
+    ops = rollup_ops(changes)
+    if ops:
+        await analytics_rollups_collection.bulk_write(ops, ordered=False)
+
+
+def rebuild_rollups(db) -> int:
+    """Recompute every bucket from service_requests and swap them in.
+
+    Takes a blocking database handle. Buckets are built into a staging
+    collection that then replaces analytics_rollups in one rename, so readers
+    never see a half-built set. Returns the number of buckets written.
+    """
+    source = db["service_requests"].find({}, ROLLUP_SOURCE_PROJECTION, batch_size=5000)
+    deltas = _accumulate((None, doc) for doc in source)
+    staging = db[f"{ROLLUP_COLLECTION}_staging"]
+    staging.drop()
+    staging.create_indexes(INDEX_MANIFEST[ROLLUP_COLLECTION])
+    docs = [{**_bucket_filter(key), **totals} for key, totals in deltas.items()]
+    for start in range(0, len(docs), 5000):
+        staging.insert_many(docs[start:start + 5000], ordered=False)
+    if docs:
+        staging.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        db[ROLLUP_COLLECTION].delete_many({})
+        staging.drop()
+    db[MIGRATIONS_COLLECTION].update_one(
+        {"_id": "rollups"},
+        {"$set": {"built_at": datetime.utcnow(), "buckets": len(docs)}},
+        upsert=True,
+    )
+    return len(docs)
+
+
+_built = False
+# Cleared by stop_rollup_upkeep() when the analytics engine serves /analytics.
+_maintained = True
+
+
+async def rollups_ready() -> bool:
+    """True once `manage.py rebuild-rollups` has populated the buckets."""
+    global _built
+    if not _maintained:
+        return False
+    if not _built:
+        _built = await async_db[MIGRATIONS_COLLECTION].find_one({"_id": "rollups"}) is not None
+    return _built
+
+
+def stop_rollup_upkeep():
+    """Skip the bucket $inc on writes and stop reading rollups in this process.
+
+    Called at startup when the analytics engine is enabled, since the engine
+    answers /analytics; drop_rollups() then removes the buckets.
+    """
+    global _built, _maintained
+    _maintained = False
+    _built = False
+
+
+async def drop_rollups():
+    """Drop the buckets and their `rollups` marker once they stop being kept.
+
+    Without the marker no process reads buckets that writes no longer
+    update: with the engine turned off again the pipelines read raw requests
+    until `manage.py rebuild-rollups` is run.
+    """
+    await async_db[MIGRATIONS_COLLECTION].delete_one({"_id": "rollups"})
+    await analytics_rollups_collection.drop()
+
+
+def split_range(start: Optional[datetime], end: Optional[datetime]):
+    """Cover created_at in [start, end] with day buckets, hour buckets and raw edges.
+
+    Returns (raw_ranges, hour_ranges, day_range), all half-open (lo, hi)
+    pairs where None means unbounded. Raw ranges are the sub-hour slivers at
+    either end and are read from service_requests directly.
+    """
+    # Stored datetimes have millisecond precision, so `<= end` is `< end + 1ms`.
+    end_excl = end.replace(microsecond=end.microsecond // 1000 * 1000) + timedelta(milliseconds=1) if end else None
+    h0 = _ceil(start, HOUR) if start else None
+    h1 = _floor(end_excl, HOUR) if end_excl else None
+    if h0 and h1 and h0 >= h1:
+        return [(start, end_excl)], [], None
+
+    raw = []
+    if start and start < h0:
+        raw.append((start, h0))
+    if end_excl and h1 < end_excl:
+        raw.append((h1, end_excl))
+
+    d0 = _ceil(h0, DAY) if h0 else None
+    d1 = _floor(h1, DAY) if h1 else None
+    if d0 and d1 and d0 >= d1:
+        return raw, [(h0, h1)], None
+    hours = []
+    if h0 and h0 < d0:
+        hours.append((h0, d0))
+    if h1 and d1 < h1:
+        hours.append((d1, h1))
+    return raw, hours, (d0, d1)
+
+
+def _range(lo: Optional[datetime], hi: Optional[datetime]) -> Dict[str, datetime]:
+    bounds = {}
+    if lo:
+        bounds["$gte"] = lo
+    if hi:
+        bounds["$lt"] = hi
+    return bounds
+
+
+async def rollup_totals(
+    group_by: Tuple[str, ...],
+    category: Optional[str] = None,
+    zone: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[tuple, Dict[str, float]]:
+    """Summed metrics per `group_by` key for requests created in [start, end].
+
+    Whole days come from day buckets and whole hours from hour buckets;
+    the sub-hour slivers at the edges are read from raw requests.
+    """
+    raw_ranges, hour_ranges, day_range = split_range(naive_utc(start), naive_utc(end))
+    dims = {}
+    if category:
+        dims["category"] = category
+    if zone:
+        dims["zone_id"] = zone
+
+    clauses = [{"granularity": "hour", "bucket": _range(lo, hi)} for lo, hi in hour_ranges]
+    if day_range:
+        day_clause: Dict[str, Any] = {"granularity": "day"}
+        if any(day_range):
+            day_clause["bucket"] = _range(*day_range)
+        clauses.append(day_clause)
+
+    totals: Dict[tuple, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(ROLLUP_METRICS, 0))
+    if clauses:
+        pipeline = [
+            {"$match": {**dims, "$or": clauses}},
+            {"$group": {
+                "_id": {name: _GROUP_EXPRESSIONS[name] for name in group_by},
+                **{name: {"$sum": f"${name}"} for name in ROLLUP_METRICS},
+            }},
+        ]
+        cursor = await analytics_rollups_collection.aggregate(pipeline, maxTimeMS=ANALYTICS_MAX_TIME_MS)
+        async for doc in cursor:
+            row = totals[tuple(doc["_id"].get(name) for name in group_by)]
+            for name in ROLLUP_METRICS:
+                row[name] += doc[name]
+
+    for lo, hi in raw_ranges:
+        query: Dict[str, Any] = {"timestamps.created_at": _range(lo, hi)}
+        if category:
+            query["category"] = category
+        if zone:
+            query["location.zone_id"] = zone
+        docs = await requests_collection.find(query, ROLLUP_SOURCE_PROJECTION).max_time_ms(ANALYTICS_MAX_TIME_MS).to_list(None)
+        for doc in docs:
+            doc_dims, created, metrics = rollup_contribution(doc)
+            values = {**doc_dims, "year": created.year, "month": created.month}
+            row = totals[tuple(values[name] for name in group_by)]
+            for name, value in metrics.items():
+                row[name] += value
+    return totals
@@ -4,30 +4,16 @@ from datetime import datetime
 from bson import ObjectId
 import os
 from app.database import db
+from app.dispatch import dispatch_index
+from app.zones import get_zone_from_coordinates
 
 router = APIRouter()
 
-def get_zone_from_coordinates(lat: float, lng: float) -> str:
-    if 31.93 <= lat <= 31.96 and 35.90 <= lng <= 35.93:
-        return "ZONE-DT-01"
-    elif lat >= 31.96 and lng >= 35.90:
-        return "ZONE-N-03"
-    elif lat <= 31.93 and lng <= 35.90:
-        return "ZONE-W-02"
-    return "UNKNOWN"
-
 def require_staff_key(x_staff_key: Optional[str] = Header(default=None)):
     expected = os.getenv("STAFF_API_KEY")
     if expected and (not x_staff_key or x_staff_key != expected):
         raise HTTPException(status_code=403, detail="Staff key required")
 
-def get_agent_workload(agent_id: str) -> int:
-    count = db["service_requests"].count_documents({
-        "assignment.assigned_agent_id": agent_id,
-        "status": {"$in": ["assigned", "in_progress"]}
-    })
-    return count
-
 @router.get("/")
 async def list_agents(skill: Optional[str] = None, zone: Optional[str] = None):
     try:
@@ -37,7 +23,7 @@ async def list_agents(skill: Optional[str] = None, zone: Optional[str] = None):
         if zone:
             query["coverage_zones"] = zone
         
-        agents = list(db["service_agents"].find(query))
+        agents = await db["service_agents"].find(query).to_list(None)
         for agent in agents:
             agent["_id"] = str(agent["_id"])
         return agents
@@ -60,7 +46,7 @@ async def create_agent(
         coverage_zones = payload.get("coverage_zones", [])
         
         if base_location and "coordinates" in base_location:
-            lat, lng = base_location["coordinates"]
+            lng, lat = base_location["coordinates"]
             zone = get_zone_from_coordinates(lat, lng)
             if zone not in coverage_zones:
                 coverage_zones.append(zone)
@@ -73,11 +59,13 @@ async def create_agent(
             "base_location": base_location,
             "schedule": payload.get("schedule", []),
             "active": True,
+            "open_workload": 0,
             "created_at": datetime.utcnow()
         }
         
-        result = db["service_agents"].insert_one(agent_data)
-        agent = db["service_agents"].find_one({"_id": result.inserted_id})
+        result = await db["service_agents"].insert_one(agent_data)
+        agent = await db["service_agents"].find_one({"_id": result.inserted_id})
+        dispatch_index.add(agent)
         agent["_id"] = str(agent["_id"])
         return agent
     except Exception as e:
@@ -89,11 +77,11 @@ async def get_agent(agent_id: str):
         if not ObjectId.is_valid(agent_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        agent = db["service_agents"].find_one({"_id": ObjectId(agent_id)})
+        agent = await db["service_agents"].find_one({"_id": ObjectId(agent_id)})
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
-        workload = get_agent_workload(agent_id)
+        workload = agent.get("open_workload", 0)
         
         agent["_id"] = str(agent["_id"])
         return {
@@ -117,7 +105,7 @@ async def update_agent(
         if not ObjectId.is_valid(agent_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        agent = db["service_agents"].find_one({"_id": ObjectId(agent_id)})
+        agent = await db["service_agents"].find_one({"_id": ObjectId(agent_id)})
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
@@ -133,10 +121,11 @@ async def update_agent(
         if "schedule" in payload:
             update_data["schedule"] = payload["schedule"]
         
-        db["service_agents"].update_one(
+        await db["service_agents"].update_one(
             {"_id": ObjectId(agent_id)},
             {"$set": update_data}
         )
+        await dispatch_index.refresh_agent(agent_id)
         
         return {"message": "Agent updated"}
     except Exception as e:
@@ -153,9 +142,10 @@ async def delete_agent(
         if not ObjectId.is_valid(agent_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        result = db["service_agents"].delete_one({"_id": ObjectId(agent_id)})
+        result = await db["service_agents"].delete_one({"_id": ObjectId(agent_id)})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Agent not found")
+        dispatch_index.remove(agent_id)
         
         return {"message": "Agent deleted"}
     except Exception as e:
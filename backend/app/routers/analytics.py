@@ -1,30 +1,55 @@
-from fastapi import APIRouter, HTTPException, Query
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Response
+from collections import defaultdict
+from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 from bson import ObjectId
+from pymongo.errors import ExecutionTimeout
 
+from app.analytics_engine import analytics_engine
 from app.database import (
     requests_collection,
     performance_logs_collection,
-    geo_feeds_collection,
     db,
+    ANALYTICS_MAX_TIME_MS,
 )
+from app.geo_feeds import (
+    HEATMAP_SNAPSHOT_INTERVAL_SECONDS,
+    OPEN_STATUSES,
+    PRIORITY_WEIGHTS,
+    heatmap_snapshots,
+    load_feed,
+    render_feed,
+)
+from app.geo_grid import bbox_filter, cell_center, cell_degrees, cell_expression, lat_scale, parse_bbox
+from app.result_cache import ResultCache, filter_key
+from app.rollups import RESOLVED_STATUSES, naive_utc, rollup_totals, rollups_ready
 
 router = APIRouter()
 
-
-OPEN_STATUSES = ["new", "triaged", "assigned", "in_progress"]
+# Dashboards poll the same filters; each distinct filter costs one
+# computation per TTL, refreshed in the background once stale. Only used
+# before the analytics engine is loaded, or when it is disabled.
+analytics_cache = ResultCache()
 
 
 def _parse_date(val: Optional[str]) -> Optional[datetime]:
     if not val:
         return None
     try:
-        return datetime.fromisoformat(val)
+        # Stored times are naive UTC; an explicit offset is converted to match.
+        return naive_utc(datetime.fromisoformat(val))
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use ISO 8601 (e.g., 2026-01-23T00:00:00)")
 
 
+async def _aggregate(pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    try:
+        cursor = await requests_collection.aggregate(pipeline, maxTimeMS=ANALYTICS_MAX_TIME_MS)
+        return await cursor.to_list(None)
+    except ExecutionTimeout:
+        raise HTTPException(status_code=503, detail="Analytics query exceeded its time budget")
+
+
 def _build_match(category: Optional[str], zone: Optional[str], start: Optional[str], end: Optional[str]):
     match: Dict[str, Any] = {}
     if category:
@@ -52,82 +77,79 @@ async def kpis(
 ):
     """Return high-level KPIs for the dashboard."""
     match = _build_match(category, zone, start_date, end_date)
+    if analytics_engine.ready:
+        return analytics_engine.kpis(*_match_filters(match))
+    return await analytics_cache.get(filter_key("kpis", match), lambda: _compute_kpis(match))
 
-    status_pipeline = [
-        {"$match": match},
-        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
-    ]
-    status_counts = {doc["_id"]: doc["count"] for doc in requests_collection.aggregate(status_pipeline)}
 
-    res_match = match | {"status": {"$in": ["resolved", "closed"]}}
-    res_pipeline = [
-        {"$match": res_match},
-        {
-            "$project": {
-                "created_at": "$timestamps.created_at",
-                "resolved_at": "$timestamps.resolved_at",
-            }
-        },
-        {"$match": {"resolved_at": {"$ne": None}, "created_at": {"$ne": None}}},
-        {
-            "$project": {
-                "hours": {
-                    "$divide": [
-                        {"$subtract": ["$resolved_at", "$created_at"]},
-                        1000 * 60 * 60,
-                    ]
-                }
-            }
-        },
-        {"$group": {"_id": None, "avg_hours": {"$avg": "$hours"}}},
-    ]
-    avg_resolution_doc = list(requests_collection.aggregate(res_pipeline))
-    avg_resolution_hours = avg_resolution_doc[0]["avg_hours"] if avg_resolution_doc else None
+def _match_filters(match: Dict[str, Any]):
+    """(category, zone, start, end) back out of a `_build_match` filter."""
+    created = match.get("timestamps.created_at") or {}
+    return match.get("category"), match.get("location.zone_id"), created.get("$gte"), created.get("$lte")
+
 
-    sla_pipeline = [
+async def _compute_kpis(match: Dict[str, Any]) -> Dict[str, Any]:
+    if await rollups_ready():
+        return _kpis_from_rollups(await rollup_totals(("status",), *_match_filters(match)))
+
+    hours = {
+        "$divide": [
+            {"$subtract": ["$timestamps.resolved_at", "$timestamps.created_at"]},
+            1000 * 60 * 60,
+        ]
+    }
+    # One scan of the matched requests feeds all three KPIs.
+    pipeline = [
         {"$match": match},
         {
-            "$project": {
-                "status": 1,
-                "created_at": "$timestamps.created_at",
-                "resolved_at": "$timestamps.resolved_at",
-                "breach_threshold": "$sla_policy.breach_threshold_hours",
-            }
-        },
-        {
-            "$project": {
-                "breached": {
-                    "$cond": [
-                        {
-                            "$and": [
-                                {"$ne": ["$resolved_at", None]},
-                                {"$ne": ["$created_at", None]},
-                                {
-                                    "$gt": [
+            "$facet": {
+                "backlog": [
+                    {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+                ],
+                "resolution": [
+                    {
+                        "$match": {
+                            "status": {"$in": list(RESOLVED_STATUSES)},
+                            "timestamps.resolved_at": {"$ne": None},
+                            "timestamps.created_at": {"$ne": None},
+                        }
+                    },
+                    {"$group": {"_id": None, "avg_hours": {"$avg": hours}}},
+                ],
+                "sla": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "breached": {
+                                "$sum": {
+                                    "$cond": [
                                         {
-                                            "$divide": [
-                                                {"$subtract": ["$resolved_at", "$created_at"]},
-                                                1000 * 60 * 60,
+                                            "$and": [
+                                                {"$ne": ["$timestamps.resolved_at", None]},
+                                                {"$ne": ["$timestamps.created_at", None]},
+                                                {"$gt": [hours, "$sla_policy.breach_threshold_hours"]},
                                             ]
                                         },
-                                        "$breach_threshold",
+                                        1,
+                                        0,
                                     ]
-                                },
-                            ]
-                        },
-                        1,
-                        0,
-                    ]
-                },
+                                }
+                            },
+                            "total": {"$sum": 1},
+                        }
+                    },
+                ],
             }
         },
-        {"$group": {"_id": None, "breached": {"$sum": "$breached"}, "total": {"$sum": 1}}},
     ]
-    sla_doc = list(requests_collection.aggregate(sla_pipeline))
+    facets = (await _aggregate(pipeline))[0]
+
+    status_counts = {doc["_id"]: doc["count"] for doc in facets["backlog"]}
+    avg_resolution_hours = facets["resolution"][0]["avg_hours"] if facets["resolution"] else None
     sla_breach_rate = None
-    if sla_doc:
-        total = sla_doc[0].get("total", 0) or 0
-        breached = sla_doc[0].get("breached", 0)
+    if facets["sla"]:
+        total = facets["sla"][0].get("total", 0) or 0
+        breached = facets["sla"][0].get("breached", 0)
         sla_breach_rate = breached / total if total else None
 
     return {
@@ -137,69 +159,111 @@ async def kpis(
     }
 
 
+def _kpis_from_rollups(totals: Dict[tuple, Dict[str, float]]) -> Dict[str, Any]:
+    rows = totals.values()
+    total = sum(row["count"] for row in rows)
+    resolution_count = sum(row["resolution_count"] for row in rows)
+    return {
+        "backlog": {status: int(row["count"]) for (status,), row in totals.items() if row["count"]},
+        "avg_resolution_hours": (
+            sum(row["resolution_hours"] for row in rows) / resolution_count if resolution_count else None
+        ),
+        "sla_breach_rate": sum(row["sla_breached"] for row in rows) / total if total else None,
+    }
+
+
+def _weight_expression(now: datetime) -> Dict[str, Any]:
+    """Server-side form of the per-feature weight: priority * (1 + sqrt(age hours))."""
+    age_hours = {
+        "$max": [
+            {"$divide": [{"$subtract": [now, {"$ifNull": ["$timestamps.created_at", now]}]}, 1000 * 60 * 60]},
+            0,
+        ]
+    }
+    priority = {"$toUpper": {"$ifNull": ["$priority", "P3"]}}
+    p_weight = {
+        "$switch": {
+            "branches": [{"case": {"$eq": [priority, name]}, "then": value} for name, value in PRIORITY_WEIGHTS.items()],
+            "default": 1.0,
+        }
+    }
+    return {"$multiply": [p_weight, {"$add": [1, {"$sqrt": age_hours}]}]}
+
+
+async def _heatmap_cells(match: Dict[str, Any], shape: str, size: float, scale: float, now: datetime):
+    lng = {"$arrayElemAt": ["$location.coordinates", 0]}
+    lat = {"$arrayElemAt": ["$location.coordinates", 1]}
+    pipeline = [
+        {"$match": {"location.coordinates.1": {"$exists": True}, **match}},
+        {"$project": {"cell": cell_expression(shape, size, scale, lng, lat), "weight": _weight_expression(now)}},
+        {"$group": {"_id": "$cell", "weight": {"$sum": "$weight"}, "count": {"$sum": 1}}},
+    ]
+    features = []
+    for doc in await _aggregate(pipeline):
+        x, y = int(doc["_id"]["x"]), int(doc["_id"]["y"])
+        center_lng, center_lat = cell_center(shape, size, scale, x, y)
+        features.append({
+            "type": "Feature",
+            "properties": {"cell": f"{x}:{y}", "weight": round(doc["weight"], 3), "count": doc["count"]},
+            "geometry": {"type": "Point", "coordinates": [round(center_lng, 6), round(center_lat, 6)]},
+        })
+    return features
+
+
 @router.get("/geofeeds/heatmap")
 async def heatmap(
     category: Optional[str] = Query(None),
     zone: Optional[str] = Query(None),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
+    bbox: Optional[str] = Query(None, description="min_lng,min_lat,max_lng,max_lat"),
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+    resolution: Optional[float] = Query(None, gt=0, description="Cell width in degrees of longitude"),
+    grid: str = Query("square", pattern="^(square|hex)$"),
 ):
-    """Return GeoJSON heat-map feed of open requests and store a snapshot in geo_feeds."""
+    """Return GeoJSON heat-map feed of open requests.
+
+    With `zoom` or `resolution` the open requests are binned server-side into
+    square or hex cells, one Point feature per cell at its centre carrying
+    summed `weight` and `count`. `bbox` limits either form to the viewport.
+    The unfiltered per-request feed is served from the latest snapshot
+    while the snapshot job is keeping it current.
+    """
+    now = datetime.utcnow()
+    if not any((category, zone, start_date, end_date, bbox)) and zoom is None and resolution is None:
+        snapshot = await heatmap_snapshots.latest(now, timedelta(seconds=2 * HEATMAP_SNAPSHOT_INTERVAL_SECONDS))
+        if snapshot is not None:
+            return Response(content=snapshot, media_type="application/json")
+
     match = _build_match(category, zone, start_date, end_date)
     match["status"] = {"$in": OPEN_STATUSES}
+    viewport = None
+    if bbox:
+        try:
+            viewport = parse_bbox(bbox)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid bbox. Use min_lng,min_lat,max_lng,max_lat")
+        match.update(bbox_filter(viewport))
+
+    if zoom is not None or resolution is not None:
+        size = resolution or cell_degrees(zoom)
+        scale = lat_scale(viewport)
+        return {
+            "type": "FeatureCollection",
+            "features": await _heatmap_cells(match, grid, size, scale, now),
+            "grid": {"shape": grid, "cell_degrees": size, "zoom": zoom},
+        }
 
-    cursor = requests_collection.find(match, {
-        "location": 1,
-        "priority": 1,
-        "timestamps": 1,
-        "category": 1,
-        "status": 1,
-    })
-
-    features: List[Dict[str, Any]] = []
-    now = datetime.utcnow()
-    for doc in cursor:
-        loc = doc.get("location") or {}
-        coords = loc.get("coordinates")
-        if not coords or len(coords) != 2:
-            continue
-        created = (doc.get("timestamps") or {}).get("created_at") or now
-        age_hours = max((now - created).total_seconds() / 3600, 0)
-        priority = (doc.get("priority") or "P3").upper()
-        p_weight = {"P0": 4.0, "P1": 3.0, "P2": 2.0, "P3": 1.0}.get(priority, 1.0)
-        weight = p_weight * (1 + (age_hours ** 0.5))
-        features.append({
-            "type": "Feature",
-            "properties": {
-                "request_id": str(doc.get("_id")),
-                "category": doc.get("category"),
-                "priority": priority,
-                "status": doc.get("status"),
-                "weight": round(weight, 3),
-                "age_hours": round(age_hours, 2),
-            },
-            "geometry": {
-                "type": "Point",
-                "coordinates": coords,
-            },
-        })
-
-    geojson = {"type": "FeatureCollection", "features": features}
+    return Response(content=render_feed(await load_feed(match), now), media_type="application/json")
 
-    geo_feeds_collection.insert_one({
-        "feed_name": "open_requests_heatmap",
-        "generated_at": now,
-        "filters": {
-            "category": category,
-            "zone": zone,
-            "start_date": start_date,
-            "end_date": end_date,
-        },
-        "geojson": geojson,
-        "created_at": now,
-    })
 
-    return geojson
+@router.get("/geofeeds/heatmap/latest")
+async def latest_heatmap():
+    """Return the newest stored heatmap snapshot, with weights as of now."""
+    snapshot = await heatmap_snapshots.latest()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No heatmap snapshot has been taken yet")
+    return Response(content=snapshot, media_type="application/json")
 
 
 @router.get("/cohorts")
@@ -211,6 +275,15 @@ async def cohorts(
 ):
     """Return requests over time (month buckets) and hotspot counts by zone."""
     match = _build_match(category, zone, start_date, end_date)
+    if analytics_engine.ready:
+        return analytics_engine.cohorts(*_match_filters(match))
+    return await analytics_cache.get(filter_key("cohorts", match), lambda: _compute_cohorts(match))
+
+
+async def _compute_cohorts(match: Dict[str, Any]) -> Dict[str, Any]:
+    if await rollups_ready():
+        totals = await rollup_totals(("year", "month", "status", "zone_id"), *_match_filters(match))
+        return _cohorts_from_rollups(totals)
 
     time_pipeline = [
         {"$match": match},
@@ -242,7 +315,7 @@ async def cohorts(
             "count": doc["count"],
             "resolved": doc["resolved"],
         }
-        for doc in db["service_requests"].aggregate(time_pipeline)
+        for doc in await _aggregate(time_pipeline)
     ]
 
     hotspot_pipeline = [
@@ -259,12 +332,34 @@ async def cohorts(
 
     hotspots = [
         {"zone_id": doc["_id"], "count": doc["count"]}
-        for doc in db["service_requests"].aggregate(hotspot_pipeline)
+        for doc in await _aggregate(hotspot_pipeline)
     ]
 
     return {"time_series": time_series, "hotspots": hotspots}
 
 
+def _cohorts_from_rollups(totals: Dict[tuple, Dict[str, float]]) -> Dict[str, Any]:
+    months: Dict[tuple, Dict[str, int]] = defaultdict(lambda: {"count": 0, "resolved": 0})
+    zones: Dict[Any, int] = defaultdict(int)
+    for (year, month, status, zone_id), row in totals.items():
+        count = int(row["count"])
+        if not count:
+            continue
+        months[(year, month)]["count"] += count
+        if status in RESOLVED_STATUSES:
+            months[(year, month)]["resolved"] += count
+        zones[zone_id] += count
+    time_series = [
+        {"year": year, "month": month, **counts}
+        for (year, month), counts in sorted(months.items())
+    ]
+    hotspots = [
+        {"zone_id": zone_id, "count": count}
+        for zone_id, count in sorted(zones.items(), key=lambda item: -item[1])[:10]
+    ]
+    return {"time_series": time_series, "hotspots": hotspots}
+
+
 @router.get("/agents")
 async def agent_productivity(
     zone: Optional[str] = Query(None),
@@ -273,8 +368,30 @@ async def agent_productivity(
 ):
     """Return agent workload and performance summary."""
     match = _build_match(None, zone, start_date, end_date)
+    if analytics_engine.ready:
+        rows = analytics_engine.agents(*_match_filters(match))
+    else:
+        rows = [
+            {"agent_id": str(doc["_id"]), "open": doc.get("open", 0), "resolved": doc.get("resolved", 0)}
+            for doc in await _aggregate(_agents_pipeline(match))
+        ]
+
+    agents = await db["service_agents"].find({}).to_list(None)
+    agent_lookup = {str(a.get("_id")): a.get("name") for a in agents}
+    results = [
+        {
+            "agent_id": row["agent_id"],
+            "agent_name": agent_lookup.get(row["agent_id"], "Unknown"),
+            "open": row["open"],
+            "resolved": row["resolved"],
+        }
+        for row in rows
+    ]
+    return {"agents": results}
 
-    pipeline = [
+
+def _agents_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
         {"$match": match},
         {"$match": {"assignment.assigned_agent_id": {"$ne": None}}},
         {
@@ -302,18 +419,3 @@ async def agent_productivity(
         },
         {"$sort": {"open": -1}},
     ]
-
-    agents = list(db["service_agents"].find({}))
-    agent_lookup = {str(a.get("_id")): a.get("name") for a in agents}
-
-    results = []
-    for doc in db["service_requests"].aggregate(pipeline):
-        agent_id = str(doc["_id"])  
-        results.append({
-            "agent_id": agent_id,
-            "agent_name": agent_lookup.get(agent_id, "Unknown"),
-            "open": doc.get("open", 0),
-            "resolved": doc.get("resolved", 0),
-        })
-
-    return {"agents": results}
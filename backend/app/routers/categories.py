@@ -20,7 +20,7 @@ def convert_objectids(obj):
 async def get_all_categories(active_only: bool = True):
     try:
         query = {"active": True} if active_only else {}
-        categories = list(categories_collection.find(query))
+        categories = await categories_collection.find(query).to_list(None)
         categories = [convert_objectids(cat) for cat in categories]
         return categories
     except Exception as e:
@@ -29,7 +29,7 @@ async def get_all_categories(active_only: bool = True):
 @router.get("/{category_id}", response_model=Category)
 async def get_category(category_id: str):
     try:
-        category = categories_collection.find_one({"_id": ObjectId(category_id)})
+        category = await categories_collection.find_one({"_id": ObjectId(category_id)})
         if not category:
             raise HTTPException(status_code=404, detail="Category not found")
         category = convert_objectids(category)
@@ -41,8 +41,8 @@ async def get_category(category_id: str):
 async def create_category(category: Category):
     try:
         category_dict = category.dict(exclude={"id"}, exclude_none=True)
-        result = categories_collection.insert_one(category_dict)
-        created_category = categories_collection.find_one({"_id": result.inserted_id})
+        result = await categories_collection.insert_one(category_dict)
+        created_category = await categories_collection.find_one({"_id": result.inserted_id})
         return created_category
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -51,13 +51,13 @@ async def create_category(category: Category):
 async def update_category(category_id: str, category: Category):
     try:
         update_data = category.dict(exclude={"id"}, exclude_none=True)
-        result = categories_collection.update_one(
+        result = await categories_collection.update_one(
             {"_id": ObjectId(category_id)},
             {"$set": update_data}
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Category not found")
-        updated_category = categories_collection.find_one({"_id": ObjectId(category_id)})
+        updated_category = await categories_collection.find_one({"_id": ObjectId(category_id)})
         return updated_category
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -65,7 +65,7 @@ async def update_category(category_id: str, category: Category):
 @router.delete("/{category_id}")
 async def delete_category(category_id: str):
     try:
-        result = categories_collection.delete_one({"_id": ObjectId(category_id)})
+        result = await categories_collection.delete_one({"_id": ObjectId(category_id)})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Category not found")
         return {"message": "Category deleted"}
@@ -31,7 +31,7 @@ async def get_all_citizens(
         if city:
             query["city"] = city
         
-        citizens = list(citizens_collection.find(query).limit(limit))
+        citizens = await citizens_collection.find(query).limit(limit).to_list(None)
         for citizen in citizens:
             citizen["_id"] = str(citizen["_id"])
         return citizens
@@ -41,7 +41,7 @@ async def get_all_citizens(
 @router.get("/{citizen_id}", response_model=CitizenProfile)
 async def get_citizen(citizen_id: str):
     try:
-        citizen = citizens_collection.find_one({"_id": ObjectId(citizen_id)})
+        citizen = await citizens_collection.find_one({"_id": ObjectId(citizen_id)})
         if not citizen:
             raise HTTPException(status_code=404, detail="Citizen not found")
         citizen["_id"] = str(citizen["_id"])
@@ -53,7 +53,7 @@ async def get_citizen(citizen_id: str):
 async def create_citizen(citizen: CitizenProfile):
     try:
         if citizen.email:
-            existing = citizens_collection.find_one({"email": citizen.email})
+            existing = await citizens_collection.find_one({"email": citizen.email})
             if existing:
                 raise HTTPException(status_code=400, detail="Email already exists")
         
@@ -62,8 +62,8 @@ async def create_citizen(citizen: CitizenProfile):
         citizen_dict["total_requests"] = 0
         citizen_dict["avg_rating"] = 0.0
         
-        result = citizens_collection.insert_one(citizen_dict)
-        created_citizen = citizens_collection.find_one({"_id": result.inserted_id})
+        result = await citizens_collection.insert_one(citizen_dict)
+        created_citizen = await citizens_collection.find_one({"_id": result.inserted_id})
         created_citizen["_id"] = str(created_citizen["_id"])
         return created_citizen
     except Exception as e:
@@ -76,7 +76,7 @@ async def update_citizen(citizen_id: str, updates: dict):
         updates.pop("id", None)
         updates.pop("created_at", None)
         
-        result = citizens_collection.update_one(
+        result = await citizens_collection.update_one(
             {"_id": ObjectId(citizen_id)},
             {"$set": updates}
         )
@@ -84,7 +84,7 @@ async def update_citizen(citizen_id: str, updates: dict):
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Citizen not found")
         
-        updated_citizen = citizens_collection.find_one({"_id": ObjectId(citizen_id)})
+        updated_citizen = await citizens_collection.find_one({"_id": ObjectId(citizen_id)})
         updated_citizen["_id"] = str(updated_citizen["_id"])
         return updated_citizen
     except Exception as e:
@@ -93,7 +93,7 @@ async def update_citizen(citizen_id: str, updates: dict):
 @router.delete("/{citizen_id}")
 async def delete_citizen(citizen_id: str):
     try:
-        result = citizens_collection.delete_one({"_id": ObjectId(citizen_id)})
+        result = await citizens_collection.delete_one({"_id": ObjectId(citizen_id)})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Citizen not found")
         return {"message": "Citizen deleted"}
@@ -103,13 +103,13 @@ async def delete_citizen(citizen_id: str):
 @router.get("/{citizen_id}/requests")
 async def get_citizen_requests(citizen_id: str):
     try:
-        citizen = citizens_collection.find_one({"_id": ObjectId(citizen_id)})
+        citizen = await citizens_collection.find_one({"_id": ObjectId(citizen_id)})
         if not citizen:
             raise HTTPException(status_code=404, detail="Citizen not found")
         
-        requests_list = list(requests_collection.find({
+        requests_list = await requests_collection.find({
             "citizen_ref.citizen_id": citizen_id
-        }).sort("timestamps.created_at", -1))
+        }).sort("timestamps.created_at", -1).to_list(None)
         
         requests_list = [convert_objectids(req) for req in requests_list]
         
@@ -125,13 +125,13 @@ async def get_citizen_requests(citizen_id: str):
 @router.get("/{citizen_id}/statistics")
 async def get_citizen_statistics(citizen_id: str):
     try:
-        citizen = citizens_collection.find_one({"_id": ObjectId(citizen_id)})
+        citizen = await citizens_collection.find_one({"_id": ObjectId(citizen_id)})
         if not citizen:
             raise HTTPException(status_code=404, detail="Citizen not found")
         
-        requests_list = list(requests_collection.find({
+        requests_list = await requests_collection.find({
             "citizen_ref.citizen_id": citizen_id
-        }))
+        }).to_list(None)
         
         status_counts = {}
         for req in requests_list:
@@ -153,14 +153,14 @@ async def get_citizen_statistics(citizen_id: str):
 @router.post("/{citizen_id}/request-verification")
 async def request_verification(citizen_id: str):
     try:
-        citizen = citizens_collection.find_one({"_id": ObjectId(citizen_id)})
+        citizen = await citizens_collection.find_one({"_id": ObjectId(citizen_id)})
         if not citizen:
             raise HTTPException(status_code=404, detail="Citizen not found")
 
         otp_code = f"{secrets.randbelow(1_000_000):06d}"
         expires_at = datetime.utcnow() + timedelta(minutes=10)
 
-        citizens_collection.update_one(
+        await citizens_collection.update_one(
             {"_id": ObjectId(citizen_id)},
             {
                 "$set": {
@@ -189,7 +189,7 @@ async def verify_citizen(citizen_id: str, payload: dict):
         if not otp:
             raise HTTPException(status_code=400, detail="OTP is required")
 
-        citizen = citizens_collection.find_one({"_id": ObjectId(citizen_id)})
+        citizen = await citizens_collection.find_one({"_id": ObjectId(citizen_id)})
         if not citizen:
             raise HTTPException(status_code=404, detail="Citizen not found")
 
@@ -203,7 +203,7 @@ async def verify_citizen(citizen_id: str, payload: dict):
         if expires_at and datetime.utcnow() > expires_at:
             raise HTTPException(status_code=400, detail="OTP expired")
 
-        citizens_collection.update_one(
+        await citizens_collection.update_one(
             {"_id": ObjectId(citizen_id)},
             {
                 "$set": {
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from app.database import performance_logs_collection, requests_collection
+from app.event_log import read_events
 from app.models import PerformanceLog
 from bson import ObjectId
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -12,15 +14,57 @@ async def get_all_performance_logs(request_id: str = None):
         query = {}
         if request_id:
             query["request_id"] = ObjectId(request_id)
-        logs = list(performance_logs_collection.find(query))
+        logs = await performance_logs_collection.find(query).to_list(None)
         return logs
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _encode_position(position) -> Optional[str]:
+    if position is None:
+        return None
+    at, bucket_id, index = position
+    return f"{at.isoformat()}_{bucket_id}_{index}"
+
+def _decode_position(token: str):
+    try:
+        at, bucket_id, index = token.split("_")
+        return datetime.fromisoformat(at), ObjectId(bucket_id), int(index)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/request/{request_id}", response_model=PerformanceLog)
+async def get_request_log(request_id: str):
+    """Summary head for one request; events are paged via /events."""
+    if not ObjectId.is_valid(request_id):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+    log = await performance_logs_collection.find_one({"request_id": ObjectId(request_id)})
+    if not log:
+        raise HTTPException(status_code=404, detail="Log not found")
+    log["_id"] = str(log["_id"])
+    log["request_id"] = str(log["request_id"])
+    return log
+
+@router.get("/request/{request_id}/events")
+async def get_request_events(
+    request_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """Events for one request, newest first, one page at a time."""
+    if not ObjectId.is_valid(request_id):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+    before = _decode_position(cursor) if cursor else None
+    events, position = await read_events(ObjectId(request_id), limit, before)
+    return {
+        "request_id": request_id,
+        "events": events,
+        "next_cursor": _encode_position(position),
+    }
+
 @router.get("/{log_id}", response_model=PerformanceLog)
 async def get_performance_log(log_id: str):
     try:
-        log = performance_logs_collection.find_one({"_id": ObjectId(log_id)})
+        log = await performance_logs_collection.find_one({"_id": ObjectId(log_id)})
         if not log:
             raise HTTPException(status_code=404, detail="Log not found")
         return log
@@ -31,8 +75,8 @@ async def get_performance_log(log_id: str):
 async def create_performance_log(log: PerformanceLog):
     try:
         log_dict = log.dict(exclude={"id"}, exclude_none=True)
-        result = performance_logs_collection.insert_one(log_dict)
-        created_log = performance_logs_collection.find_one({"_id": result.inserted_id})
+        result = await performance_logs_collection.insert_one(log_dict)
+        created_log = await performance_logs_collection.find_one({"_id": result.inserted_id})
         return created_log
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -41,13 +85,13 @@ async def create_performance_log(log: PerformanceLog):
 async def update_performance_log(log_id: str, log: PerformanceLog):
     try:
         update_data = log.dict(exclude={"id"}, exclude_none=True)
-        result = performance_logs_collection.update_one(
+        result = await performance_logs_collection.update_one(
             {"_id": ObjectId(log_id)},
             {"$set": update_data}
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Log not found")
-        updated_log = performance_logs_collection.find_one({"_id": ObjectId(log_id)})
+        updated_log = await performance_logs_collection.find_one({"_id": ObjectId(log_id)})
         return updated_log
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -55,7 +99,7 @@ async def update_performance_log(log_id: str, log: PerformanceLog):
 @router.delete("/{log_id}")
 async def delete_performance_log(log_id: str):
     try:
-        result = performance_logs_collection.delete_one({"_id": ObjectId(log_id)})
+        result = await performance_logs_collection.delete_one({"_id": ObjectId(log_id)})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Log not found")
         return {"message": "Log deleted"}
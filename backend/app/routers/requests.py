@@ -1,19 +1,115 @@
-from fastapi import APIRouter, HTTPException, Query, Body, Header, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Query, Body, Header, UploadFile, File, Form, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+import asyncio
+import base64
+import copy
+import csv
+import io
+import json
 import os
-from uuid import uuid4
 from app.database import (
     requests_collection, 
-    performance_logs_collection,
+    client,
     db
 )
+from app.event_log import record_event
+from app.evidence import MAX_UPLOAD_BYTES, UploadTooLarge, blob_url, reference_blob, release_blobs, store_upload
+from app.event_sink import event_sink
+from app.indexes import REQUEST_LIST_SORT
+from app.derivatives import derivative_pipeline, derivative_urls
+from app.dispatch import dispatch_index, fill_missing_workloads
 from app.models import ServiceRequest, ServiceRequestResponse
+from app.analytics_engine import analytics_engine
+from app.request_changes import publish
+from app.tiles import invalidate_request_tiles
+from app.rollups import ROLLUP_SOURCE_PROJECTION, apply_rollup_changes
+from app.workload import adjust_workload, adjust_workloads
+from app.zones import get_zone_from_coordinates, get_zone_registry
 
 router = APIRouter()
-UPLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "uploads"))
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+USE_WRITE_TRANSACTIONS = os.getenv("REQUEST_WRITE_TRANSACTIONS", "false").lower() in ("1", "true", "yes")
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "5000"))
+
+# Fields rendered by ServiceRequestResponse. Reads project to these so that
+# evidence, internal notes, workflow and the like never leave the server.
+RESPONSE_FIELDS = (
+    "request_id", "title", "description", "category", "location",
+    "address", "status", "priority", "timestamps",
+)
+LIST_PROJECTION = {field: 1 for field in RESPONSE_FIELDS}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "_id"]
+    unknown = [f for f in selected if f not in RESPONSE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+def build_projection(selected: Optional[List[str]]) -> Dict[str, int]:
+    if selected is None:
+        return LIST_PROJECTION
+    projection = {field: 1 for field in selected}
+    if "timestamps" not in selected:
+        # Needed for the continuation token.
+        projection["timestamps.created_at"] = 1
+    return projection
+
+def sparse_doc(doc: Dict[str, Any], selected: List[str]) -> Dict[str, Any]:
+    response_doc = to_response_doc(doc)
+    return {key: response_doc[key] for key in ["_id", *selected]}
+
+# Listings are ordered by REQUEST_LIST_SORT; the continuation token carries
+# the sort key of the last row returned.
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    created = (doc.get("timestamps") or {}).get("created_at")
+    payload = {
+        "t": created.isoformat() if isinstance(created, datetime) else None,
+        "id": str(doc["_id"]),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = ObjectId(payload["id"])
+        created = datetime.fromisoformat(payload["t"]) if payload.get("t") else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if created is None:
+        # Rows without created_at sort last; only _id orders them.
+        return {"timestamps.created_at": None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {"timestamps.created_at": {"$lt": created}},
+        {"timestamps.created_at": created, "_id": {"$lt": last_id}},
+        {"timestamps.created_at": None},
+    ]}
+
+def build_request_query(
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    zone_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    query = {}
+    if status:
+        query["status"] = status
+    if category:
+        query["category"] = category
+    if zone_id:
+        query["location.zone_id"] = zone_id
+    if agent_id:
+        query["assignment.assigned_agent_id"] = agent_id
+    return query
 
 def to_response_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     now = datetime.utcnow()
@@ -56,15 +152,6 @@ def to_response_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
         "timestamps": timestamps,
     }
 
-def get_zone_from_coordinates(lat: float, lng: float) -> str:
-    if 31.93 <= lat <= 31.96 and 35.90 <= lng <= 35.93:
-        return "ZONE-DT-01"
-    elif lat >= 31.96 and lng >= 35.90:
-        return "ZONE-N-03"
-    elif lat <= 31.93 and lng <= 35.90:
-        return "ZONE-W-02"
-    return "UNKNOWN"
-
 def get_skill_from_category(category: str) -> str:
     skills = {
         "pothole": "road",
@@ -74,30 +161,28 @@ def get_skill_from_category(category: str) -> str:
     }
     return skills.get(category, category)
 
-def get_agent_workload(agent_id: str) -> int:
-    count = requests_collection.count_documents({
-        "assignment.assigned_agent_id": agent_id,
-        "status": {"$in": ["assigned", "in_progress"]}
-    })
-    return count
-
-def find_best_agent(zone_id: str, skill_needed: str) -> Optional[Dict]:
-    candidates = list(db["service_agents"].find({
+async def find_best_agent(zone_id: str, skill_needed: str) -> Optional[Dict]:
+    if dispatch_index.ready:
+        return dispatch_index.best_agent(zone_id, skill_needed)
+    
+    # Index not built yet (first seconds after startup): ask the database.
+    candidates = await db["service_agents"].find({
         "skills": skill_needed,
         "coverage_zones": zone_id,
         "active": True
-    }))
+    }).to_list(None)
     
     if not candidates:
-        candidates = list(db["service_agents"].find({
+        candidates = await db["service_agents"].find({
             "skills": skill_needed,
             "active": True
-        }))
+        }).to_list(None)
     
     if not candidates:
         return None
     
-    best_agent = min(candidates, key=lambda a: get_agent_workload(str(a["_id"])))
+    await fill_missing_workloads(candidates)
+    best_agent = min(candidates, key=lambda a: a["open_workload"])
     return best_agent
 
 def require_staff_key(x_staff_key: Optional[str] = Header(default=None)):
@@ -105,122 +190,382 @@ def require_staff_key(x_staff_key: Optional[str] = Header(default=None)):
     if expected and (not x_staff_key or x_staff_key != expected):
         raise HTTPException(status_code=403, detail="Staff key required")
 
+# Statuses a request may be in for an update to the key status to apply.
+# Closed is terminal. Open statuses may be re-entered, so a retried update
+# (or a second "arrived" milestone) succeeds as a no-op and "assigned" can
+# reassign; resolving again would move resolved_at, so it is a 409.
+ALLOWED_FROM = {
+    "new": ("new", "triaged", "assigned", "in_progress", "resolved"),
+    "triaged": ("new", "triaged", "assigned", "in_progress"),
+    "assigned": ("new", "triaged", "assigned", "in_progress"),
+    "in_progress": ("new", "triaged", "assigned", "in_progress"),
+    "resolved": ("new", "triaged", "assigned", "in_progress"),
+    "closed": ("new", "triaged", "assigned", "in_progress", "resolved"),
+}
+OPEN_REQUEST_STATUSES = ("new", "triaged", "assigned", "in_progress", "resolved")
+# What publish() needs to see of a request before and after a write.
+CHANGE_PROJECTION = {"assignment": 1, "location.coordinates": 1, "priority": 1, **ROLLUP_SOURCE_PROJECTION}
+
+async def update_request_if(request_id: str, allowed_from, updates: Dict[str, Any]):
+    """Apply `updates` only while the request's status is in `allowed_from`.
+
+    One find_one_and_update does the existence check, the status guard and
+    the write. It returns the request before and after (only the fields
+    derived state is computed from) for publish(). A miss is reported as 404
+    or 409; telling those apart costs a second read, but only on the failure
+    path.
+    """
+    oid = ObjectId(request_id)
+    before = await requests_collection.find_one_and_update(
+        {"_id": oid, "status": {"$in": list(allowed_from)}},
+        {"$set": updates},
+        projection=CHANGE_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        current = await requests_collection.find_one({"_id": oid}, {"status": 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Request not found")
+        raise HTTPException(status_code=409, detail=f"Request is {current.get('status')}")
+    return before, apply_set(before, updates)
+
+def apply_set(doc: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of `doc` with a $set (dotted paths allowed) applied."""
+    result = copy.deepcopy(doc)
+    for path, value in updates.items():
+        *parents, leaf = path.split(".")
+        target = result
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = value
+    return result
+
+def request_location(request: ServiceRequest) -> Dict[str, Any]:
+    """GeoJSON point for a submitted request, without zone_id yet."""
+    location = request.location
+    loc_coords = None
+    if location is not None:
+        if hasattr(location, "coordinates"):
+            loc_coords = location.coordinates
+        elif isinstance(location, dict):
+            loc_coords = location.get("coordinates")
+    lat = loc_coords[1] if loc_coords and len(loc_coords) > 1 else 0
+    lng = loc_coords[0] if loc_coords and len(loc_coords) > 0 else 0
+    loc_dict = None
+    if location is not None:
+        try:
+            loc_dict = location.model_dump()
+        except Exception:
+            loc_dict = dict(location) if isinstance(location, dict) else None
+    if loc_dict is None:
+        loc_dict = {"type": "Point", "coordinates": [lng, lat]}
+    return loc_dict
+
+def build_new_request(
+    request: ServiceRequest, loc_dict: Dict[str, Any], agent_id: Optional[str], now: datetime
+):
+    """The document to insert for a new request and its first log event."""
+    request_data = {
+        "_id": ObjectId(),
+        "citizen_ref": request.citizen_ref,
+        "title": request.title,
+        "category": request.category,
+        "description": request.description,
+        "priority": request.priority,
+        "location": loc_dict,
+        "address": request.address,
+        "status": "new",
+        "assignment": {},
+        "timestamps": {
+            "created_at": now,
+            "updated_at": now
+        },
+        "created_at": now
+    }
+    event = None
+    if agent_id:
+        request_data["status"] = "assigned"
+        request_data["assignment"] = {
+            "assigned_agent_id": agent_id,
+            "assignment_policy": "auto"
+        }
+        request_data["timestamps"]["assigned_at"] = now
+        event = {
+            "type": "assigned",
+            "by": {"actor_type": "system", "actor_id": "auto"},
+            "at": now,
+            "meta": {"agent_id": agent_id}
+        }
+    return request_data, event
+
 @router.post("/", response_model=ServiceRequestResponse, status_code=201)
 async def create_request(request: ServiceRequest):
     try:
         now = datetime.utcnow()
         
-        location = request.location
-        loc_coords = None
-        if location is not None:
-            if hasattr(location, "coordinates"):
-                loc_coords = location.coordinates
-            elif isinstance(location, dict):
-                loc_coords = location.get("coordinates")
-        lat = loc_coords[1] if loc_coords and len(loc_coords) > 1 else 0
-        lng = loc_coords[0] if loc_coords and len(loc_coords) > 0 else 0
+        loc_dict = request_location(request)
+        lng, lat = loc_dict["coordinates"][0], loc_dict["coordinates"][1]
         zone_id = get_zone_from_coordinates(lat, lng)
-        loc_dict = None
-        if location is not None:
-            try:
-                loc_dict = location.model_dump()
-            except Exception:
-                loc_dict = dict(location) if isinstance(location, dict) else None
-        if loc_dict is None:
-            loc_dict = {"type": "Point", "coordinates": [lng, lat]}
         loc_dict["zone_id"] = zone_id
         
-        request_data = {
-            "citizen_ref": request.citizen_ref,
-            "title": request.title,
-            "category": request.category,
-            "description": request.description,
-            "priority": request.priority,
-            "location": loc_dict,
-            "address": request.address,
-            "status": "new",
-            "assignment": {},
-            "timestamps": {
-                "created_at": now,
-                "updated_at": now
-            },
-            "created_at": now
-        }
-        
-        result = requests_collection.insert_one(request_data)
-        request_id = result.inserted_id
-        
+        # Decide the assignment before writing so the request is inserted in
+        # its final state; with a warm dispatch index this needs no reads.
         skill_needed = get_skill_from_category(request.category)
+        best_agent = await find_best_agent(zone_id, skill_needed) if zone_id else None
+        agent_id = str(best_agent["_id"]) if best_agent else None
         
-        if zone_id:
-            best_agent = find_best_agent(zone_id, skill_needed)
-            if best_agent:
-                agent_id = str(best_agent["_id"])
-                requests_collection.update_one(
-                    {"_id": request_id},
-                    {"$set": {
-                        "assignment": {
-                            "assigned_agent_id": agent_id,
-                            "assignment_policy": "auto"
-                        },
-                        "status": "assigned",
-                        "timestamps.assigned_at": now
-                    }}
-                )
-                
-                event = {
-                    "type": "assigned",
-                    "by": {"actor_type": "system", "actor_id": "auto"},
-                    "at": now,
-                    "meta": {"agent_id": agent_id}
+        request_data, event = build_new_request(request, loc_dict, agent_id, now)
+        await write_new_request(request_data, event, agent_id)
+        return to_response_doc(request_data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk")
+async def bulk_create_requests(items: List[Dict[str, Any]] = Body(...)):
+    """Create many requests in one call for partner feeds.
+
+    Items are validated one by one; valid ones are zoned in a single registry
+    pass, assigned against one workload snapshot, and written with unordered
+    bulk operations. The response reports each item by its input index.
+    """
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per batch")
+    try:
+        now = datetime.utcnow()
+        results: List[Dict[str, Any]] = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, ServiceRequest.model_validate(item)))
+            except ValidationError as e:
+                results[index] = {
+                    "index": index,
+                    "status": "invalid",
+                    "errors": jsonable_encoder(e.errors(include_url=False, include_context=False)),
                 }
-                performance_logs_collection.insert_one({
-                    "request_id": request_id,
-                    "event_stream": [event],
-                    "created_at": now
-                })
-        
-        created = requests_collection.find_one({"_id": request_id})
-        created["_id"] = str(created["_id"])
-        return created
+
+        locations = [request_location(request) for _, request in valid]
+        zone_ids = get_zone_registry().lookup_many(
+            (loc["coordinates"][1], loc["coordinates"][0]) for loc in locations
+        )
+        if not dispatch_index.ready:
+            await dispatch_index.load()
+        agents = dispatch_index.plan_assignments([
+            (zone_id, get_skill_from_category(request.category))
+            for zone_id, (_, request) in zip(zone_ids, valid)
+        ])
+
+        docs, events = [], []
+        for (index, request), loc_dict, zone_id, agent in zip(valid, locations, zone_ids, agents):
+            loc_dict["zone_id"] = zone_id
+            agent_id = str(agent["_id"]) if agent else None
+            request_data, event = build_new_request(request, loc_dict, agent_id, now)
+            docs.append((index, request_data))
+            events.append(event)
+
+        failed: Dict[int, str] = {}
+        if docs:
+            try:
+                await requests_collection.insert_many([doc for _, doc in docs], ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"]: error.get("errmsg", "write failed") for error in e.details.get("writeErrors", [])}
+                if not failed:
+                    raise
+
+        deltas: Dict[str, int] = {}
+        emitted = []
+        for position, ((index, doc), event) in enumerate(zip(docs, events)):
+            if position in failed:
+                results[index] = {"index": index, "status": "failed", "error": failed[position]}
+                continue
+            agent_id = doc["assignment"].get("assigned_agent_id")
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "_id": str(doc["_id"]),
+                "zone_id": doc["location"]["zone_id"],
+                "agent_id": agent_id,
+            }
+            if agent_id:
+                deltas[agent_id] = deltas.get(agent_id, 0) + 1
+            if event:
+                emitted.append((doc["_id"], event))
+        inserted = [(None, doc) for position, (_, doc) in enumerate(docs) if position not in failed]
+        invalidate_request_tiles(inserted)
+        analytics_engine.apply_changes(inserted)
+        await asyncio.gather(
+            event_sink.emit_many(emitted),
+            adjust_workloads(deltas),
+            apply_rollup_changes(inserted),
+        )
+
+        created = sum(1 for r in results if r["status"] == "created")
+        return {"created": created, "rejected": len(items) - created, "results": results}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def write_new_request(request_data: Dict[str, Any], event: Optional[Dict[str, Any]], agent_id: Optional[str]):
+    """Persist a new request, its first log event and the workload bump.
+
+    With REQUEST_WRITE_TRANSACTIONS enabled (replica set required) the three
+    writes commit atomically; otherwise the follow-up writes run concurrently
+    once the request itself is stored.
+    """
+    if USE_WRITE_TRANSACTIONS:
+        async def write_all(session):
+            await requests_collection.insert_one(request_data, session=session)
+            # Operations inside one transaction must not run concurrently.
+            if event:
+                await record_event(request_data["_id"], event, session=session)
+            if agent_id:
+                await adjust_workload(agent_id, 1, session=session)
+        async with client.start_session() as session:
+            await session.with_transaction(write_all)
+        invalidate_request_tiles([(None, request_data)])
+        analytics_engine.apply_changes([(None, request_data)])
+        await apply_rollup_changes([(None, request_data)])
+        return
+
+    await requests_collection.insert_one(request_data)
+    invalidate_request_tiles([(None, request_data)])
+    analytics_engine.apply_changes([(None, request_data)])
+    writes = []
+    if event:
+        writes.append(event_sink.emit(request_data["_id"], event))
+    if agent_id:
+        writes.append(adjust_workload(agent_id, 1))
+    writes.append(apply_rollup_changes([(None, request_data)]))
+    await asyncio.gather(*writes)
+
 @router.get("/", response_model=List[ServiceRequestResponse])
 async def get_requests(
+    response: Response,
     status: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
     zone_id: Optional[str] = Query(None),
     agent_id: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="Continuation token from X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to return"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000)
 ):
     try:
-        query = {}
-        if status:
-            query["status"] = status
-        if category:
-            query["category"] = category
-        if zone_id:
-            query["location.zone_id"] = zone_id
-        if agent_id:
-            query["assignment.assigned_agent_id"] = agent_id
-        
-        requests_raw = list(requests_collection.find(query).skip(skip).limit(limit))
+        selected = parse_fields(fields)
+        query = build_request_query(status, category, zone_id, agent_id)
+        if cursor:
+            query.update(decode_cursor(cursor))
+        # One row past the page tells whether there is a next page at all.
+        find = requests_collection.find(query, build_projection(selected)).sort(REQUEST_LIST_SORT).limit(limit + 1)
+        if skip and not cursor:
+            # Offset paging is kept for old clients; it costs O(skip).
+            find = find.skip(skip)
+        
+        requests_raw = await find.to_list(None)
+        headers = {}
+        if len(requests_raw) > limit:
+            requests_raw = requests_raw[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(requests_raw[-1])
+        if selected is not None:
+            body = [sparse_doc(req, selected) for req in requests_raw]
+            return JSONResponse(jsonable_encoder(body), headers=headers)
+        response.headers.update(headers)
         safe_list = [to_response_doc(req) for req in requests_raw]
         return safe_list
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+EXPORT_BATCH_SIZE = 1000
+CSV_COLUMNS = [
+    "_id", "request_id", "title", "category", "status", "priority",
+    "zone_id", "lng", "lat", "address", "created_at", "updated_at",
+]
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+async def _export_ndjson(cursor):
+    try:
+        lines = []
+        async for doc in cursor:
+            lines.append(json.dumps(to_response_doc(doc), default=_json_default))
+            if len(lines) >= EXPORT_BATCH_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    finally:
+        await cursor.close()
+
+def _csv_row(doc: Dict[str, Any]) -> List[Any]:
+    item = to_response_doc(doc)
+    location = item["location"]
+    timestamps = item["timestamps"]
+    return [
+        item["_id"], item["request_id"], item["title"], item["category"],
+        item["status"], item["priority"], location["zone_id"],
+        location["coordinates"][0], location["coordinates"][1], item["address"],
+        _json_default(timestamps["created_at"]), _json_default(timestamps["updated_at"]),
+    ]
+
+async def _export_csv(cursor):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    try:
+        async for doc in cursor:
+            writer.writerow(_csv_row(doc))
+            rows += 1
+            if rows % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        await cursor.close()
+
+@router.get("/export")
+async def export_requests(
+    status: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    zone_id: Optional[str] = Query(None),
+    agent_id: Optional[str] = Query(None),
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+):
+    """Stream every matching request as NDJSON or CSV in constant memory."""
+    query = build_request_query(status, category, zone_id, agent_id)
+    cursor = requests_collection.find(
+        query, LIST_PROJECTION, batch_size=EXPORT_BATCH_SIZE
+    ).sort(REQUEST_LIST_SORT)
+    if export_format == "csv":
+        return StreamingResponse(
+            _export_csv(cursor),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="requests.csv"'},
+        )
+    return StreamingResponse(_export_ndjson(cursor), media_type="application/x-ndjson")
+
 @router.get("/{request_id}", response_model=ServiceRequestResponse)
-async def get_request(request_id: str):
+async def get_request(
+    request_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to return"),
+):
     try:
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        doc = requests_collection.find_one({"_id": ObjectId(request_id)})
+        selected = parse_fields(fields)
+        doc = await requests_collection.find_one({"_id": ObjectId(request_id)}, build_projection(selected))
         if not doc:
             raise HTTPException(status_code=404, detail="Request not found")
+        if selected is not None:
+            return JSONResponse(jsonable_encoder(sparse_doc(doc, selected)))
         return to_response_doc(doc)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -241,27 +586,21 @@ async def assign_request(
         if not agent_id or not ObjectId.is_valid(agent_id):
             raise HTTPException(status_code=400, detail="Invalid agent_id")
         
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
-        if not req:
-            raise HTTPException(status_code=404, detail="Request not found")
-        
-        agent = db["service_agents"].find_one({"_id": ObjectId(agent_id)})
+        agent = await db["service_agents"].find_one({"_id": ObjectId(agent_id)}, {"name": 1})
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
         now = datetime.utcnow()
-        requests_collection.update_one(
-            {"_id": ObjectId(request_id)},
-            {"$set": {
-                "assignment": {
-                    "assigned_agent_id": agent_id,
-                    "assignment_policy": "manual"
-                },
-                "status": "assigned",
-                "timestamps.assigned_at": now,
-                "timestamps.updated_at": now
-            }}
-        )
+        before, after = await update_request_if(request_id, ALLOWED_FROM["assigned"], {
+            "assignment": {
+                "assigned_agent_id": agent_id,
+                "assignment_policy": "manual"
+            },
+            "status": "assigned",
+            "timestamps.assigned_at": now,
+            "timestamps.updated_at": now
+        })
+        await publish(before, after)
         
         event = {
             "type": "assigned",
@@ -269,20 +608,11 @@ async def assign_request(
             "at": now,
             "meta": {"agent_id": agent_id}
         }
-        log = performance_logs_collection.find_one({"request_id": ObjectId(request_id)})
-        if log:
-            performance_logs_collection.update_one(
-                {"_id": log["_id"]},
-                {"$push": {"event_stream": event}}
-            )
-        else:
-            performance_logs_collection.insert_one({
-                "request_id": ObjectId(request_id),
-                "event_stream": [event],
-                "created_at": now
-            })
+        await event_sink.emit(ObjectId(request_id), event)
         
         return {"message": "Assigned successfully", "agent_id": agent_id, "agent_name": agent.get("name")}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -300,10 +630,6 @@ async def update_status(
         if new_status not in ("in_progress", "resolved", "closed"):
             raise HTTPException(status_code=400, detail="Invalid status")
         
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
-        if not req:
-            raise HTTPException(status_code=404, detail="Request not found")
-        
         now = datetime.utcnow()
         updates = {
             "status": new_status,
@@ -313,10 +639,8 @@ async def update_status(
         if new_status == "resolved":
             updates["timestamps.resolved_at"] = now
         
-        requests_collection.update_one(
-            {"_id": ObjectId(request_id)},
-            {"$set": updates}
-        )
+        before, after = await update_request_if(request_id, ALLOWED_FROM[new_status], updates)
+        await publish(before, after)
         
         event = {
             "type": f"status_{new_status}",
@@ -324,14 +648,11 @@ async def update_status(
             "at": now,
             "meta": {"status": new_status}
         }
-        log = performance_logs_collection.find_one({"request_id": ObjectId(request_id)})
-        if log:
-            performance_logs_collection.update_one(
-                {"_id": log["_id"]},
-                {"$push": {"event_stream": event}}
-            )
+        await event_sink.emit(ObjectId(request_id), event)
         
         return {"message": f"Status updated to {new_status}"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -341,7 +662,7 @@ async def get_request_comments(request_id: str):
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        comments = list(db["comments"].find({"request_id": ObjectId(request_id)}))
+        comments = await db["comments"].find({"request_id": ObjectId(request_id)}).to_list(None)
         safe_comments = []
         for c in comments:
             safe_c = {
@@ -365,7 +686,7 @@ async def add_comment(request_id: str, payload: Dict[str, Any] = Body(...)):
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
+        req = await requests_collection.find_one({"_id": ObjectId(request_id)})
         if not req:
             raise HTTPException(status_code=404, detail="Request not found")
         
@@ -379,7 +700,7 @@ async def add_comment(request_id: str, payload: Dict[str, Any] = Body(...)):
             "is_internal": payload.get("is_internal", False),
             "created_at": now
         }
-        result = db["comments"].insert_one(comment_doc)
+        result = await db["comments"].insert_one(comment_doc)
         return {
             "_id": str(result.inserted_id),
             "request_id": request_id,
@@ -399,7 +720,7 @@ async def get_request_rating(request_id: str):
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        rating = db["ratings"].find_one({"request_id": ObjectId(request_id)})
+        rating = await db["ratings"].find_one({"request_id": ObjectId(request_id)})
         if not rating:
             return {}
         
@@ -422,7 +743,7 @@ async def add_rating(request_id: str, payload: Dict[str, Any] = Body(...)):
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
+        req = await requests_collection.find_one({"_id": ObjectId(request_id)})
         if not req:
             raise HTTPException(status_code=404, detail="Request not found")
         
@@ -436,7 +757,7 @@ async def add_rating(request_id: str, payload: Dict[str, Any] = Body(...)):
             "dispute_flag": False,
             "created_at": now
         }
-        result = db["ratings"].insert_one(rating_doc)
+        result = await db["ratings"].insert_one(rating_doc)
         return {
             "_id": str(result.inserted_id),
             "request_id": request_id,
@@ -456,7 +777,7 @@ async def add_evidence(request_id: str, payload: Dict[str, Any] = Body(...)):
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
+        req = await requests_collection.find_one({"_id": ObjectId(request_id)})
         if not req:
             raise HTTPException(status_code=404, detail="Request not found")
         
@@ -468,7 +789,13 @@ async def add_evidence(request_id: str, payload: Dict[str, Any] = Body(...)):
             "uploaded_by": payload.get("uploaded_by", "citizen"),
             "uploaded_at": now
         }
-        requests_collection.update_one(
+        # Attaching a hash we already store points at that blob instead.
+        blob = await reference_blob(evidence["sha256"]) if evidence["sha256"] else None
+        if blob:
+            evidence["url"] = blob_url(blob)
+            evidence["size"] = blob.get("size")
+            evidence["derivatives"] = derivative_urls(blob)
+        await requests_collection.update_one(
             {"_id": ObjectId(request_id)},
             {"$push": {"evidence": evidence}}
         )
@@ -493,40 +820,47 @@ async def upload_evidence(
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
 
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
+        req = await requests_collection.find_one({"_id": ObjectId(request_id)}, {"_id": 1})
         if not req:
             raise HTTPException(status_code=404, detail="Request not found")
 
         now = datetime.utcnow()
-        original_name = file.filename or "upload"
-        ext = os.path.splitext(original_name)[1]
-        safe_ext = ext if ext.lower() in (".jpg", ".jpeg", ".png", ".gif", ".webp", ".pdf") else ""
-        filename = f"{uuid4().hex}{safe_ext}"
-        filepath = os.path.join(UPLOAD_DIR, filename)
-
-        with open(filepath, "wb") as f:
-            f.write(await file.read())
+        try:
+            blob = await store_upload(file, file.content_type)
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail=f"File exceeds {MAX_UPLOAD_BYTES} bytes")
 
-        file_url = f"/uploads/{filename}"
+        file_url = blob_url(blob)
+        sha256, size = blob["_id"], blob["size"]
         evidence = {
             "type": evidence_type or "photo",
             "url": file_url,
-            "sha256": None,
+            "sha256": sha256,
+            "size": size,
+            "derivatives": derivative_urls(blob),
             "uploaded_by": uploaded_by or "citizen",
             "uploaded_at": now,
         }
 
-        requests_collection.update_one(
+        await requests_collection.update_one(
             {"_id": ObjectId(request_id)},
             {"$push": {"evidence": evidence}},
         )
+        if evidence["derivatives"] is None:
+            # Thumbnails are linked onto the entry when the worker finishes.
+            derivative_pipeline.submit(blob)
 
         return {
             "url": file_url,
             "type": evidence["type"],
+            "sha256": sha256,
+            "size": size,
+            "derivatives": evidence["derivatives"],
             "uploaded_by": evidence["uploaded_by"],
             "uploaded_at": now.isoformat(),
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -540,19 +874,15 @@ async def transition_request(request_id: str, payload: Dict[str, Any] = Body(...
         if new_state not in ("new", "triaged", "assigned", "in_progress", "resolved", "closed"):
             raise HTTPException(status_code=400, detail="Invalid state")
         
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
-        if not req:
-            raise HTTPException(status_code=404, detail="Request not found")
-        
         now = datetime.utcnow()
-        requests_collection.update_one(
-            {"_id": ObjectId(request_id)},
-            {"$set": {
-                "status": new_state,
-                "timestamps.updated_at": now
-            }}
-        )
+        before, after = await update_request_if(request_id, ALLOWED_FROM[new_state], {
+            "status": new_state,
+            "timestamps.updated_at": now
+        })
+        await publish(before, after)
         return {"message": f"Transitioned to {new_state}", "status": new_state}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -564,7 +894,7 @@ async def auto_assign_request(request_id: str, x_staff_key: Optional[str] = Head
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
+        req = await requests_collection.find_one({"_id": ObjectId(request_id)}, {"location": 1, "category": 1})
         if not req:
             raise HTTPException(status_code=404, detail="Request not found")
         
@@ -576,24 +906,22 @@ async def auto_assign_request(request_id: str, x_staff_key: Optional[str] = Head
         category = req.get("category", "general")
         skill_needed = get_skill_from_category(category)
         
-        best_agent = find_best_agent(zone_id, skill_needed)
+        best_agent = await find_best_agent(zone_id, skill_needed)
         if not best_agent:
             raise HTTPException(status_code=400, detail="No suitable agent found")
         
         agent_id = str(best_agent["_id"])
         now = datetime.utcnow()
-        requests_collection.update_one(
-            {"_id": ObjectId(request_id)},
-            {"$set": {
-                "assignment": {
-                    "assigned_agent_id": agent_id,
-                    "assignment_policy": "auto"
-                },
-                "status": "assigned",
-                "timestamps.assigned_at": now,
-                "timestamps.updated_at": now
-            }}
-        )
+        before, after = await update_request_if(request_id, ALLOWED_FROM["assigned"], {
+            "assignment": {
+                "assigned_agent_id": agent_id,
+                "assignment_policy": "auto"
+            },
+            "status": "assigned",
+            "timestamps.assigned_at": now,
+            "timestamps.updated_at": now
+        })
+        await publish(before, after)
         
         event = {
             "type": "assigned",
@@ -601,20 +929,11 @@ async def auto_assign_request(request_id: str, x_staff_key: Optional[str] = Head
             "at": now,
             "meta": {"agent_id": agent_id}
         }
-        log = performance_logs_collection.find_one({"request_id": ObjectId(request_id)})
-        if log:
-            performance_logs_collection.update_one(
-                {"_id": log["_id"]},
-                {"$push": {"event_stream": event}}
-            )
-        else:
-            performance_logs_collection.insert_one({
-                "request_id": ObjectId(request_id),
-                "event_stream": [event],
-                "created_at": now
-            })
+        await event_sink.emit(ObjectId(request_id), event)
         
         return {"message": "Auto-assigned", "agent_id": agent_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -626,42 +945,30 @@ async def add_milestone(request_id: str, payload: Dict[str, Any] = Body(...), x_
         
         milestone_type = payload.get("type", "progress")
         
-        req = requests_collection.find_one({"_id": ObjectId(request_id)})
-        if not req:
-            raise HTTPException(status_code=404, detail="Request not found")
-        
+        now = datetime.utcnow()
+        updates: Dict[str, Any] = {"timestamps.updated_at": now}
+        allowed_from = OPEN_REQUEST_STATUSES
         if milestone_type == "resolved":
-            requests_collection.update_one(
-                {"_id": ObjectId(request_id)},
-                {"$set": {"status": "resolved", "timestamps.resolved_at": datetime.utcnow()}}
-            )
+            updates.update({"status": "resolved", "timestamps.resolved_at": now})
+            allowed_from = ALLOWED_FROM["resolved"]
         elif milestone_type == "arrived":
-            requests_collection.update_one(
-                {"_id": ObjectId(request_id)},
-                {"$set": {"status": "in_progress"}}
-            )
+            updates["status"] = "in_progress"
+            allowed_from = ALLOWED_FROM["in_progress"]
+        
+        before, after = await update_request_if(request_id, allowed_from, updates)
+        await publish(before, after)
         
-        now = datetime.utcnow()
         event = {
             "type": f"milestone_{milestone_type}",
             "by": {"actor_type": "agent", "actor_id": x_agent_id or "system"},
             "at": now,
             "meta": {"milestone": milestone_type}
         }
-        log = performance_logs_collection.find_one({"request_id": ObjectId(request_id)})
-        if log:
-            performance_logs_collection.update_one(
-                {"_id": log["_id"]},
-                {"$push": {"event_stream": event}}
-            )
-        else:
-            performance_logs_collection.insert_one({
-                "request_id": ObjectId(request_id),
-                "event_stream": [event],
-                "created_at": now
-            })
+        await event_sink.emit(ObjectId(request_id), event)
         
         return {"message": f"Milestone {milestone_type} recorded"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -671,9 +978,11 @@ async def delete_request(request_id: str):
         if not ObjectId.is_valid(request_id):
             raise HTTPException(status_code=400, detail="Invalid ID")
         
-        result = requests_collection.delete_one({"_id": ObjectId(request_id)})
-        if result.deleted_count == 0:
+        deleted = await requests_collection.find_one_and_delete({"_id": ObjectId(request_id)})
+        if not deleted:
             raise HTTPException(status_code=404, detail="Request not found")
+        await publish(deleted, None)
+        await release_blobs(deleted.get("evidence"))
         
         return {"message": "Request deleted"}
     except Exception as e:
@@ -0,0 +1,32 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Path, Query
+from pymongo.errors import ExecutionTimeout
+
+from app.geo_feeds import OPEN_STATUSES
+from app.tiles import TILE_MAX_ZOOM, get_tile
+
+router = APIRouter()
+
+
+@router.get("/{z}/{x}/{y}")
+async def map_tile(
+    z: int = Path(..., ge=0, le=TILE_MAX_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    status: Optional[str] = Query(None, description="Comma-separated statuses; open statuses by default"),
+    category: Optional[str] = Query(None),
+    zone: Optional[str] = Query(None),
+):
+    """Return the requests in one web-mercator tile for the live map.
+
+    Geometry is a Google encoded polyline of lat/lng at `precision` decimals.
+    Zoomed-out or crowded tiles come back as clusters with per-point counts.
+    """
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    statuses = tuple(sorted({s for s in status.split(",") if s})) if status else tuple(OPEN_STATUSES)
+    try:
+        return await get_tile(z, x, y, statuses, category, zone)
+    except ExecutionTimeout:
+        raise HTTPException(status_code=503, detail="Tile query exceeded its time budget")
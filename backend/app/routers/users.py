@@ -10,7 +10,7 @@ router = APIRouter()
 async def get_all_users(role: str = None):
     try:
         query = {"role": role} if role else {}
-        users = list(users_collection.find(query))
+        users = await users_collection.find(query).to_list(None)
         return users
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -18,7 +18,7 @@ async def get_all_users(role: str = None):
 @router.get("/{user_id}", response_model=User)
 async def get_user(user_id: str):
     try:
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return user
@@ -28,13 +28,13 @@ async def get_user(user_id: str):
 @router.post("/", response_model=User)
 async def create_user(user: User):
     try:
-        existing = users_collection.find_one({"email": user.email})
+        existing = await users_collection.find_one({"email": user.email})
         if existing:
             raise HTTPException(status_code=400, detail="Email already exists")
         
         user_dict = user.dict(exclude={"id"}, exclude_none=True)
-        result = users_collection.insert_one(user_dict)
-        created_user = users_collection.find_one({"_id": result.inserted_id})
+        result = await users_collection.insert_one(user_dict)
+        created_user = await users_collection.find_one({"_id": result.inserted_id})
         return created_user
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -43,13 +43,13 @@ async def create_user(user: User):
 async def update_user(user_id: str, user: User):
     try:
         update_data = user.dict(exclude={"id"}, exclude_none=True)
-        result = users_collection.update_one(
+        result = await users_collection.update_one(
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
-        updated_user = users_collection.find_one({"_id": ObjectId(user_id)})
+        updated_user = await users_collection.find_one({"_id": ObjectId(user_id)})
         return updated_user
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -57,7 +57,7 @@ async def update_user(user_id: str, user: User):
 @router.delete("/{user_id}")
 async def delete_user(user_id: str):
     try:
-        result = users_collection.delete_one({"_id": ObjectId(user_id)})
+        result = await users_collection.delete_one({"_id": ObjectId(user_id)})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
         return {"message": "User deleted successfully"}
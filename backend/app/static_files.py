@@ -0,0 +1,89 @@
+import mimetypes
+import os
+import re
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+# Evidence files are written once under a name derived from their content
+# (or a random uuid for older uploads) and never modified, so browsers and
+# CDNs may keep them for a year without revalidating.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CONTENT_ADDRESSED_NAME = re.compile(r"^([0-9a-f]{64}(?:\.[a-z]+)?)\.[a-z0-9]+$")
+FILE_CHUNK_BYTES = 1024 * 1024
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding value allows gzip (RFC 9110 section 12.5.3).
+
+    An explicit gzip entry decides; otherwise `*` does. A q-value of 0, or
+    one that does not parse, means not acceptable.
+    """
+    qualities = {}
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+class EvidenceFileResponse(FileResponse):
+    # Fewer, larger reads when the server cannot send the file itself.
+    chunk_size = FILE_CHUNK_BYTES
+
+
+class EvidenceStaticFiles(StaticFiles):
+    """StaticFiles for /uploads with headers suited to write-once files.
+
+    - Cache-Control: immutable with a one-year max-age.
+    - Strong ETag taken from the SHA-256 in content-addressed names, so it
+      survives copies, restores and multiple servers. Older files keep
+      Starlette's mtime/size tag.
+    - A precompressed `<file>.gz` sibling is sent to clients that accept
+      gzip, except for Range requests, which always get the identity bytes.
+
+    Range/If-Range (206/416) come from FileResponse. So does zero-copy
+    delivery, which uses the ASGI pathsend extension when the server offers it.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+        match = CONTENT_ADDRESSED_NAME.match(name)
+        etag = match.group(1) if match else None
+
+        path = full_path
+        gzip_path = f"{full_path}.gz"
+        if os.path.isfile(gzip_path):
+            headers["Vary"] = "Accept-Encoding"
+            if "range" not in request_headers and accepts_gzip(request_headers.get("accept-encoding", "")):
+                path = gzip_path
+                stat_result = os.stat(gzip_path)
+                headers["Content-Encoding"] = "gzip"
+                etag = f"{etag}.gz" if etag else None
+        if etag:
+            headers["ETag"] = f'"{etag}"'
+
+        response = EvidenceFileResponse(
+            path, status_code=status_code, stat_result=stat_result, headers=headers, media_type=media_type
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
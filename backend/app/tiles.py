@@ -0,0 +1,176 @@
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.database import ANALYTICS_MAX_TIME_MS, requests_collection
+from app.geo_grid import bbox_filter
+from app.result_cache import ResultCache
+
+TILE_MAX_ZOOM = 22
+# Tiles at or below this zoom are always served as clusters.
+TILE_CLUSTER_MAX_ZOOM = int(os.getenv("TILE_CLUSTER_MAX_ZOOM", "12"))
+# A points tile holding more requests than this is clustered instead.
+TILE_MAX_POINTS = int(os.getenv("TILE_MAX_POINTS", "2000"))
+# Clusters per tile edge: 8 gives 32px cells on a 256px tile.
+TILE_CLUSTER_CELLS = int(os.getenv("TILE_CLUSTER_CELLS", "8"))
+TILE_CACHE_TTL_SECONDS = float(os.getenv("TILE_CACHE_TTL_SECONDS", "60"))
+TILE_CACHE_MAX_ENTRIES = int(os.getenv("TILE_CACHE_MAX_ENTRIES", "4096"))
+# A change moving more points than this (a bulk import) clears the tile cache
+# once instead of computing the affected tiles at every zoom for each point.
+TILE_INVALIDATE_MAX_POINTS = int(os.getenv("TILE_INVALIDATE_MAX_POINTS", "256"))
+POLYLINE_PRECISION = 5
+MAX_MERCATOR_LAT = 85.0511287798
+
+TILE_PROJECTION = {"location.coordinates": 1, "status": 1, "priority": 1, "category": 1}
+
+# Keys are (z, x, y, statuses, category, zone). Entries are dropped when a
+# request inside the tile changes in this process; the TTL bounds how long
+# other processes keep serving a tile after a change they did not see.
+tile_cache = ResultCache(ttl=TILE_CACHE_TTL_SECONDS, stale=0, max_entries=TILE_CACHE_MAX_ENTRIES)
+
+
+def _tile_lat(y: float, n: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) of web-mercator tile z/x/y."""
+    n = 2 ** z
+    return x / n * 360 - 180, _tile_lat(y + 1, n), (x + 1) / n * 360 - 180, _tile_lat(y, n)
+
+
+def tile_for(lng: float, lat: float, z: int) -> Tuple[int, int]:
+    n = 2 ** z
+    lat = max(min(lat, MAX_MERCATOR_LAT), -MAX_MERCATOR_LAT)
+    x = int((lng + 180) / 360 * n)
+    rad = math.radians(lat)
+    y = int((1 - math.log(math.tan(rad) + 1 / math.cos(rad)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_containing(lng: float, lat: float, z: int) -> List[Tuple[int, int]]:
+    """Every tile at zoom z whose tile_bounds hold the point, edges included.
+
+    Tiles are queried with inclusive bounds (bbox_filter), so a point on a
+    shared edge or corner is in two or four tiles.
+    """
+    n = 2 ** z
+    x0, y0 = tile_for(lng, lat, z)
+    xs = [x for x in range(max(x0 - 1, 0), min(x0 + 2, n)) if x / n * 360 - 180 <= lng <= (x + 1) / n * 360 - 180]
+    ys = [y for y in range(max(y0 - 1, 0), min(y0 + 2, n)) if _tile_lat(y + 1, n) <= lat <= _tile_lat(y, n)]
+    return [(x, y) for x in xs for y in ys] or [(x0, y0)]
+
+
+def encode_polyline(points: Iterable[Sequence[float]], precision: int = POLYLINE_PRECISION) -> str:
+    """Google encoded-polyline string for (lng, lat) points, stored lat first."""
+    factor = 10 ** precision
+    chunks = []
+    previous_lat = previous_lng = 0
+    for lng, lat in points:
+        lat_e, lng_e = round(lat * factor), round(lng * factor)
+        for delta in (lat_e - previous_lat, lng_e - previous_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        previous_lat, previous_lng = lat_e, lng_e
+    return "".join(chunks)
+
+
+def _cluster_pipeline(query: Dict[str, Any], z: int, x: int, y: int) -> List[Dict[str, Any]]:
+    """Group a tile's requests into TILE_CLUSTER_CELLS² screen cells.
+
+    Cell edges are computed here in mercator pixel space. The pipeline only
+    counts how many edges lie west of or north of each point.
+    """
+    west, _, east, _ = tile_bounds(z, x, y)
+    n = 2 ** z * TILE_CLUSTER_CELLS
+    cols = [west + (east - west) * i / TILE_CLUSTER_CELLS for i in range(1, TILE_CLUSTER_CELLS)]
+    rows = [_tile_lat(y * TILE_CLUSTER_CELLS + i, n) for i in range(1, TILE_CLUSTER_CELLS)]
+    lng = {"$arrayElemAt": ["$location.coordinates", 0]}
+    lat = {"$arrayElemAt": ["$location.coordinates", 1]}
+    return [
+        {"$match": query},
+        {"$project": {
+            "lng": lng,
+            "lat": lat,
+            "col": {"$size": {"$filter": {"input": cols, "cond": {"$lte": ["$$this", lng]}}}},
+            "row": {"$size": {"$filter": {"input": rows, "cond": {"$gt": ["$$this", lat]}}}},
+        }},
+        {"$group": {"_id": {"col": "$col", "row": "$row"}, "count": {"$sum": 1}, "lng": {"$avg": "$lng"}, "lat": {"$avg": "$lat"}}},
+        {"$sort": {"_id.row": 1, "_id.col": 1}},
+    ]
+
+
+async def render_tile(
+    z: int, x: int, y: int, statuses: Tuple[str, ...], category: Optional[str], zone: Optional[str]
+) -> Dict[str, Any]:
+    """Requests in one tile: encoded points, or clusters when zoomed out or crowded.
+
+    Points come with parallel `ids`, `status`, `priority` and `category`
+    lists in the order of the encoded geometry; clusters carry `counts`.
+    """
+    query: Dict[str, Any] = {"status": {"$in": list(statuses)}, **bbox_filter(tile_bounds(z, x, y))}
+    if category:
+        query["category"] = category
+    if zone:
+        query["location.zone_id"] = zone
+    tile: Dict[str, Any] = {"z": z, "x": x, "y": y, "precision": POLYLINE_PRECISION}
+
+    if z > TILE_CLUSTER_MAX_ZOOM:
+        docs = await requests_collection.find(query, TILE_PROJECTION).limit(TILE_MAX_POINTS + 1) \
+            .max_time_ms(ANALYTICS_MAX_TIME_MS).to_list(None)
+        if len(docs) <= TILE_MAX_POINTS:
+            # West to east keeps successive deltas, and so the encoding, short.
+            docs.sort(key=lambda doc: doc["location"]["coordinates"][0])
+            tile.update(
+                kind="points",
+                count=len(docs),
+                geometry=encode_polyline(doc["location"]["coordinates"] for doc in docs),
+                ids=[str(doc["_id"]) for doc in docs],
+                status=[doc.get("status") for doc in docs],
+                priority=[doc.get("priority") for doc in docs],
+                category=[doc.get("category") for doc in docs],
+            )
+            return tile
+
+    cursor = await requests_collection.aggregate(_cluster_pipeline(query, z, x, y), maxTimeMS=ANALYTICS_MAX_TIME_MS)
+    clusters = await cursor.to_list(None)
+    tile.update(
+        kind="clusters",
+        count=sum(cluster["count"] for cluster in clusters),
+        geometry=encode_polyline((cluster["lng"], cluster["lat"]) for cluster in clusters),
+        counts=[cluster["count"] for cluster in clusters],
+    )
+    return tile
+
+
+async def get_tile(
+    z: int, x: int, y: int, statuses: Tuple[str, ...], category: Optional[str], zone: Optional[str]
+) -> Dict[str, Any]:
+    key = (z, x, y, statuses, category, zone)
+    return await tile_cache.get(key, lambda: render_tile(z, x, y, statuses, category, zone))
+
+
+def _coordinates(doc: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    coords = ((doc or {}).get("location") or {}).get("coordinates")
+    if not coords or len(coords) != 2:
+        return None
+    return coords[0], coords[1]
+
+
+def invalidate_request_tiles(changes: Iterable[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> int:
+    """Drop cached tiles, at every zoom, containing a changed request's old or new position."""
+    points = set()
+    for before, after in changes:
+        points |= {_coordinates(before), _coordinates(after)} - {None}
+    if not points:
+        return 0
+    if len(points) > TILE_INVALIDATE_MAX_POINTS:
+        return tile_cache.invalidate_where(lambda key: True)
+    tiles = set()
+    for point in points:
+        for z in range(TILE_MAX_ZOOM + 1):
+            tiles.update((z, x, y) for x, y in tiles_containing(point[0], point[1], z))
+    return tile_cache.invalidate_where(lambda key: key[:3] in tiles)
@@ -0,0 +1,91 @@
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.database import service_agents_collection
+from app.dispatch import OPEN_WORKLOAD_STATUSES, dispatch_index
+
+
+def workload_owner(doc: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Agent whose open-ticket counter this request contributes to, if any."""
+    if not doc or doc.get("status") not in OPEN_WORKLOAD_STATUSES:
+        return None
+    agent_id = (doc.get("assignment") or {}).get("assigned_agent_id")
+    return str(agent_id) if agent_id else None
+
+
+async def adjust_workload(agent_id: str, delta: int, session=None):
+    if not delta or not ObjectId.is_valid(agent_id):
+        return
+    await service_agents_collection.update_one(
+        {"_id": ObjectId(agent_id)},
+        {"$inc": {"open_workload": delta}},
+        session=session,
+    )
+    dispatch_index.adjust_workload(agent_id, delta)
+
+
+async def adjust_workloads(deltas: Dict[str, int]):
+    """Apply many counter changes with one unordered bulk write."""
+    deltas = {agent_id: delta for agent_id, delta in deltas.items() if delta and ObjectId.is_valid(agent_id)}
+    if not deltas:
+        return
+    await service_agents_collection.bulk_write(
+        [UpdateOne({"_id": ObjectId(agent_id)}, {"$inc": {"open_workload": delta}}) for agent_id, delta in deltas.items()],
+        ordered=False,
+    )
+    for agent_id, delta in deltas.items():
+        dispatch_index.adjust_workload(agent_id, delta)
+
+
+async def apply_workload_change(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Move a request's contribution between agent counters after a write.
+
+    `before`/`after` are the request as it was and as it now is (None for
+    insert/delete); only status and assignment are looked at.
+    """
+    old_agent, new_agent = workload_owner(before), workload_owner(after)
+    if old_agent == new_agent:
+        return
+    if old_agent:
+        await adjust_workload(old_agent, -1)
+    if new_agent:
+        await adjust_workload(new_agent, 1)
+
+
+def reconcile_workloads(db) -> int:
+    """Recount open tickets per agent and overwrite drifted counters.
+
+    Takes a blocking database handle; returns how many agents were corrected.
+    """
+    pipeline = [
+        {"$match": {
+            "status": {"$in": list(OPEN_WORKLOAD_STATUSES)},
+            "assignment.assigned_agent_id": {"$ne": None},
+        }},
+        {"$group": {"_id": "$assignment.assigned_agent_id", "count": {"$sum": 1}}},
+    ]
+    actual: Dict[str, int] = {}
+    for doc in db["service_requests"].aggregate(pipeline):
+        agent_id = str(doc["_id"])
+        actual[agent_id] = actual.get(agent_id, 0) + doc["count"]
+
+    ops = []
+    for agent in db["service_agents"].find({}, {"open_workload": 1}):
+        expected = actual.get(str(agent["_id"]), 0)
+        if agent.get("open_workload") != expected:
+            ops.append(UpdateOne({"_id": agent["_id"]}, {"$set": {"open_workload": expected}}))
+    if ops:
+        db["service_agents"].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def backfill_workloads(db) -> int:
+    """Reconcile only if some agent has no open_workload counter yet.
+
+    Run by `python manage.py migrate`; returns how many agents were corrected.
+    """
+    if not db["service_agents"].count_documents({"open_workload": {"$exists": False}}, limit=1):
+        return 0
+    return reconcile_workloads(db)
@@ -0,0 +1,152 @@
+import json
+import math
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+UNKNOWN_ZONE = "UNKNOWN"
+
+ZONES_GEOJSON = os.getenv(
+    "ZONES_GEOJSON",
+    os.path.join(os.path.dirname(__file__), "data", "zones.geojson"),
+)
+# Edge length, in degrees, of the grid buckets used to shortlist polygons.
+ZONE_GRID_CELL_DEG = float(os.getenv("ZONE_GRID_CELL_DEG", "0.01"))
+
+Ring = List[Tuple[float, float]]
+
+
+def _point_in_ring(lng: float, lat: float, ring: Ring) -> bool:
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _on_ring_edge(lng: float, lat: float, ring: Ring, tolerance: float = 1e-12) -> bool:
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (
+            min(xi, xj) <= lng <= max(xi, xj)
+            and min(yi, yj) <= lat <= max(yi, yj)
+            and abs((xj - xi) * (lat - yi) - (yj - yi) * (lng - xi)) <= tolerance
+        ):
+            return True
+        j = i
+    return False
+
+
+class _ZonePolygon:
+    __slots__ = ("zone_id", "order", "outer", "holes", "bbox")
+
+    def __init__(self, zone_id: str, order: int, rings: Sequence[Sequence[Sequence[float]]]):
+        self.zone_id = zone_id
+        self.order = order
+        self.outer: Ring = [(float(x), float(y)) for x, y, *_ in rings[0]]
+        self.holes: List[Ring] = [[(float(x), float(y)) for x, y, *_ in ring] for ring in rings[1:]]
+        xs = [x for x, _ in self.outer]
+        ys = [y for _, y in self.outer]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+
+    def contains(self, lng: float, lat: float) -> bool:
+        """Point-in-polygon with edges included, holes' edges too."""
+        min_x, min_y, max_x, max_y = self.bbox
+        if not (min_x <= lng <= max_x and min_y <= lat <= max_y):
+            return False
+        if _on_ring_edge(lng, lat, self.outer):
+            return True
+        if not _point_in_ring(lng, lat, self.outer):
+            return False
+        return not any(
+            _point_in_ring(lng, lat, hole) and not _on_ring_edge(lng, lat, hole) for hole in self.holes
+        )
+
+
+class ZoneRegistry:
+    """Service zones loaded from GeoJSON with a grid-bucket spatial index.
+
+    Every polygon is registered in the grid cells its bounding box touches, so
+    a lookup only runs point-in-polygon tests against the few polygons sharing
+    the point's cell. A point on an edge belongs to the polygon, so where zones
+    overlap or share an edge, the one listed first in the file wins.
+    """
+
+    def __init__(self, cell_deg: float = ZONE_GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._polygons: List[_ZonePolygon] = []
+        self._grid: Dict[Tuple[int, int], List[_ZonePolygon]] = defaultdict(list)
+        self.zone_ids: List[str] = []
+
+    @classmethod
+    def from_file(cls, path: str = ZONES_GEOJSON, cell_deg: float = ZONE_GRID_CELL_DEG) -> "ZoneRegistry":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_geojson(json.load(f), cell_deg)
+
+    @classmethod
+    def from_geojson(cls, collection: Dict, cell_deg: float = ZONE_GRID_CELL_DEG) -> "ZoneRegistry":
+        registry = cls(cell_deg)
+        for order, feature in enumerate(collection.get("features", [])):
+            props = feature.get("properties") or {}
+            zone_id = props.get("zone_id") or feature.get("id")
+            geometry = feature.get("geometry") or {}
+            if not zone_id or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+                continue
+            parts = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+            for rings in parts:
+                registry._register(_ZonePolygon(zone_id, order, rings))
+            registry.zone_ids.append(zone_id)
+        return registry
+
+    def _cell(self, lng: float, lat: float) -> Tuple[int, int]:
+        return math.floor(lng / self.cell_deg), math.floor(lat / self.cell_deg)
+
+    def _register(self, polygon: _ZonePolygon):
+        self._polygons.append(polygon)
+        min_x, min_y, max_x, max_y = polygon.bbox
+        x0, y0 = self._cell(min_x, min_y)
+        x1, y1 = self._cell(max_x, max_y)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                # Polygons are registered in file order, so buckets stay sorted.
+                self._grid[(cx, cy)].append(polygon)
+
+    def lookup(self, lat: float, lng: float) -> str:
+        return self._lookup_in(self._grid.get(self._cell(lng, lat)), lat, lng)
+
+    def _lookup_in(self, candidates: Optional[List[_ZonePolygon]], lat: float, lng: float) -> str:
+        for polygon in candidates or ():
+            if polygon.contains(lng, lat):
+                return polygon.zone_id
+        return UNKNOWN_ZONE
+
+    def lookup_many(self, points: Iterable[Tuple[float, float]]) -> List[str]:
+        """Resolve many (lat, lng) points in one call, in input order."""
+        grid_get = self._grid.get
+        cell_deg = self.cell_deg
+        floor = math.floor
+        lookup_in = self._lookup_in
+        return [
+            lookup_in(grid_get((floor(lng / cell_deg), floor(lat / cell_deg))), lat, lng)
+            for lat, lng in points
+        ]
+
+
+_registry: Optional[ZoneRegistry] = None
+
+
+def get_zone_registry() -> ZoneRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ZoneRegistry.from_file()
+    return _registry
+
+
+def get_zone_from_coordinates(lat: float, lng: float) -> str:
+    return get_zone_registry().lookup(lat, lng)
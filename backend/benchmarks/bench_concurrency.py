@@ -0,0 +1,114 @@
+"""Concurrent throughput benchmark for a running API instance.
+
+Fires a mix of cheap and expensive GETs from many client threads at once and
+reports requests/second plus latency percentiles per endpoint. Run it against
+the same database before and after a change to compare, e.g.:
+
+    uvicorn app.main:app --port 8000 --workers 1
+    python benchmarks/bench_concurrency.py --base-url http://localhost:8000 -c 64 -n 2000
+
+With a single worker a blocking driver serialises every request behind the
+slowest aggregation; with the async data layer the cheap endpoints keep
+answering while /analytics/kpis is in flight.
+
+--create switches to citizen submissions (POST /requests/) to measure
+submission latency percentiles under load.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PATHS = [
+    "/health",
+    "/requests/?limit=50",
+    "/analytics/kpis",
+    "/agents/",
+]
+
+
+CREATE_PATH = "POST /requests/"
+
+
+def submission_body() -> bytes:
+    return json.dumps({
+        "title": "Benchmark pothole",
+        "description": "Synthetic submission from bench_concurrency",
+        "category": random.choice(["pothole", "streetlight", "water_leak", "missed_trash"]),
+        "priority": random.choice(["P1", "P2", "P3"]),
+        "location": {
+            "type": "Point",
+            "coordinates": [35.90 + random.random() * 0.03, 31.93 + random.random() * 0.03],
+        },
+    }).encode()
+
+
+def fetch(base_url: str, path: str):
+    started = time.perf_counter()
+    if path == CREATE_PATH:
+        request = urllib.request.Request(
+            base_url + "/requests/",
+            data=submission_body(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+    else:
+        request = base_url + path
+    try:
+        with urllib.request.urlopen(request, timeout=60) as resp:
+            resp.read()
+            ok = 200 <= resp.status < 300
+    except Exception:
+        ok = False
+    return path, ok, time.perf_counter() - started
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument("--path", action="append", dest="paths", help="endpoint to hit (repeatable)")
+    parser.add_argument("--create", action="store_true", help="benchmark POST /requests/ submissions")
+    args = parser.parse_args()
+
+    paths = [CREATE_PATH] if args.create else (args.paths or DEFAULT_PATHS)
+    jobs = [paths[i % len(paths)] for i in range(args.requests)]
+
+    latencies = defaultdict(list)
+    failures = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for path, ok, elapsed in pool.map(lambda p: fetch(args.base_url, p), jobs):
+            latencies[path].append(elapsed)
+            failures += 0 if ok else 1
+    wall = time.perf_counter() - started
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {wall:.2f}s wall")
+    print(f"throughput: {args.requests / wall:.1f} req/s, failures: {failures}")
+    print(f"{'endpoint':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for path in paths:
+        values = latencies[path]
+        print(
+            f"{path:<28}"
+            f"{percentile(values, 50) * 1000:>10.1f}"
+            f"{percentile(values, 95) * 1000:>10.1f}"
+            f"{percentile(values, 99) * 1000:>10.1f}"
+            f"{statistics.fmean(values) * 1000 if values else 0:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
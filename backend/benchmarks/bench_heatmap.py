@@ -0,0 +1,150 @@
+"""Heatmap feed: per-document Python loop vs NumPy columns.
+
+Feeds the same cursor batches of synthetic open requests through both
+implementations and reports, per size:
+
+- weights: the weight formula alone, one document at a time vs vectorised.
+- feed: documents to GeoJSON bytes. The loop builds a dict per feature and
+  json.dumps the collection, as the handler used to; the columnar path is
+  FeedColumns.from_docs per batch plus render_feed. With --fastapi-encoder the
+  loop also pays for FastAPI's jsonable_encoder, which is what returning the
+  dict from the handler cost.
+
+    python benchmarks/bench_heatmap.py --sizes 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.geo_feeds import FeedColumns, feed_weights, render_feed
+
+BATCH = 10000
+
+
+def make_batch(now, size=BATCH):
+    rng = random.Random(7)
+    return [
+        {
+            "_id": ObjectId(),
+            "category": rng.choice(["pothole", "streetlight", "graffiti", "water_leak"]),
+            "status": rng.choice(["new", "triaged", "assigned", "in_progress"]),
+            "priority": rng.choice(["P0", "P1", "P2", "P3", None]),
+            "location": {"type": "Point", "coordinates": [35.1 + rng.random() * 0.3, 31.8 + rng.random() * 0.3]},
+            "timestamps": {"created_at": now - timedelta(hours=rng.uniform(0, 2000))},
+        }
+        for _ in range(size)
+    ]
+
+
+def batches(batch, total):
+    """The same documents, served as `total / len(batch)` cursor batches."""
+    for _ in range(total // len(batch)):
+        yield batch
+
+
+def loop_weights(docs, now):
+    weights = []
+    for doc in docs:
+        created = (doc.get("timestamps") or {}).get("created_at") or now
+        age_hours = max((now - created).total_seconds() / 3600, 0)
+        priority = (doc.get("priority") or "P3").upper()
+        p_weight = {"P0": 4.0, "P1": 3.0, "P2": 2.0, "P3": 1.0}.get(priority, 1.0)
+        weights.append(p_weight * (1 + (age_hours ** 0.5)))
+    return weights
+
+
+def loop_feed(docs, now):
+    """The heatmap handler's original per-document loop."""
+    features = []
+    for doc in docs:
+        loc = doc.get("location") or {}
+        coords = loc.get("coordinates")
+        if not coords or len(coords) != 2:
+            continue
+        created = (doc.get("timestamps") or {}).get("created_at") or now
+        age_hours = max((now - created).total_seconds() / 3600, 0)
+        priority = (doc.get("priority") or "P3").upper()
+        p_weight = {"P0": 4.0, "P1": 3.0, "P2": 2.0, "P3": 1.0}.get(priority, 1.0)
+        weight = p_weight * (1 + (age_hours ** 0.5))
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "request_id": str(doc.get("_id")),
+                "category": doc.get("category"),
+                "priority": priority,
+                "status": doc.get("status"),
+                "weight": round(weight, 3),
+                "age_hours": round(age_hours, 2),
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": coords,
+            },
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def run(size, batch, now, fastapi_encoder):
+    def old_weights():
+        return sum(len(loop_weights(docs, now)) for docs in batches(batch, size))
+
+    def new_weights():
+        feed = FeedColumns.from_docs(batch)
+        started = time.perf_counter()
+        for _ in batches(batch, size):
+            feed_weights(feed, now)
+        return time.perf_counter() - started
+
+    def old_feed():
+        features = []
+        for docs in batches(batch, size):
+            features.extend(loop_feed(docs, now)["features"])
+        geojson = {"type": "FeatureCollection", "features": features}
+        if fastapi_encoder:
+            from fastapi.encoders import jsonable_encoder
+            geojson = jsonable_encoder(geojson)
+        return json.dumps(geojson).encode()
+
+    def new_feed():
+        feed = FeedColumns.concat([FeedColumns.from_docs(docs) for docs in batches(batch, size)])
+        return render_feed(feed, now)
+
+    _, loop_weight_time = timed(old_weights)
+    vector_weight_time = new_weights()
+    old_body, loop_time = timed(old_feed)
+    del old_body
+    new_body, vector_time = timed(new_feed)
+    print(f"{size:,} open requests ({len(new_body):,} bytes of GeoJSON)")
+    print(f"  weights  loop={loop_weight_time * 1000:9.1f}ms  numpy={vector_weight_time * 1000:9.1f}ms"
+          f"  x{loop_weight_time / vector_weight_time:.1f}")
+    print(f"  feed     loop={loop_time * 1000:9.1f}ms  numpy={vector_time * 1000:9.1f}ms"
+          f"  x{loop_time / vector_time:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--fastapi-encoder", action="store_true")
+    args = parser.parse_args()
+    now = datetime.utcnow()
+    batch = make_batch(now)
+    for size in args.sizes:
+        run(size, batch, now, args.fastapi_encoder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Insert throughput of service_requests under the v7 and current index sets.
+
+Builds each index set on a scratch collection, inserts the same synthetic
+requests in batches and reports inserts/second and the index entries each
+insert maintains. The scratch collection is dropped afterwards:
+
+    python benchmarks/bench_index_writes.py --count 20000 --batch 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import IndexModel
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.database import get_sync_database
+from app.indexes import INDEX_MANIFEST, RETIRED_INDEXES
+
+SCRATCH = "bench_index_writes"
+
+
+def make_docs(count):
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "request_id": f"BENCH-{i}",
+            "category": rng.choice(["pothole", "streetlight", "graffiti", "water_leak"]),
+            "status": rng.choice(["new", "triaged", "assigned", "in_progress", "resolved"]),
+            "location": {
+                "type": "Point",
+                "coordinates": [35.8 + rng.random() * 0.2, 31.9 + rng.random() * 0.1],
+                "zone_id": rng.choice(["ZONE-DT-01", "ZONE-N-03", "ZONE-W-02"]),
+            },
+            "assignment": {"assigned_agent_id": str(ObjectId()) if rng.random() < 0.5 else None},
+            "timestamps": {"created_at": now - timedelta(minutes=i), "updated_at": now},
+        }
+        for i in range(count)
+    ]
+
+
+def measure(db, indexes, docs, batch):
+    db.drop_collection(SCRATCH)
+    collection = db[SCRATCH]
+    collection.create_indexes(indexes)
+    started = time.perf_counter()
+    for offset in range(0, len(docs), batch):
+        collection.insert_many([dict(doc) for doc in docs[offset:offset + batch]])
+    elapsed = time.perf_counter() - started
+    index_count = len(list(collection.list_indexes()))
+    db.drop_collection(SCRATCH)
+    return index_count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    db = get_sync_database()
+    docs = make_docs(args.count)
+    current = INDEX_MANIFEST["service_requests"]
+    v7 = current + [IndexModel(keys) for keys in RETIRED_INDEXES["service_requests"]]
+    for label, indexes in (("manifest v7", v7), ("current", current)):
+        index_count, elapsed = measure(db, indexes, docs, args.batch)
+        print(
+            f"{label:<12} indexes={index_count:<3} inserts={args.count:<7} "
+            f"{args.count / elapsed:,.0f}/s ({elapsed * 1000 / args.count:.3f}ms/doc)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Wire bytes and decode time for full documents vs the list projection.
+
+Reads the same result set twice as raw BSON, once with no projection (the
+old behaviour of GET /requests/) and once with LIST_PROJECTION, and reports
+bytes received and the time spent decoding them into Python dicts:
+
+    python benchmarks/bench_projection.py --limit 1000 --rounds 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import bson
+from bson.raw_bson import RawBSONDocument
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.database import get_sync_database
+from app.indexes import REQUEST_LIST_SORT
+from app.routers.requests import LIST_PROJECTION
+
+
+def measure(collection, projection, limit):
+    started = time.perf_counter()
+    raw = list(collection.find({}, projection).sort(REQUEST_LIST_SORT).limit(limit))
+    fetch_s = time.perf_counter() - started
+    wire_bytes = sum(len(doc.raw) for doc in raw)
+    started = time.perf_counter()
+    for doc in raw:
+        bson.decode(doc.raw)
+    decode_s = time.perf_counter() - started
+    return len(raw), wire_bytes, fetch_s, decode_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    db = get_sync_database()
+    collection = db["service_requests"].with_options(
+        codec_options=bson.CodecOptions(document_class=RawBSONDocument)
+    )
+
+    for label, projection in (("full document", None), ("list projection", LIST_PROJECTION)):
+        best = None
+        for _ in range(args.rounds):
+            result = measure(collection, projection, args.limit)
+            if best is None or result[2] + result[3] < best[2] + best[3]:
+                best = result
+        count, wire_bytes, fetch_s, decode_s = best
+        print(
+            f"{label:<16} docs={count:<7} bytes={wire_bytes:<11,} "
+            f"avg={wire_bytes / max(count, 1):,.0f}B/doc "
+            f"fetch={fetch_s * 1000:.1f}ms decode={decode_s * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Evidence serving: plain StaticFiles vs EvidenceStaticFiles.
+
+Serves the same content-addressed files (photos plus one PDF) from a temp
+directory through both mounts, driving the ASGI apps in-process, and
+reports:
+
+- repeat visits: a browser-like cache loads a page showing every file
+  --views times. The plain mount has no freshness, so each revisit costs one
+  conditional request per file; immutable files cost nothing after the
+  first load.
+- PDF transfer: bytes for a full GET with and without gzip, and a Range read.
+
+    python benchmarks/bench_static.py --files 30 --views 20
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from fastapi.staticfiles import StaticFiles
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import evidence
+from app.static_files import EvidenceStaticFiles
+
+
+async def get(app, path, headers=None):
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "server": ("bench", 80), "client": ("bench", 1),
+    }
+    result = {"status": None, "headers": {}, "bytes": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            result["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return result
+
+
+def make_files(directory, count, photo_bytes, pdf_bytes):
+    names = []
+    for i in range(count):
+        data = os.urandom(photo_bytes)
+        name = f"{hashlib.sha256(data).hexdigest()}.jpg"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        names.append(name)
+    line = b"Report page with inspection notes, measurements and photos references.\n"
+    pdf = b"%PDF-1.4\n" + line * (pdf_bytes // len(line))
+    pdf_name = f"{hashlib.sha256(pdf).hexdigest()}.pdf"
+    with open(os.path.join(directory, pdf_name), "wb") as f:
+        f.write(pdf)
+    return names, pdf_name
+
+
+async def page_views(app, names, views):
+    cache = {}
+    requests = transferred = 0
+    started = time.perf_counter()
+    for _ in range(views):
+        for name in names:
+            entry = cache.get(name)
+            if entry and "immutable" in entry.get("cache-control", ""):
+                continue
+            headers = {"If-None-Match": entry["etag"]} if entry else {}
+            response = await get(app, f"/{name}", headers)
+            requests += 1
+            transferred += response["bytes"]
+            if response["status"] == 200:
+                cache[name] = response["headers"]
+    return requests, transferred, time.perf_counter() - started
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        names, pdf_name = make_files(directory, args.files, args.photo_kb * 1024, args.pdf_kb * 1024)
+        # Precompressed sibling, as store_upload writes for PDFs.
+        evidence.UPLOAD_DIR = directory
+        evidence._precompress(pdf_name)
+
+        mounts = (("StaticFiles", StaticFiles(directory=directory)),
+                  ("EvidenceStaticFiles", EvidenceStaticFiles(directory=directory)))
+        print(f"{args.files} photos x {args.photo_kb} KB, {args.views} page views")
+        for label, app in mounts:
+            requests, transferred, elapsed = await page_views(app, names, args.views)
+            print(f"  {label:<20} requests={requests:<6} bytes={transferred:<12,} time={elapsed * 1000:.1f}ms")
+
+        print(f"PDF {args.pdf_kb} KB")
+        for label, app in mounts:
+            full = await get(app, f"/{pdf_name}", {"Accept-Encoding": "gzip"})
+            ranged = await get(app, f"/{pdf_name}", {"Range": "bytes=0-65535"})
+            print(
+                f"  {label:<20} full={full['bytes']:<10,} encoding={full['headers'].get('content-encoding', 'identity'):<9} "
+                f"range status={ranged['status']} bytes={ranged['bytes']:,}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--views", type=int, default=20)
+    parser.add_argument("--photo-kb", type=int, default=300)
+    parser.add_argument("--pdf-kb", type=int, default=4096)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
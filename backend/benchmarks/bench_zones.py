@@ -0,0 +1,66 @@
+"""Zone lookup latency against a synthetic city of N polygon districts.
+
+    python benchmarks/bench_zones.py --zones 5000 --points 200000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.zones import ZoneRegistry
+
+
+def synthetic_zones(count: int, origin=(35.70, 31.80), size_deg=0.01, vertices=12):
+    """Roughly circular districts laid out on a square grid."""
+    side = math.ceil(math.sqrt(count))
+    features = []
+    for n in range(count):
+        cx = origin[0] + (n % side + 0.5) * size_deg
+        cy = origin[1] + (n // side + 0.5) * size_deg
+        ring = [
+            [cx + 0.5 * size_deg * math.cos(2 * math.pi * k / vertices),
+             cy + 0.5 * size_deg * math.sin(2 * math.pi * k / vertices)]
+            for k in range(vertices)
+        ]
+        ring.append(ring[0])
+        features.append({
+            "type": "Feature",
+            "properties": {"zone_id": f"ZONE-{n:05d}"},
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+        })
+    return {"type": "FeatureCollection", "features": features}, side * size_deg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zones", type=int, default=5000)
+    parser.add_argument("--points", type=int, default=200000)
+    args = parser.parse_args()
+
+    collection, extent = synthetic_zones(args.zones)
+    started = time.perf_counter()
+    registry = ZoneRegistry.from_geojson(collection)
+    print(f"built registry of {args.zones} zones in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    rng = random.Random(7)
+    points = [(31.80 + rng.random() * extent, 35.70 + rng.random() * extent) for _ in range(args.points)]
+
+    started = time.perf_counter()
+    for lat, lng in points:
+        registry.lookup(lat, lng)
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    registry.lookup_many(points)
+    batch = time.perf_counter() - started
+
+    print(f"lookup:      {single / args.points * 1e6:.2f} us/point")
+    print(f"lookup_many: {batch / args.points * 1e6:.2f} us/point")
+
+
+if __name__ == "__main__":
+    main()
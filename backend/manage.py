@@ -0,0 +1,99 @@
+"""Operational commands for the Citizen Services backend.
+
+    python manage.py migrate            build indexes for the current manifest and
+                                        initialise missing workload counters
+    python manage.py migrate --force    rebuild even if already applied
+    python manage.py reconcile-workload recount open tickets per agent
+    python manage.py bucket-logs        move embedded event_stream arrays into buckets
+    python manage.py gc-evidence        delete evidence files no request references
+    python manage.py build-derivatives  render missing evidence thumbnails
+    python manage.py rebuild-rollups    recompute analytics rollup buckets (served
+                                        only with the analytics engine disabled)
+"""
+import argparse
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database import get_sync_database
+from app.indexes import INDEX_VERSION, apply_index_manifest, applied_index_version
+from app.rollups import rebuild_rollups
+from app.event_log import split_legacy_event_streams
+from app.derivatives import backfill_derivatives
+from app.evidence import EVIDENCE_GC_GRACE_SECONDS, collect_garbage
+from app.workload import backfill_workloads, reconcile_workloads
+
+
+def migrate(args):
+    db = get_sync_database()
+    current = applied_index_version(db)
+    if apply_index_manifest(db, force=args.force):
+        print(f"✅ Indexes built (manifest v{current} -> v{INDEX_VERSION})")
+    else:
+        print(f"✔️  Indexes already at manifest v{current}, nothing to do")
+    backfilled = backfill_workloads(db)
+    if backfilled:
+        print(f"✅ Workload counters initialised ({backfilled} agents)")
+
+
+def reconcile_workload(args):
+    corrected = reconcile_workloads(get_sync_database())
+    print(f"✅ Workload counters reconciled ({corrected} agents corrected)")
+
+
+def bucket_logs(args):
+    converted = split_legacy_event_streams(get_sync_database())
+    print(f"✅ Moved embedded event streams of {converted} performance logs into buckets")
+
+
+def gc_evidence(args):
+    stats = collect_garbage(get_sync_database(), grace_seconds=args.grace, dry_run=args.dry_run)
+    verb = "Would free" if args.dry_run else "Freed"
+    print(
+        f"✅ {verb} {stats['bytes_freed']} bytes: {stats['blobs_deleted']} blobs, "
+        f"{stats['files_deleted']} stray files ({stats['blobs_recounted']} ref counts corrected)"
+    )
+
+
+def build_derivatives(args):
+    rendered = backfill_derivatives(get_sync_database())
+    print(f"✅ Rendered derivatives for {rendered} stored images")
+
+
+def rebuild_rollups_command(args):
+    buckets = rebuild_rollups(get_sync_database())
+    print(f"✅ Rebuilt analytics rollups ({buckets} hourly and daily buckets)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Citizen Services backend management")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser("migrate", help="apply the index manifest")
+    migrate_parser.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    migrate_parser.set_defaults(func=migrate)
+
+    reconcile_parser = commands.add_parser("reconcile-workload", help="fix drifted agent workload counters")
+    reconcile_parser.set_defaults(func=reconcile_workload)
+
+    bucket_parser = commands.add_parser("bucket-logs", help="convert legacy embedded event streams")
+    bucket_parser.set_defaults(func=bucket_logs)
+
+    gc_parser = commands.add_parser("gc-evidence", help="remove unreferenced evidence blobs and files")
+    gc_parser.add_argument("--grace", type=int, default=EVIDENCE_GC_GRACE_SECONDS,
+                           help="skip anything younger than this many seconds")
+    gc_parser.add_argument("--dry-run", action="store_true", help="report without deleting")
+    gc_parser.set_defaults(func=gc_evidence)
+
+    derivatives_parser = commands.add_parser("build-derivatives", help="render missing evidence thumbnails")
+    derivatives_parser.set_defaults(func=build_derivatives)
+
+    rollups_parser = commands.add_parser("rebuild-rollups", help="recompute analytics rollups from requests")
+    rollups_parser.set_defaults(func=rebuild_rollups_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,12 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(__file__))
 
-from app.database import db
+from app.database import get_sync_database
+from app.event_log import split_legacy_event_streams
+from app.rollups import rebuild_rollups
+from app.workload import reconcile_workloads
+
+db = get_sync_database()
 
 try:
     from seed_snapshot import get_seed_data  # type: ignore
@@ -21,6 +26,7 @@ def seed_all():
     print("\n🗑️  Clearing existing data...")
     db["service_requests"].delete_many({})
     db["performance_logs"].delete_many({})
+    db["performance_log_events"].delete_many({})
     db["categories"].delete_many({})
     db["citizens"].delete_many({})
     db["service_agents"].delete_many({})
@@ -564,42 +570,12 @@ def seed_all():
     db["performance_logs"].insert_many([perf_log1, perf_log2, perf_log3])
     print(f"✅ Created 3 performance logs")
 
-    print("\n🗺️  Seeding geo feeds (snapshot)...")
-    open_reqs = list(db["service_requests"].find({"status": {"$in": ["new", "triaged", "assigned", "in_progress"]}}))
-    features = []
-    now = datetime.utcnow()
-    for doc in open_reqs:
-        loc = doc.get("location") or {}
-        coords = loc.get("coordinates")
-        if not coords or len(coords) != 2:
-            continue
-        created = (doc.get("timestamps") or {}).get("created_at") or now
-        age_hours = max((now - created).total_seconds() / 3600, 0)
-        priority = (doc.get("priority") or "P3").upper()
-        p_weight = {"P0": 4.0, "P1": 3.0, "P2": 2.0, "P3": 1.0}.get(priority, 1.0)
-        weight = p_weight * (1 + (age_hours ** 0.5))
-        features.append({
-            "type": "Feature",
-            "properties": {
-                "request_id": str(doc.get("_id")),
-                "category": doc.get("category"),
-                "priority": priority,
-                "status": doc.get("status"),
-                "weight": round(weight, 3),
-                "age_hours": round(age_hours, 2),
-            },
-            "geometry": {"type": "Point", "coordinates": coords},
-        })
+    # Heatmap snapshots are written by the API's snapshot job (app/geo_feeds.py)
+    # once it starts, and only when the open-request feed changes.
 
-    geo_feeds_doc = {
-        "feed_name": "open_requests_heatmap",
-        "generated_at": now,
-        "filters": {"status_in": ["new", "triaged", "assigned", "in_progress"]},
-        "geojson": {"type": "FeatureCollection", "features": features},
-        "created_at": now,
-    }
-    db["geo_feeds"].insert_one(geo_feeds_doc)
-    print("✅ Created 1 geo feed snapshot")
+    split_legacy_event_streams(db)
+    reconcile_workloads(db)
+    rebuild_rollups(db)
     
     print("\n" + "=" * 50)
     print("✅ Complete database seeding finished!")
@@ -629,6 +605,7 @@ if __name__ == "__main__":
         collections = [
             'categories', 'citizens', 'service_requests', 'comments', 'ratings', 'performance_logs', 'service_agents', 'geo_feeds'
         ]
+        db["performance_log_events"].delete_many({})
         print("\n🗑️  Clearing existing data...")
         for name in collections:
             try:
@@ -688,6 +665,10 @@ if __name__ == "__main__":
         db["service_agents"].insert_many(agents)
         print(f"✅ Created {len(agents)} service agents")
 
+        split_legacy_event_streams(db)
+        reconcile_workloads(db)
+        rebuild_rollups(db)
+
         print("\n" + "=" * 50)
         print("✅ Database seeding from snapshot finished!")
         print("=" * 50)
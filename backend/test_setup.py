@@ -1,6 +1,9 @@
-from app.database import db, requests_collection
+from app.database import get_sync_database
 from pymongo.errors import ConnectionFailure
 
+db = get_sync_database()
+requests_collection = db["service_requests"]
+
 
 def test_mongodb_connection():
     print("🔍 Testing MongoDB connection...")
@@ -68,7 +71,8 @@ def run_all_tests():
     if all_passed:
         print("\n✨ All tests passed! Your database is ready to use.")
         print("\n💡 Next steps:")
-        print("   1. Run: python seed_data.py (to add sample data)")
+        print("   1. Run: python manage.py migrate (to build indexes)")
+        print("      Then: python seed_complete.py (to add sample data)")
         print("   2. Start backend: uvicorn app.main:app --reload")
         print("   3. Start frontend: cd frontend && npm start")
     else:
@@ -0,0 +1,90 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+# Tests that need MongoDB use MONGO_URI with their own database, which is
+# dropped afterwards, and are skipped when no server answers.
+os.environ["DATABASE_NAME"] = os.getenv("TEST_DATABASE_NAME", "cst_db_test")
+os.environ.setdefault("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000")
+
+from app.database import get_sync_database  # noqa: E402
+
+AGENTS = [ObjectId() for _ in range(3)]
+ZONES = ["ZONE-DT-01", "ZONE-N-03", "ZONE-W-02", "ZONE-E-04", None]
+STATUSES = ["new", "triaged", "assigned", "in_progress", "resolved", "closed"]
+
+
+def make_requests(count: int = 60):
+    """Small deterministic set of requests covering the analytics edge cases.
+
+    Creation times straddle hour, day and month boundaries and carry
+    millisecond precision, as Mongo stores them. Some requests have no SLA
+    threshold, no zone or no agent; some have resolved_at with an open
+    status.
+    """
+    base = datetime(2026, 1, 30, 22, 0)
+    docs = []
+    for i in range(count):
+        created = base + timedelta(minutes=97 * i, milliseconds=7 * i)
+        status = STATUSES[i % len(STATUSES)]
+        doc = {
+            "_id": ObjectId(),
+            "category": ("pothole", "streetlight", "water_leak")[i % 3],
+            "status": status,
+            "priority": ("P1", "P2", "P3")[i % 3],
+            "location": {"type": "Point", "coordinates": [35.9, 31.95]},
+            "timestamps": {"created_at": created, "updated_at": created},
+            "sla_policy": {"breach_threshold_hours": (24, 48)[i % 2]},
+        }
+        if ZONES[(i * 7) % len(ZONES)]:
+            doc["location"]["zone_id"] = ZONES[(i * 7) % len(ZONES)]
+        if i % 4 == 0:
+            doc["assignment"] = {"assigned_agent_id": str(AGENTS[i % 3])}
+        if status in ("resolved", "closed") or i % 11 == 0:
+            doc["timestamps"]["resolved_at"] = created + timedelta(hours=(i * 5) % 70 + 1, milliseconds=3)
+        if i % 9 == 0:
+            doc["sla_policy"] = {}
+        docs.append(doc)
+    return docs
+
+
+@pytest.fixture
+def request_docs():
+    return make_requests()
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine on one loop for the whole session; the async client is bound to it."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def sync_db():
+    db = get_sync_database()
+    try:
+        db.client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("MongoDB is not reachable at MONGO_URI")
+    yield db
+    db.client.drop_database(db.name)
+
+
+@pytest.fixture
+def seeded_db(sync_db, request_docs):
+    """sync_db holding `request_docs` and their agents, with no rollups built."""
+    from app import rollups
+
+    for name in ("service_requests", "service_agents", "analytics_rollups", "schema_migrations"):
+        sync_db[name].delete_many({})
+    sync_db["service_requests"].insert_many([dict(doc) for doc in request_docs])
+    sync_db["service_agents"].insert_many([{"_id": agent, "name": f"Agent {n}"} for n, agent in enumerate(AGENTS)])
+    rollups._built = False
+    yield sync_db
+    rollups._built = False
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import Decimal128
+
+from app.analytics_engine import AnalyticsEngine
+from app.routers import analytics
+from tests.test_rollups import FILTERS, _match, _sorted_hotspots
+
+
+@pytest.fixture
+def engine(request_docs):
+    engine = AnalyticsEngine()
+    engine.loaded_at = datetime.utcnow()
+    engine.apply_changes((None, doc) for doc in request_docs)
+    return engine
+
+
+def test_aware_bounds_match_naive_utc(engine):
+    start = datetime(2026, 1, 31, 5, tzinfo=timezone(timedelta(hours=2)))
+    end = datetime(2026, 2, 2, 12, tzinfo=timezone.utc)
+    naive = (None, None, datetime(2026, 1, 31, 3), datetime(2026, 2, 2, 12))
+    assert engine.kpis(None, None, start, end) == engine.kpis(*naive)
+    assert engine.cohorts(None, None, start, end) == engine.cohorts(*naive)
+    assert engine.agents(None, None, start, datetime(2026, 2, 2, 12)) == engine.agents(*naive)
+
+
+def test_apply_changes_updates_and_deletes(engine, request_docs):
+    before = engine.kpis()["backlog"]
+    updated, deleted = [doc for doc in request_docs if doc["status"] == "new"][:2]
+    engine.apply_changes([(updated, {**updated, "status": "closed"}), (deleted, None)])
+    after = engine.kpis()["backlog"]
+
+    assert after["new"] == before["new"] - 2
+    assert after["closed"] == before["closed"] + 1
+    assert engine.stats()["live_rows"] == len(request_docs) - 1
+
+
+def test_table_grows_past_initial_capacity(engine, request_docs):
+    base = request_docs[0]
+    extra = [{**base, "_id": f"extra-{i}"} for i in range(2000)]
+    engine.apply_changes((None, doc) for doc in extra)
+
+    assert engine.stats()["live_rows"] == len(request_docs) + len(extra)
+    assert engine.kpis()["backlog"][base["status"]] == (
+        sum(doc["status"] == base["status"] for doc in request_docs) + len(extra)
+    )
+    assert engine.cohorts(None, None, None, base["timestamps"]["created_at"])["time_series"][0]["count"] == 1 + len(extra)
+
+
+def test_not_ready_engine_ignores_changes(request_docs):
+    engine = AnalyticsEngine()
+    engine.apply_changes([(None, request_docs[0])])
+    assert engine.stats()["rows"] == 0
+
+
+def test_sla_thresholds_follow_mongo_type_order():
+    engine = AnalyticsEngine()
+    engine.loaded_at = datetime.utcnow()
+    created = datetime(2026, 1, 1)
+    thresholds = [1, 24.0, Decimal128("2"), None, float("nan"), "48", True, {"hours": 1}, [1]]
+    docs = [
+        {
+            "_id": i,
+            "status": "resolved",
+            "timestamps": {"created_at": created, "resolved_at": created + timedelta(hours=10)},
+            "sla_policy": {"breach_threshold_hours": threshold},
+        }
+        for i, threshold in enumerate(thresholds)
+    ]
+    docs.append({**docs[0], "_id": "no-policy", "sla_policy": None})
+    engine.apply_changes((None, doc) for doc in docs)
+    # Breached: 1, Decimal128 2, null, NaN and no policy; 24 and the non-numeric ones are not.
+    assert engine.kpis()["sla_breach_rate"] == 5 / len(docs)
+
+
+def test_refresh_drops_requests_deleted_elsewhere(seeded_db, request_docs, run):
+    engine = AnalyticsEngine()
+    run(engine.load())
+    seeded_db["service_requests"].delete_one({"_id": request_docs[0]["_id"]})
+
+    run(engine.refresh())
+    assert engine.stats()["live_rows"] == len(request_docs) - 1
+    assert engine.kpis()["backlog"][request_docs[0]["status"]] == (
+        sum(doc["status"] == request_docs[0]["status"] for doc in request_docs) - 1
+    )
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_engine_matches_aggregation_pipeline(seeded_db, run, filters):
+    match = _match(filters)
+    raw_kpis = run(analytics._compute_kpis(match))
+    raw_cohorts = run(analytics._compute_cohorts(match))
+    raw_agents = [
+        {"agent_id": str(doc["_id"]), "open": doc.get("open", 0), "resolved": doc.get("resolved", 0)}
+        for doc in run(analytics._aggregate(analytics._agents_pipeline(match)))
+    ]
+
+    engine = AnalyticsEngine()
+    run(engine.load())
+    filters = analytics._match_filters(match)
+    kpis = engine.kpis(*filters)
+
+    assert kpis["backlog"] == raw_kpis["backlog"]
+    assert kpis["avg_resolution_hours"] == pytest.approx(raw_kpis["avg_resolution_hours"])
+    assert kpis["sla_breach_rate"] == pytest.approx(raw_kpis["sla_breach_rate"])
+    assert _sorted_hotspots(engine.cohorts(*filters)) == _sorted_hotspots(raw_cohorts)
+    by_agent = lambda row: row["agent_id"]
+    assert sorted(engine.agents(*filters), key=by_agent) == sorted(raw_agents, key=by_agent)
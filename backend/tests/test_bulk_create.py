@@ -0,0 +1,73 @@
+from bson import ObjectId
+
+from app import tiles
+from app.dispatch import dispatch_index
+from app.event_sink import EventSink
+from app.routers.requests import bulk_create_requests
+from app import event_sink as sink_module
+
+
+def item(title, **extra):
+    return {
+        "title": title,
+        "description": "Reported through the partner feed",
+        "category": "pothole",
+        "location": {"type": "Point", "coordinates": [35.91, 31.95]},
+        **extra,
+    }
+
+
+def test_emit_many_is_one_queue_entry_flushed_in_batches(monkeypatch, run):
+    written = []
+
+    async def write_events(batch):
+        written.append(len(batch))
+
+    monkeypatch.setattr(sink_module, "write_events", write_events)
+    sink = EventSink(batch_size=500, flush_interval_ms=10, max_queue=1)
+    items = [(ObjectId(), {"type": "assigned"}) for _ in range(1200)]
+
+    async def emit():
+        sink.start()
+        await sink.emit_many(items)
+        assert sink.enqueued == len(items)
+        await sink.stop()
+
+    run(emit())
+    assert written == [500, 500, 200]
+
+
+def test_large_changes_clear_the_tile_cache_once(monkeypatch):
+    cleared = []
+    monkeypatch.setattr(tiles.tile_cache, "invalidate_where", lambda predicate: cleared.append(predicate) or 0)
+    changes = [(None, {"location": {"coordinates": [35 + i / 1e4, 31.9]}})
+               for i in range(tiles.TILE_INVALIDATE_MAX_POINTS + 1)]
+    tiles.invalidate_request_tiles(changes)
+
+    assert len(cleared) == 1
+    assert cleared[0]((5, 0, 0, ("new",), None, None))
+
+
+def test_results_keep_input_positions_around_invalid_and_failed_items(seeded_db, run):
+    seeded_db["service_agents"].insert_one(
+        {"_id": ObjectId(), "name": "Roads", "skills": ["road"], "coverage_zones": [], "active": True}
+    )
+    seeded_db["service_requests"].create_index("title", unique=True, sparse=True, name="title_unique_test")
+    dispatch_index.loaded_at = None
+    try:
+        response = run(bulk_create_requests([
+            item("Pothole one"),
+            {"title": "x"},
+            item("Pothole one"),
+            item("Pothole two"),
+        ]))
+    finally:
+        seeded_db["service_requests"].drop_index("title_unique_test")
+        dispatch_index.loaded_at = None
+
+    statuses = [(result["index"], result["status"]) for result in response["results"]]
+    assert statuses == [(0, "created"), (1, "invalid"), (2, "failed"), (3, "created")]
+    assert response["created"] == 2 and response["rejected"] == 2
+    created = [ObjectId(result["_id"]) for result in response["results"] if result["status"] == "created"]
+    assert seeded_db["service_requests"].count_documents({"_id": {"$in": created}}) == 2
+    assert seeded_db["performance_log_events"].count_documents({"request_id": {"$in": created}}) == 2
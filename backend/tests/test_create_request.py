@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.dispatch import dispatch_index
+from app.models import ServiceRequest
+from app.routers import requests
+from app.routers.requests import build_new_request, create_request, request_location
+
+NOW = datetime(2026, 2, 1, 8, 30)
+
+
+def submitted(**extra):
+    return ServiceRequest(
+        title="Deep pothole",
+        description="Pothole in the right lane near the junction",
+        category="pothole",
+        location={"type": "Point", "coordinates": [35.9, 31.95]},
+        **extra,
+    )
+
+
+def test_new_request_without_an_agent_is_new():
+    doc, event = build_new_request(submitted(), request_location(submitted()), None, NOW)
+    assert doc["status"] == "new"
+    assert doc["assignment"] == {}
+    assert doc["timestamps"] == {"created_at": NOW, "updated_at": NOW}
+    assert event is None
+
+
+def test_new_request_with_an_agent_is_inserted_assigned():
+    doc, event = build_new_request(submitted(), request_location(submitted()), "agent-1", NOW)
+    assert doc["status"] == "assigned"
+    assert doc["assignment"] == {"assigned_agent_id": "agent-1", "assignment_policy": "auto"}
+    assert doc["timestamps"]["assigned_at"] == NOW
+    assert event == {
+        "type": "assigned",
+        "by": {"actor_type": "system", "actor_id": "auto"},
+        "at": NOW,
+        "meta": {"agent_id": "agent-1"},
+    }
+
+
+def test_request_location_is_the_submitted_point():
+    assert request_location(submitted()) == {
+        "type": "Point", "coordinates": [35.9, 31.95], "address_hint": None, "zone_id": None,
+    }
+
+
+class CallLog:
+    """Delegates to `target`, recording the name of every method called."""
+
+    def __init__(self, target, calls):
+        self._target = target
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if callable(attr):
+            self._calls.append(name)
+        return attr
+
+
+def test_create_with_a_warm_index_is_one_insert(monkeypatch, seeded_db, run):
+    agent_id = ObjectId()
+    seeded_db["service_agents"].insert_one({
+        "_id": agent_id, "name": "Road crew", "skills": ["road"], "coverage_zones": ["ZONE-DT-01"],
+        "active": True, "open_workload": 0,
+    })
+    run(dispatch_index.load())
+    calls = []
+    monkeypatch.setattr(requests, "requests_collection", CallLog(requests.requests_collection, calls))
+    try:
+        created = run(create_request(submitted()))
+    finally:
+        dispatch_index.loaded_at = None
+
+    assert calls == ["insert_one"]
+    stored = seeded_db["service_requests"].find_one({"_id": ObjectId(created["_id"])})
+    assert stored["status"] == "assigned"
+    assert stored["location"]["zone_id"] == "ZONE-DT-01"
+    assert stored["assignment"]["assigned_agent_id"] == str(agent_id)
+    assert seeded_db["service_agents"].find_one({"_id": agent_id})["open_workload"] == 1
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+
+from PIL import Image
+
+from app import derivatives
+from app.derivatives import DerivativePipeline, derivative_urls, render_derivatives
+
+
+def test_render_derivatives_downsizes_and_strips_metadata(tmp_path, monkeypatch):
+    monkeypatch.setattr(derivatives, "UPLOAD_DIR", str(tmp_path))
+    (tmp_path / "ab").mkdir()
+    exif = Image.Exif()
+    exif[0x0112] = 6  # stored sideways: rotate 90 degrees to display
+    Image.new("RGB", (2000, 1000), "red").save(tmp_path / "ab" / "photo.jpg", exif=exif)
+
+    rendered = render_derivatives("ab/photo.jpg", fmt="jpeg")
+
+    assert rendered["thumb"]["path"] == "ab/photo.thumb.jpg"
+    assert (rendered["thumb"]["width"], rendered["thumb"]["height"]) == (160, 320)
+    assert (rendered["medium"]["width"], rendered["medium"]["height"]) == (640, 1280)
+    with Image.open(tmp_path / rendered["medium"]["path"]) as medium:
+        assert not medium.getexif()
+    assert derivative_urls({"derivatives": rendered}) == {
+        "thumb": "/uploads/ab/photo.thumb.jpg",
+        "medium": "/uploads/ab/photo.medium.jpg",
+    }
+
+
+def test_relink_tasks_are_held_and_their_failures_logged(caplog, run):
+    pipeline = DerivativePipeline()
+    pipeline._pool = object()
+    release = asyncio.Event()
+    relinked = []
+
+    async def job(blob):
+        await release.wait()
+
+    async def relink(sha256):
+        relinked.append(sha256)
+        raise RuntimeError("relink failed")
+
+    pipeline._run = job
+    pipeline._relink = relink
+
+    async def scenario():
+        blob = {"_id": "ab" * 32, "path": "ab/photo.jpg"}
+        pipeline.submit(blob)
+        pipeline.submit(blob)
+        assert len(pipeline._tasks) == 1
+        release.set()
+        while pipeline._tasks or not relinked:
+            await asyncio.sleep(0)
+
+    with caplog.at_level(logging.ERROR, logger="app.derivatives"):
+        run(asyncio.wait_for(scenario(), timeout=5))
+
+    assert relinked == ["ab" * 32]
+    assert not pipeline._jobs
+    assert "relink failed" in caplog.text
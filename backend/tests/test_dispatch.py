@@ -0,0 +1,65 @@
+from bson import ObjectId
+
+from app.dispatch import DispatchIndex
+
+
+def agent(name, skills, zones, workload=0, **extra):
+    return {"_id": ObjectId(), "name": name, "skills": skills, "coverage_zones": zones,
+            "open_workload": workload, **extra}
+
+
+def make_index(*agents):
+    index = DispatchIndex()
+    for doc in agents:
+        index.add(doc)
+    return index
+
+
+def test_best_agent_prefers_zone_then_least_loaded():
+    busy = agent("busy", ["pothole"], ["Z1"], workload=3)
+    idle = agent("idle", ["pothole"], ["Z1"], workload=1)
+    elsewhere = agent("elsewhere", ["pothole"], ["Z2"])
+    index = make_index(busy, idle, elsewhere)
+
+    assert index.best_agent("Z1", "pothole")["name"] == "idle"
+    assert index.best_agent("Z9", "pothole")["name"] == "elsewhere"
+    assert index.best_agent("Z1", "graffiti") is None
+
+
+def test_adjust_and_remove_update_the_choice():
+    first = agent("first", ["pothole"], ["Z1"], workload=1)
+    second = agent("second", ["pothole"], ["Z1"], workload=2)
+    index = make_index(first, second)
+
+    index.adjust_workload(str(first["_id"]), 2)
+    assert index.best_agent("Z1", "pothole")["name"] == "second"
+    index.remove(str(second["_id"]))
+    assert index.best_agent("Z1", "pothole")["name"] == "first"
+    index.add({**first, "skills": ["graffiti"]})
+    assert index.best_agent("Z1", "pothole") is None
+
+
+def test_plan_assignments_spreads_a_batch_without_changing_the_index():
+    a = agent("a", ["pothole"], ["Z1"], workload=0)
+    b = agent("b", ["pothole"], ["Z1"], workload=1)
+    index = make_index(a, b)
+
+    picks = index.plan_assignments([("Z1", "pothole")] * 3 + [("Z1", "graffiti")])
+    # Ties go to the lower agent id, and `a` was created first.
+    assert [pick and pick["name"] for pick in picks] == ["a", "a", "b", None]
+    assert index.best_agent("Z1", "pothole")["open_workload"] == 0
+
+
+def test_refresh_agent_needs_an_explicit_active_flag(seeded_db, run):
+    flagged = agent("flagged", ["pothole"], ["Z1"], active=True)
+    unflagged = agent("unflagged", ["pothole"], ["Z1"])
+    seeded_db["service_agents"].insert_many([flagged, unflagged])
+    index = DispatchIndex()
+
+    run(index.refresh_agent(str(unflagged["_id"])))
+    assert index.best_agent("Z1", "pothole") is None
+    run(index.refresh_agent(str(flagged["_id"])))
+    assert index.best_agent("Z1", "pothole")["name"] == "flagged"
+
+    run(index.load())
+    assert index.best_agent("Z1", "pothole")["name"] == "flagged"
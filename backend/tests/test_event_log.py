@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app import event_log
+from app.event_log import event_write_ops, read_events, write_events
+
+DAY = datetime(2026, 2, 1)
+
+
+def event(minutes, kind="note"):
+    return {"type": kind, "at": DAY + timedelta(minutes=minutes)}
+
+
+def push(request_id, day, events):
+    return UpdateOne(
+        {"request_id": request_id, "day": day, "full": False},
+        {
+            "$push": {"events": {"$each": events}},
+            "$inc": {"count": len(events)},
+            "$min": {"first_at": min(e["at"] for e in events)},
+            "$max": {"last_at": max(e["at"] for e in events)},
+        },
+        upsert=True,
+    )
+
+
+def close(request_id, day, size):
+    return UpdateOne({"request_id": request_id, "day": day, "full": False, "count": {"$gte": size}},
+                     {"$set": {"full": True}})
+
+
+def test_events_are_pushed_per_request_day_in_chunks(monkeypatch):
+    monkeypatch.setattr(event_log, "EVENTS_PER_BUCKET", 3)
+    request_id, other = ObjectId(), ObjectId()
+    first_day = [event(m) for m in range(5)]
+    next_day = event(24 * 60 + 1)
+    items = [(request_id, e) for e in first_day] + [(request_id, next_day), (other, event(2))]
+    bucket_ops, head_ops = event_write_ops(items)
+
+    tomorrow = DAY + timedelta(days=1)
+    assert bucket_ops == [
+        push(request_id, DAY, first_day[:3]), close(request_id, DAY, 3),
+        push(request_id, DAY, first_day[3:]), close(request_id, DAY, 3),
+        push(request_id, tomorrow, [next_day]), close(request_id, tomorrow, 3),
+        push(other, DAY, [event(2)]), close(other, DAY, 3),
+    ]
+    assert head_ops[0] == UpdateOne(
+        {"request_id": request_id},
+        {
+            "$inc": {"event_count": 6},
+            "$min": {"first_event_at": DAY},
+            "$max": {"last_event_at": next_day["at"]},
+            "$set": {"last_event_type": "note"},
+            "$setOnInsert": {"created_at": DAY},
+        },
+        upsert=True,
+    )
+    assert len(head_ops) == 2
+
+
+def test_head_keeps_the_type_of_the_latest_event():
+    request_id = ObjectId()
+    _, head_ops = event_write_ops([(request_id, event(5, "resolved")), (request_id, event(1, "assigned"))])
+    assert head_ops == [UpdateOne(
+        {"request_id": request_id},
+        {
+            "$inc": {"event_count": 2},
+            "$min": {"first_event_at": DAY + timedelta(minutes=1)},
+            "$max": {"last_event_at": DAY + timedelta(minutes=5)},
+            "$set": {"last_event_type": "resolved"},
+            "$setOnInsert": {"created_at": DAY + timedelta(minutes=1)},
+        },
+        upsert=True,
+    )]
+
+
+def clear(db):
+    db["performance_log_events"].delete_many({})
+    db["performance_logs"].delete_many({})
+
+
+def test_open_bucket_rolls_over_when_full(monkeypatch, sync_db, run):
+    clear(sync_db)
+    monkeypatch.setattr(event_log, "EVENTS_PER_BUCKET", 3)
+    request_id = ObjectId()
+    for minutes in range(7):
+        run(write_events([(request_id, event(minutes))]))
+
+    buckets = list(sync_db["performance_log_events"].find({"request_id": request_id}).sort("first_at", 1))
+    assert [(b["count"], b["full"]) for b in buckets] == [(3, True), (3, True), (1, False)]
+    head = sync_db["performance_logs"].find_one({"request_id": request_id})
+    assert head["event_count"] == 7
+    assert head["last_event_at"] == DAY + timedelta(minutes=6)
+
+
+def test_pages_are_newest_first_across_overlapping_buckets(monkeypatch, sync_db, run):
+    clear(sync_db)
+    monkeypatch.setattr(event_log, "EVENTS_PER_BUCKET", 2)
+    request_id = ObjectId()
+    # Events 0-3 fill two buckets; 10 and 11 arrive before 4 and 5, so the
+    # last two buckets overlap in time.
+    for minutes in (0, 1, 2, 3, 10, 4, 11, 5):
+        run(write_events([(request_id, event(minutes))]))
+
+    seen, before = [], None
+    while True:
+        page, before = run(read_events(request_id, 3, before))
+        seen.extend(e["at"] for e in page)
+        if before is None:
+            break
+    expected = sorted((DAY + timedelta(minutes=m) for m in (0, 1, 2, 3, 4, 5, 10, 11)), reverse=True)
+    assert seen == expected
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app import event_sink as sink_module
+from app.event_sink import EventSink
+
+
+class DeadLetters:
+    def __init__(self):
+        self.docs = []
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+
+@pytest.fixture
+def dead_letters(monkeypatch):
+    collection = DeadLetters()
+    monkeypatch.setattr(sink_module, "performance_log_dead_letters_collection", collection)
+    return collection
+
+
+def events(count):
+    request_id = ObjectId()
+    return [(request_id, {"type": "note", "at": datetime(2026, 1, 1, 0, 0, n)}) for n in range(count)]
+
+
+async def emit_all(sink, items):
+    sink.start()
+    for request_id, event in items:
+        await sink.emit(request_id, event)
+    await sink.stop()
+
+
+def test_unwritable_batches_are_dead_lettered_and_the_sink_keeps_going(monkeypatch, dead_letters, run):
+    async def always_fail(batch):
+        raise ValueError("document failed validation")
+
+    monkeypatch.setattr(sink_module, "write_events", always_fail)
+    sink = EventSink(batch_size=2, flush_interval_ms=10, max_queue=2, flush_attempts=2)
+    items = events(7)
+    # With a queue of two, emit only gets through all seven if flushes give up.
+    run(asyncio.wait_for(emit_all(sink, items), timeout=30))
+
+    assert sink.written == 0
+    assert sink.lost == sink.dead_lettered == len(items)
+    assert [(doc["request_id"], doc["event"]) for doc in dead_letters.docs] == items
+    assert "ValueError" in dead_letters.docs[0]["error"]
+
+
+def test_transient_failures_are_retried(monkeypatch, dead_letters, run):
+    calls = []
+
+    async def fail_once(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise ConnectionError("primary stepped down")
+
+    monkeypatch.setattr(sink_module, "write_events", fail_once)
+    sink = EventSink(batch_size=10, flush_interval_ms=10, flush_attempts=3)
+    run(asyncio.wait_for(emit_all(sink, events(4)), timeout=30))
+
+    assert sink.written == 4
+    assert sink.flush_failures == 1
+    assert sink.lost == 0 and not dead_letters.docs
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    batches = []
+
+    async def record(batch):
+        batches.append(list(batch))
+    monkeypatch.setattr(sink_module, "write_events", record)
+    return batches
+
+
+def test_queued_events_are_written_in_batches_in_order(writes, run):
+    sink = EventSink(batch_size=3, flush_interval_ms=1000)
+    items = events(7)
+    run(asyncio.wait_for(emit_all(sink, items), timeout=30))
+
+    assert [len(batch) for batch in writes] == [3, 3, 1]
+    assert [item for batch in writes for item in batch] == items
+    assert sink.metrics()["enqueued"] == sink.written == 7
+    assert sink.flushes == 3
+
+
+def test_a_partial_batch_is_flushed_after_the_interval(writes, run):
+    sink = EventSink(batch_size=100, flush_interval_ms=10)
+
+    async def emit_and_wait():
+        sink.start()
+        await sink.emit(*events(1)[0])
+        await asyncio.sleep(0.2)
+        flushed = list(writes)
+        await sink.stop()
+        return flushed
+    assert len(run(asyncio.wait_for(emit_and_wait(), timeout=30))) == 1
+
+
+def test_emit_without_a_running_sink_writes_through(monkeypatch, writes, run):
+    recorded = []
+
+    async def record_event(request_id, event):
+        recorded.append((request_id, event))
+    monkeypatch.setattr(sink_module, "record_event", record_event)
+    sink = EventSink()
+    item = events(1)[0]
+    run(sink.emit(*item))
+    run(sink.emit_many(events(2)))
+
+    assert recorded == [item]
+    assert [len(batch) for batch in writes] == [2]
+    assert not sink.running and sink.enqueued == 0
@@ -0,0 +1,85 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app import evidence
+from app.evidence import blob_url, collect_garbage, reference_blob
+
+SHA = "ab" * 32
+LONG_AGO = datetime.utcnow() - timedelta(days=30)
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(evidence, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def blob(seeded_db, upload_dir):
+    seeded_db["evidence_blobs"].delete_many({})
+    doc = {"_id": SHA, "path": f"ab/{SHA}.jpg", "size": 4, "ref_count": 0,
+           "created_at": LONG_AGO, "last_referenced_at": LONG_AGO}
+    seeded_db["evidence_blobs"].insert_one(doc)
+    (upload_dir / "ab").mkdir()
+    (upload_dir / doc["path"]).write_bytes(b"jpeg")
+    os.utime(upload_dir / doc["path"], (LONG_AGO.timestamp(), LONG_AGO.timestamp()))
+    return doc
+
+
+class ReuseAfterRecount:
+    """A database whose request recount is followed by an upload reusing the blob."""
+
+    def __init__(self, db, reuse):
+        self.db, self.reuse = db, reuse
+
+    def __getitem__(self, name):
+        if name != "service_requests":
+            return self.db[name]
+        outer = self
+
+        class Requests:
+            def aggregate(self, pipeline):
+                counts = list(outer.db[name].aggregate(pipeline))
+                outer.reuse()
+                return counts
+
+        return Requests()
+
+
+def test_unreferenced_idle_blob_is_deleted(seeded_db, blob, upload_dir):
+    stats = collect_garbage(seeded_db)
+    assert stats["blobs_deleted"] == 1
+    assert seeded_db["evidence_blobs"].count_documents({}) == 0
+    assert not (upload_dir / blob["path"]).exists()
+
+
+def test_blob_reused_after_the_recount_is_kept(seeded_db, blob, upload_dir, run):
+    request_id = ObjectId()
+
+    def reuse():
+        run(reference_blob(SHA))
+        seeded_db["service_requests"].insert_one(
+            {"_id": request_id, "evidence": [{"url": blob_url(blob), "sha256": SHA}]}
+        )
+
+    stats = collect_garbage(ReuseAfterRecount(seeded_db, reuse))
+
+    assert stats["blobs_deleted"] == 0
+    assert seeded_db["evidence_blobs"].find_one({"_id": SHA})["ref_count"] == 1
+    assert (upload_dir / blob["path"]).exists()
+    # The next run sees the reference and leaves the count alone.
+    assert collect_garbage(seeded_db)["blobs_recounted"] == 0
+
+
+def test_recently_referenced_blob_survives_a_zero_count(seeded_db, blob, upload_dir):
+    seeded_db["evidence_blobs"].update_one(
+        {"_id": SHA}, {"$set": {"ref_count": 1, "last_referenced_at": datetime.utcnow() - timedelta(minutes=1)}}
+    )
+    stats = collect_garbage(seeded_db)
+
+    # Its request may not be written yet: recounted, but not deleted.
+    assert stats == {"blobs_recounted": 1, "blobs_deleted": 0, "files_deleted": 0, "bytes_freed": 0}
+    assert (upload_dir / blob["path"]).exists()
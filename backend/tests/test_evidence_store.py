@@ -0,0 +1,60 @@
+import hashlib
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from app import evidence
+from app.evidence import TEMP_PREFIX, blob_path, release_blobs, safe_extension, store_upload
+
+PHOTO = b"\xff\xd8\xff\xe0" + b"pothole" * 100
+SHA = hashlib.sha256(PHOTO).hexdigest()
+
+
+def upload(data, filename):
+    return UploadFile(io.BytesIO(data), filename=filename)
+
+
+@pytest.fixture
+def store(seeded_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(evidence, "UPLOAD_DIR", str(tmp_path))
+    seeded_db["evidence_blobs"].delete_many({})
+    return tmp_path
+
+
+def stored_files(root):
+    return sorted(str(path.relative_to(root)) for path in root.rglob("*") if path.is_file())
+
+
+def test_blob_path_is_sharded_by_hash():
+    assert blob_path(SHA, ".jpg") == f"{SHA[:2]}/{SHA[2:4]}/{SHA}.jpg"
+
+
+@pytest.mark.parametrize("filename, ext", [
+    ("IMG_1.JPEG", ".jpg"), ("scan.pdf", ".pdf"), ("run.exe", ""), ("", ""), (None, ""),
+])
+def test_safe_extension(filename, ext):
+    assert safe_extension(filename) == ext
+
+
+def test_identical_uploads_share_one_blob(seeded_db, store, run):
+    first = run(store_upload(upload(PHOTO, "a.jpg"), "image/jpeg"))
+    second = run(store_upload(upload(PHOTO, "b.jpeg"), "image/jpeg"))
+    renamed = run(store_upload(upload(PHOTO, "c.png"), "image/png"))
+
+    assert first["_id"] == second["_id"] == renamed["_id"] == SHA
+    assert renamed["path"] == blob_path(SHA, ".jpg")
+    assert seeded_db["evidence_blobs"].find_one({"_id": SHA})["ref_count"] == 3
+    assert stored_files(store) == [blob_path(SHA, ".jpg")]
+    assert not any(name.startswith(TEMP_PREFIX) for name in stored_files(store))
+
+
+def test_release_drops_only_upload_references(seeded_db, store, run):
+    blob = run(store_upload(upload(PHOTO, "a.jpg")))
+    run(store_upload(upload(PHOTO, "a.jpg")))
+    run(release_blobs([
+        {"sha256": SHA, "url": evidence.blob_url(blob)},
+        {"sha256": SHA, "url": "https://example.org/photo.jpg"},
+        {"url": evidence.blob_url(blob)},
+    ]))
+    assert seeded_db["evidence_blobs"].find_one({"_id": SHA})["ref_count"] == 1
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.routers import requests
+from app.routers.requests import CSV_COLUMNS, export_requests
+
+
+class ListCursor:
+    """The async-iteration and close() part of a cursor, over a list."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+    async def close(self):
+        self.closed = True
+
+
+def collect(run, chunks):
+    async def read():
+        return [chunk async for chunk in chunks]
+    return run(read())
+
+
+DOCS = [
+    {
+        "_id": ObjectId(),
+        "request_id": f"CST-{i}",
+        "title": f"Broken light, pole {i}",
+        "category": "streetlight",
+        "status": "new",
+        "priority": "P2",
+        "location": {"type": "Point", "coordinates": [35.9, 31.95], "zone_id": "ZONE-DT-01"},
+        "address": None,
+        "timestamps": {"created_at": datetime(2026, 1, 1, i), "updated_at": datetime(2026, 1, 2, i)},
+        "internal_notes": "staff only",
+    }
+    for i in range(5)
+]
+
+
+def test_ndjson_is_one_rendered_request_per_line_in_batches(monkeypatch, run):
+    monkeypatch.setattr(requests, "EXPORT_BATCH_SIZE", 2)
+    cursor = ListCursor(DOCS)
+    chunks = collect(run, requests._export_ndjson(cursor))
+
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
+    rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [row["request_id"] for row in rows] == [doc["request_id"] for doc in DOCS]
+    assert rows[0]["_id"] == str(DOCS[0]["_id"])
+    assert rows[0]["timestamps"]["created_at"] == "2026-01-01T00:00:00"
+    assert "internal_notes" not in rows[0]
+    assert cursor.closed
+
+
+def test_csv_has_a_header_and_flattened_rows(monkeypatch, run):
+    monkeypatch.setattr(requests, "EXPORT_BATCH_SIZE", 2)
+    cursor = ListCursor(DOCS)
+    chunks = collect(run, requests._export_csv(cursor))
+
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert rows[0] == CSV_COLUMNS
+    assert rows[1] == [
+        str(DOCS[0]["_id"]), "CST-0", "Broken light, pole 0", "streetlight", "new", "P2",
+        "ZONE-DT-01", "35.9", "31.95", "", "2026-01-01T00:00:00", "2026-01-02T00:00:00",
+    ]
+    assert len(rows) == len(DOCS) + 1
+    assert cursor.closed
+
+
+def test_cursor_is_closed_when_the_client_goes_away(run):
+    cursor = ListCursor(DOCS)
+    stream = requests._export_ndjson(cursor)
+
+    async def first_then_close():
+        await stream.__anext__()
+        await stream.aclose()
+    run(first_then_close())
+    assert cursor.closed
+
+
+def test_export_streams_the_filtered_listing(seeded_db, request_docs, run):
+    response = run(export_requests(status="new", category=None, zone_id=None, agent_id=None, export_format="ndjson"))
+    assert response.media_type == "application/x-ndjson"
+    rows = [json.loads(line) for line in "".join(collect(run, response.body_iterator)).splitlines()]
+    assert sorted(row["_id"] for row in rows) == sorted(str(doc["_id"]) for doc in request_docs if doc["status"] == "new")
+
+    response = run(export_requests(status=None, category=None, zone_id=None, agent_id=None, export_format="csv"))
+    assert response.headers["content-disposition"] == 'attachment; filename="requests.csv"'
+    assert len(list(csv.reader(io.StringIO("".join(collect(run, response.body_iterator)))))) == len(request_docs) + 1
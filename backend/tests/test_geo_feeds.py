@@ -0,0 +1,197 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app import geo_feeds
+from app.geo_feeds import (
+    PRIORITY_WEIGHTS,
+    FeedColumns,
+    HeatmapSnapshots,
+    _epoch_ms,
+    _pack,
+    _unpack,
+    apply_delta,
+    content_hash,
+    feed_weights,
+    render_feed,
+    snapshot_delta,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0, 0, 250000)
+
+
+def records_to_geojson(records, now):
+    """The per-request renderer render_feed replaced, kept as the reference."""
+    now_ms = _epoch_ms(now)
+    features = []
+    for request_id, lng, lat, priority, category, status, created_ms in records:
+        age_hours = max((now_ms - created_ms) / 3_600_000, 0) if created_ms is not None else 0
+        weight = PRIORITY_WEIGHTS.get(priority, 1.0) * (1 + (age_hours ** 0.5))
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "request_id": request_id,
+                "category": category,
+                "priority": priority,
+                "status": status,
+                "weight": round(weight, 3),
+                "age_hours": round(age_hours, 2),
+            },
+            "geometry": {"type": "Point", "coordinates": [lng, lat]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def old_body(records, now, extra=None):
+    geojson = records_to_geojson(records, now)
+    geojson.update(extra or {})
+    return JSONResponse(jsonable_encoder(geojson)).body
+
+
+def make_records(count, seed=11):
+    rng = random.Random(seed)
+    now_ms = _epoch_ms(NOW)
+    records = []
+    for _ in range(count):
+        created = rng.choice([None, now_ms, now_ms + 60_000, now_ms - rng.randint(1, 90 * 86_400_000)])
+        records.append([
+            str(ObjectId()),
+            rng.choice([35, -1, 0, 35.5, 35.1 + rng.random() * 0.3]),
+            rng.choice([31, 31.75, 31.8 + rng.random() * 0.3]),
+            rng.choice(["P0", "P1", "P2", "P3", "PX"]),
+            rng.choice(["pothole", "water_leak", "تسرب", None]),
+            rng.choice(["new", "assigned", None]),
+            created,
+        ])
+    return records
+
+
+def test_render_feed_matches_old_renderer_bytes():
+    records = make_records(2000)
+    assert render_feed(FeedColumns.from_records(records), NOW) == old_body(records, NOW)
+
+
+def test_integer_coordinates_stay_integers():
+    doc = {"_id": ObjectId(), "location": {"coordinates": [35, 32]}, "timestamps": {}}
+    feature = json.loads(render_feed(FeedColumns.from_docs([doc]), NOW))["features"][0]
+    assert feature["geometry"]["coordinates"] == [35, 32]
+    assert all(type(value) is int for value in feature["geometry"]["coordinates"])
+    assert FeedColumns.from_docs([doc]).to_records()[0][1:3] == [35, 32]
+
+
+def test_render_feed_extra_members_match_old_renderer():
+    records = make_records(5)
+    extra = {"snapshot": {"seq": 4, "generated_at": NOW, "checked_at": None}}
+    assert render_feed(FeedColumns.from_records(records), NOW, extra) == old_body(records, NOW, extra)
+
+
+def test_empty_feed():
+    assert render_feed(FeedColumns.from_records([]), NOW) == old_body([], NOW)
+
+
+def test_docs_and_records_give_the_same_columns():
+    docs = [
+        {
+            "_id": ObjectId(),
+            "location": {"coordinates": [35.2, 31.9]},
+            "priority": "p1",
+            "category": "pothole",
+            "status": "new",
+            "timestamps": {"created_at": NOW - timedelta(hours=5, milliseconds=7)},
+        },
+        {"_id": ObjectId(), "location": {"coordinates": [35, 31]}, "timestamps": {}},
+        {"_id": ObjectId(), "location": {"coordinates": [35.2]}},
+        {"_id": ObjectId()},
+    ]
+    records = FeedColumns.from_docs(docs).to_records()
+    assert records == [
+        [str(docs[0]["_id"]), 35.2, 31.9, "P1", "pothole", "new", _epoch_ms(docs[0]["timestamps"]["created_at"])],
+        [str(docs[1]["_id"]), 35, 31, "P3", None, None, None],
+    ]
+    assert FeedColumns.from_records(records).to_records() == records
+
+
+def test_concat_keeps_row_order():
+    records = make_records(30)
+    parts = [FeedColumns.from_records(records[i:i + 7]) for i in range(0, 30, 7)]
+    assert FeedColumns.concat(parts).to_records() == records
+    assert FeedColumns.concat([]).to_records() == []
+
+
+def test_feed_weights():
+    now_ms = _epoch_ms(NOW)
+    records = [
+        ["a", 0, 0, "P0", None, None, now_ms - 4 * 3_600_000],
+        ["b", 0, 0, "P2", None, None, None],
+        ["c", 0, 0, "PX", None, None, now_ms + 3_600_000],
+    ]
+    weight, age_hours = feed_weights(FeedColumns.from_records(records), NOW)
+    assert weight.tolist() == pytest.approx([12.0, 2.0, 1.0])
+    assert age_hours.tolist() == pytest.approx([4.0, 0.0, 0.0])
+
+
+def keyed(records):
+    return {record[0]: record for record in records}
+
+
+def test_deltas_replay_onto_the_keyframe():
+    rng = random.Random(4)
+    feed = keyed(make_records(50))
+    keyframe = _unpack(_pack(list(feed.values())))
+    stored = []
+    for step in range(10):
+        previous, feed = feed, dict(feed)
+        for key in rng.sample(sorted(feed), 5):
+            del feed[key]
+        for key in rng.sample(sorted(feed), 5):
+            feed[key] = [*feed[key][:5], "in_progress", feed[key][6]]
+        feed.update(keyed(make_records(4, seed=step)))
+        stored.append(_pack(snapshot_delta(previous, feed)))
+
+    records = keyed(keyframe)
+    for payload in stored:
+        apply_delta(records, _unpack(payload))
+    assert records == feed
+
+
+def test_unchanged_feed_has_an_empty_delta():
+    feed = keyed(make_records(10))
+    assert snapshot_delta(feed, dict(feed)) == {"upsert": [], "remove": []}
+
+
+def test_content_hash_follows_the_records():
+    records = make_records(5)
+    assert content_hash(records) == content_hash([list(record) for record in records])
+    assert content_hash(records) != content_hash(records[::-1])
+
+
+def open_ids(db):
+    return sorted(str(doc["_id"]) for doc in db["service_requests"].find({"status": {"$in": geo_feeds.OPEN_STATUSES}}))
+
+
+def test_snapshots_keyframe_then_deltas_and_read_back(monkeypatch, seeded_db, run):
+    seeded_db["geo_feeds"].delete_many({})
+    monkeypatch.setattr(geo_feeds, "HEATMAP_SNAPSHOT_KEYFRAME_EVERY", 3)
+    snapshots = HeatmapSnapshots("test_heatmap")
+    requests = seeded_db["service_requests"]
+
+    assert run(snapshots.take(NOW)) == 0
+    assert run(snapshots.take(NOW)) is None
+    for step in range(1, 5):
+        doc = requests.find_one({"status": "new"})
+        requests.update_one({"_id": doc["_id"]}, {"$set": {"status": "resolved"}})
+        requests.update_one({"status": "resolved", "_id": {"$ne": doc["_id"]}}, {"$set": {"status": "triaged"}})
+        assert run(snapshots.take(NOW)) == step
+
+    kinds = [doc["kind"] for doc in seeded_db["geo_feeds"].find({"feed_name": "test_heatmap"}).sort("seq", 1)]
+    assert kinds == ["full", "delta", "delta", "full", "delta"]
+
+    # A fresh reader has nothing cached and replays keyframe 3 plus delta 4.
+    body = json.loads(run(HeatmapSnapshots("test_heatmap").latest(NOW)))
+    assert body["snapshot"]["seq"] == 4
+    assert [feature["properties"]["request_id"] for feature in body["features"]] == open_ids(seeded_db)
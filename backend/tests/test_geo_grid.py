@@ -0,0 +1,125 @@
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+from app.geo_feeds import OPEN_STATUSES
+from app.geo_grid import bbox_filter, cell_center, cell_degrees, cell_expression, lat_scale, parse_bbox
+from app.routers import analytics
+
+OPERATORS = {
+    "$add": lambda *args: sum(args),
+    "$subtract": lambda a, b: a - b,
+    "$multiply": lambda a, b: a * b,
+    "$divide": lambda a, b: a / b,
+    "$floor": math.floor,
+    "$abs": abs,
+    "$gt": lambda a, b: a > b,
+    "$and": lambda *args: all(args),
+    "$cond": lambda test, then, otherwise: then if test else otherwise,
+}
+
+
+def evaluate(expr, variables):
+    """Evaluate the aggregation expressions cell_expression builds, in Python."""
+    if isinstance(expr, str):
+        return variables[expr[2:]] if expr.startswith("$$") else variables[expr[1:]]
+    if isinstance(expr, list):
+        return [evaluate(item, variables) for item in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if "$let" in expr:
+        scope = {**variables, **{name: evaluate(value, variables) for name, value in expr["$let"]["vars"].items()}}
+        return evaluate(expr["$let"]["in"], scope)
+    if len(expr) == 1:
+        name, args = next(iter(expr.items()))
+        if name.startswith("$"):
+            args = evaluate(args, variables)
+            return OPERATORS[name](*args) if isinstance(args, list) else OPERATORS[name](args)
+    return {key: evaluate(value, variables) for key, value in expr.items()}
+
+
+def cell_of(shape, size, scale, lng, lat):
+    cell = evaluate(cell_expression(shape, size, scale, "$lng", "$lat"), {"lng": lng, "lat": lat})
+    return cell["x"], cell["y"]
+
+
+def test_cell_degrees_halves_per_zoom():
+    assert cell_degrees(0) == 45.0
+    assert cell_degrees(10) == pytest.approx(45.0 / 1024)
+    assert cell_degrees(3, cell_pixels=64) == cell_degrees(2)
+
+
+def test_lat_scale():
+    assert lat_scale(None) == 1.0
+    assert lat_scale((35, -1, 36, 1)) == pytest.approx(1.0)
+    assert lat_scale((35, 59, 36, 61)) == pytest.approx(2.0)
+    assert lat_scale((0, 89.9, 1, 90)) == 100.0
+
+
+@pytest.mark.parametrize("shape", ["square", "hex"])
+def test_cell_centres_bin_to_their_own_cell(shape):
+    size, scale = 0.01, 1.2
+    for x in range(-3, 4):
+        for y in range(-3, 4):
+            assert cell_of(shape, size, scale, *cell_center(shape, size, scale, x, y)) == (x, y)
+
+
+def test_square_cells_cover_their_span():
+    size = 0.5
+    assert cell_of("square", size, 1.0, 35.0, 31.9) == (70, 63)
+    assert cell_of("square", size, 1.0, 35.49, 31.99) == (70, 63)
+    assert cell_of("square", size, 1.0, -0.01, 0.0) == (-1, 0)
+
+
+def test_hex_cell_is_the_nearest_centre():
+    rng = random.Random(2)
+    size, scale = 0.02, 1.3
+    neighbours = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)]
+    for _ in range(2000):
+        lng, lat = 35 + rng.random(), 31 + rng.random()
+        x, y = cell_of("hex", size, scale, lng, lat)
+
+        def distance(cell):
+            c_lng, c_lat = cell_center("hex", size, scale, *cell)
+            return math.hypot(lng - c_lng, (lat - c_lat) * scale)
+        own = distance((x, y))
+        assert own <= size + 1e-12
+        assert all(own <= distance((x + dx, y + dy)) + 1e-12 for dx, dy in neighbours)
+
+
+@pytest.mark.parametrize("value", ["1,2,3", "a,b,c,d", "10,0,5,1", "0,0,1,91", "-181,0,0,1"])
+def test_parse_bbox_rejects(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
+
+
+def test_bbox_filter_pads_the_polygon_and_trims_with_bounds():
+    bbox = parse_bbox("35.0,31.0,37.5,32.0")
+    assert bbox == (35.0, 31.0, 37.5, 32.0)
+    query = bbox_filter(bbox)
+    assert query["location.coordinates.0"] == {"$gte": 35.0, "$lte": 37.5}
+    assert query["location.coordinates.1"] == {"$gte": 31.0, "$lte": 32.0}
+
+    ring = query["location"]["$geoWithin"]["$geometry"]["coordinates"][0]
+    assert ring[0] == ring[-1]
+    lngs = sorted({lng for lng, _ in ring})
+    assert lngs == [35.0, 35.0 + 2.5 / 3, 35.0 + 5 / 3, 37.5]
+    assert max(lat for _, lat in ring) > 32.0 and min(lat for _, lat in ring) < 31.0
+
+
+def test_hemisphere_wide_bbox_uses_bounds_only():
+    assert "location" not in bbox_filter((-90.0, 0.0, 90.0, 10.0))
+
+
+@pytest.mark.parametrize("shape", ["square", "hex"])
+def test_cells_add_up_to_the_open_requests(seeded_db, request_docs, run, shape):
+    features = run(analytics._heatmap_cells({"status": {"$in": OPEN_STATUSES}}, shape, 0.01, 1.0, datetime(2026, 3, 1)))
+    assert sum(feature["properties"]["count"] for feature in features) == sum(
+        doc["status"] in OPEN_STATUSES for doc in request_docs
+    )
+    # Every fixture request sits on one point, so there is one cell.
+    (feature,) = features
+    x, y = (int(part) for part in feature["properties"]["cell"].split(":"))
+    assert cell_of(shape, 0.01, 1.0, 35.9, 31.95) == (x, y)
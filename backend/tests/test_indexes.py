@@ -0,0 +1,40 @@
+from pymongo import ASCENDING, IndexModel
+
+from app.indexes import (
+    INDEX_MANIFEST,
+    RETIRED_INDEXES,
+    REQUEST_LIST_FILTERS,
+    REQUEST_LIST_SORT,
+    apply_index_manifest,
+)
+
+
+def manifest_keys(collection):
+    return [list(index.document["key"].items()) for index in INDEX_MANIFEST[collection]]
+
+
+def test_request_list_indexes_end_in_the_listing_sort():
+    list_indexes = [keys for keys in manifest_keys("service_requests") if keys[-2:] == REQUEST_LIST_SORT]
+    assert len(list_indexes) == 5
+    for keys in list_indexes:
+        assert {field for field, _ in keys[:-2]} <= set(REQUEST_LIST_FILTERS)
+
+
+def test_retired_indexes_are_not_rebuilt():
+    kept = manifest_keys("service_requests")
+    retired = RETIRED_INDEXES["service_requests"]
+    assert len(retired) == 2 ** len(REQUEST_LIST_FILTERS) - 5
+    assert not [keys for keys in retired if keys in kept]
+
+
+def test_migrate_drops_retired_indexes(sync_db):
+    collection = sync_db["service_requests"]
+    collection.drop()
+    collection.create_indexes([IndexModel(RETIRED_INDEXES["service_requests"][0]),
+                               IndexModel([("title", ASCENDING)])])
+    apply_index_manifest(sync_db, force=True)
+
+    keys = [list(index["key"].items()) for index in collection.list_indexes()]
+    assert RETIRED_INDEXES["service_requests"][0] not in keys
+    assert [("title", ASCENDING)] in keys
+    assert all(index in keys for index in manifest_keys("service_requests"))
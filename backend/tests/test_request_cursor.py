@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+from app.indexes import REQUEST_LIST_SORT
+from app.routers.requests import decode_cursor, encode_cursor, get_requests
+
+
+def test_cursor_round_trip_keeps_sort_key():
+    doc = {"_id": ObjectId(), "timestamps": {"created_at": datetime(2026, 2, 1, 9, 30, 15, 123000)}}
+    token = encode_cursor(doc)
+    assert "=" not in token
+    assert decode_cursor(token) == {"$or": [
+        {"timestamps.created_at": {"$lt": doc["timestamps"]["created_at"]}},
+        {"timestamps.created_at": doc["timestamps"]["created_at"], "_id": {"$lt": doc["_id"]}},
+        {"timestamps.created_at": None},
+    ]}
+
+
+def test_cursor_round_trip_without_created_at():
+    doc = {"_id": ObjectId(), "timestamps": {}}
+    assert decode_cursor(encode_cursor(doc)) == {"timestamps.created_at": None, "_id": {"$lt": doc["_id"]}}
+
+
+def _token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not a cursor",
+    _token({"t": None}),
+    _token({"t": None, "id": "nope"}),
+    _token({"t": "yesterday", "id": str(ObjectId())}),
+])
+def test_invalid_cursor_is_rejected(token):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [1, 7, 25])
+def test_cursor_pages_cover_the_listing_once(seeded_db, request_docs, limit):
+    undated = [{"_id": ObjectId(), "status": "new", "timestamps": {}} for _ in range(3)]
+    seeded_db["service_requests"].insert_many(undated)
+    expected = [doc["_id"] for doc in seeded_db["service_requests"].find({}, {"_id": 1}).sort(REQUEST_LIST_SORT)]
+
+    seen, query = [], {}
+    while True:
+        page = list(seeded_db["service_requests"].find(query).sort(REQUEST_LIST_SORT).limit(limit))
+        seen.extend(doc["_id"] for doc in page)
+        if len(page) < limit:
+            break
+        query = decode_cursor(encode_cursor(page[-1]))
+
+    assert seen == expected
+    assert len(seen) == len(request_docs) + len(undated)
+
+
+def list_page(run, **params):
+    response = Response()
+    args = {"status": None, "category": None, "zone_id": None, "agent_id": None,
+            "cursor": None, "fields": None, "skip": 0, "limit": 100, **params}
+    body = run(get_requests(response, **args))
+    return body, response.headers.get("X-Next-Cursor")
+
+
+def test_full_last_page_has_no_next_cursor(seeded_db, request_docs, run):
+    limit = len(request_docs) // 2
+    first, cursor = list_page(run, limit=limit)
+    assert len(first) == limit and cursor
+    second, cursor = list_page(run, limit=limit, cursor=cursor)
+    assert len(second) == limit
+    assert cursor is None
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers.requests import (
+    LIST_PROJECTION,
+    RESPONSE_FIELDS,
+    build_projection,
+    get_request,
+    parse_fields,
+    sparse_doc,
+)
+from tests.test_request_cursor import list_page
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("") is None
+    assert parse_fields(" status, _id,,priority ") == ["status", "priority"]
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        parse_fields("status,evidence,internal_notes")
+    assert error.value.status_code == 400
+    assert error.value.detail == "Unknown fields: evidence, internal_notes"
+
+
+def test_default_projection_is_the_rendered_fields():
+    assert build_projection(None) == LIST_PROJECTION
+    assert set(LIST_PROJECTION) == set(RESPONSE_FIELDS)
+    assert not {"evidence", "internal_notes", "workflow", "citizen_ref"} & set(LIST_PROJECTION)
+
+
+def test_selected_projection_keeps_the_cursor_key():
+    assert build_projection(["status"]) == {"status": 1, "timestamps.created_at": 1}
+    assert build_projection(["status", "timestamps"]) == {"status": 1, "timestamps": 1}
+
+
+def test_sparse_doc_returns_id_and_selected_fields_only(request_docs):
+    doc = {**request_docs[0], "evidence": [{"url": "/uploads/x.jpg"}]}
+    assert sparse_doc(doc, ["status", "category"]) == {
+        "_id": str(doc["_id"]),
+        "status": doc["status"],
+        "category": doc["category"],
+    }
+
+
+def test_listing_with_fields_reads_only_those(seeded_db, request_docs, run):
+    seeded_db["service_requests"].update_many({}, {"$set": {"internal_notes": "staff only"}})
+    response, _ = list_page(run, fields="status,priority", limit=5)
+    body = json.loads(response.body)
+    assert len(body) == 5
+    assert all(set(row) == {"_id", "status", "priority"} for row in body)
+
+    full, _ = list_page(run, limit=5)
+    assert all(set(row) == {"_id", *RESPONSE_FIELDS} for row in full)
+
+
+def test_single_request_with_fields(seeded_db, request_docs, run):
+    doc = request_docs[0]
+    response = run(get_request(str(doc["_id"]), fields="category"))
+    assert json.loads(response.body) == {"_id": str(doc["_id"]), "category": doc["category"]}
@@ -0,0 +1,251 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import Decimal128
+from pymongo import UpdateOne
+
+from app import rollups
+from app.rollups import (
+    naive_utc,
+    rebuild_rollups,
+    rollup_contribution,
+    rollup_ops,
+    sla_threshold_hours,
+    split_range,
+)
+from app.routers import analytics
+
+MS = timedelta(milliseconds=1)
+
+
+def covered(start, end):
+    """Every range split_range returns, as one sorted list of (lo, hi)."""
+    raw, hours, day = split_range(start, end)
+    return sorted(raw + hours + ([day] if day else []), key=lambda r: r[0] or datetime.min)
+
+
+def test_split_range_unbounded_is_all_days():
+    assert split_range(None, None) == ([], [], (None, None))
+
+
+def test_split_range_inside_one_hour_is_raw():
+    start, end = datetime(2026, 1, 1, 10, 5), datetime(2026, 1, 1, 10, 55)
+    assert split_range(start, end) == ([(start, end + MS)], [], None)
+
+
+def test_split_range_whole_hours_inside_one_day():
+    start, end = datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 13) - MS
+    assert split_range(start, end) == ([], [(start, datetime(2026, 1, 1, 13))], None)
+
+
+def test_split_range_across_days():
+    start, end = datetime(2026, 1, 1, 10, 30), datetime(2026, 1, 3, 5, 15)
+    raw, hours, day = split_range(start, end)
+    assert raw == [(start, datetime(2026, 1, 1, 11)), (datetime(2026, 1, 3, 5), end + MS)]
+    assert hours == [(datetime(2026, 1, 1, 11), datetime(2026, 1, 2)), (datetime(2026, 1, 3), datetime(2026, 1, 3, 5))]
+    assert day == (datetime(2026, 1, 2), datetime(2026, 1, 3))
+
+
+def test_split_range_open_ended():
+    start = datetime(2026, 1, 1, 10, 30)
+    assert split_range(start, None) == (
+        [(start, datetime(2026, 1, 1, 11))],
+        [(datetime(2026, 1, 1, 11), datetime(2026, 1, 2))],
+        (datetime(2026, 1, 2), None),
+    )
+    end = datetime(2026, 1, 1, 10, 30)
+    assert split_range(None, end) == (
+        [(datetime(2026, 1, 1, 10), end + MS)],
+        [(datetime(2026, 1, 1), datetime(2026, 1, 1, 10))],
+        (None, datetime(2026, 1, 1)),
+    )
+
+
+def test_split_range_end_is_inclusive_to_the_millisecond():
+    end = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    raw, _, _ = split_range(datetime(2026, 1, 1, 11, 59), end)
+    assert raw[-1][1] == datetime(2026, 1, 1, 12, 0, 0, 124000)
+
+
+def test_split_range_tiles_the_interval_exactly():
+    rng = random.Random(5)
+    base = datetime(2026, 1, 1)
+    for _ in range(500):
+        start = base + timedelta(minutes=rng.randint(0, 60 * 24 * 10), milliseconds=rng.randint(0, 999))
+        end = start + timedelta(minutes=rng.randint(0, 60 * 24 * 5), milliseconds=rng.randint(0, 999))
+        ranges = covered(start, end)
+        assert ranges[0][0] == start
+        assert ranges[-1][1] == end + MS
+        for (_, hi), (lo, _) in zip(ranges, ranges[1:]):
+            assert hi == lo
+
+
+def test_naive_utc_converts_aware_values():
+    aware = datetime(2026, 1, 1, 2, 30, tzinfo=timezone(timedelta(hours=3)))
+    assert naive_utc(aware) == datetime(2025, 12, 31, 23, 30)
+    assert naive_utc(datetime(2026, 1, 1)) == datetime(2026, 1, 1)
+    assert naive_utc(None) is None
+
+
+def test_mixed_aware_and_naive_bounds_split_cleanly():
+    start = analytics._parse_date("2026-01-01T10:30:00Z")
+    end = analytics._parse_date("2026-02-01")
+    assert start.tzinfo is None
+    assert covered(start, end)[0][0] == datetime(2026, 1, 1, 10, 30)
+
+
+CREATED = datetime(2026, 1, 1, 10, 45)
+
+
+def request(status="new", resolved_hours=None, threshold=24, zone="ZONE-N-03"):
+    timestamps = {"created_at": CREATED}
+    if resolved_hours is not None:
+        timestamps["resolved_at"] = CREATED + timedelta(hours=resolved_hours)
+    return {
+        "category": "pothole",
+        "status": status,
+        "location": {"zone_id": zone},
+        "timestamps": timestamps,
+        "sla_policy": {"breach_threshold_hours": threshold},
+    }
+
+
+def test_contribution_of_an_open_request_is_its_count():
+    assert rollup_contribution(request()) == (
+        {"category": "pothole", "zone_id": "ZONE-N-03", "status": "new"},
+        CREATED,
+        {"count": 1, "resolution_count": 0, "resolution_hours": 0.0, "sla_breached": 0},
+    )
+
+
+def test_contribution_of_a_resolved_request():
+    _, _, metrics = rollup_contribution(request("resolved", resolved_hours=30))
+    assert metrics == {"count": 1, "resolution_count": 1, "resolution_hours": 30.0, "sla_breached": 1}
+
+
+def test_resolved_at_on_an_open_status_counts_for_sla_only():
+    _, _, metrics = rollup_contribution(request("in_progress", resolved_hours=30))
+    assert metrics == {"count": 1, "resolution_count": 0, "resolution_hours": 0.0, "sla_breached": 1}
+
+
+def test_requests_without_created_at_contribute_nothing():
+    assert rollup_contribution(None) is None
+    assert rollup_contribution({"status": "new", "timestamps": {}}) is None
+    assert rollup_contribution({"status": "new", "timestamps": {"created_at": "2026-01-01"}}) is None
+
+
+def bucket(granularity, at, status, inc):
+    return UpdateOne(
+        {"granularity": granularity, "bucket": at, "category": "pothole", "zone_id": "ZONE-N-03", "status": status},
+        {"$inc": inc},
+        upsert=True,
+    )
+
+
+def test_status_change_moves_the_request_between_buckets():
+    before, after = request("in_progress"), request("resolved", resolved_hours=2)
+    hour, day = datetime(2026, 1, 1, 10), datetime(2026, 1, 1)
+    resolved = {"count": 1, "resolution_count": 1, "resolution_hours": 2.0}
+    assert rollup_ops([(before, after)]) == [
+        bucket("hour", hour, "in_progress", {"count": -1}),
+        bucket("day", day, "in_progress", {"count": -1}),
+        bucket("hour", hour, "resolved", resolved),
+        bucket("day", day, "resolved", resolved),
+    ]
+
+
+def test_unchanged_contribution_writes_nothing():
+    doc = request("resolved", resolved_hours=2)
+    assert rollup_ops([(doc, {**doc, "title": "renamed"})]) == []
+    assert rollup_ops([(None, doc), (doc, None)]) == []
+
+
+@pytest.mark.parametrize("threshold, hours", [
+    (None, None),
+    (float("nan"), None),
+    (24, 24.0),
+    (1.5, 1.5),
+    (Decimal128("36"), 36.0),
+    (Decimal128("NaN"), None),
+    ("48", float("inf")),
+    (True, float("inf")),
+    ({"hours": 1}, float("inf")),
+    ([1], float("inf")),
+])
+def test_sla_threshold_follows_mongo_type_order(threshold, hours):
+    assert sla_threshold_hours(threshold) == hours
+
+
+def test_non_numeric_thresholds_are_never_breached():
+    created = datetime(2026, 1, 1)
+    doc = {
+        "status": "resolved",
+        "timestamps": {"created_at": created, "resolved_at": created + timedelta(hours=10)},
+    }
+    breached = lambda policy: rollup_contribution({**doc, "sla_policy": policy})[2]["sla_breached"]
+    assert breached({"breach_threshold_hours": 1}) == 1
+    assert breached({"breach_threshold_hours": 12}) == 0
+    assert breached({}) == 1
+    assert breached(None) == 1
+    assert breached({"breach_threshold_hours": "1"}) == 0
+    assert breached({"breach_threshold_hours": False}) == 0
+
+
+FILTERS = [
+    {},
+    {"category": "pothole"},
+    {"zone": "ZONE-N-03"},
+    {"start_date": "2026-01-31T03:17:00", "end_date": "2026-02-02T19:40:00.250"},
+    {"start_date": "2026-01-31T05:00:00+02:00", "end_date": "2026-02-02"},
+    {"category": "streetlight", "end_date": "2026-02-01T00:00:00"},
+]
+
+
+def _match(filters):
+    return analytics._build_match(
+        filters.get("category"), filters.get("zone"), filters.get("start_date"), filters.get("end_date")
+    )
+
+
+def _sorted_hotspots(cohorts):
+    return {**cohorts, "hotspots": sorted(cohorts["hotspots"], key=lambda h: (-h["count"], str(h["zone_id"])))}
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_rollups_match_aggregation_pipeline(seeded_db, run, filters):
+    match = _match(filters)
+    raw_kpis = run(analytics._compute_kpis(match))
+    raw_cohorts = run(analytics._compute_cohorts(match))
+
+    rebuild_rollups(seeded_db)
+    rollups._built = False
+    assert run(rollups.rollups_ready())
+    rolled_kpis = run(analytics._compute_kpis(match))
+    rolled_cohorts = run(analytics._compute_cohorts(match))
+
+    assert rolled_kpis["backlog"] == raw_kpis["backlog"]
+    assert rolled_kpis["avg_resolution_hours"] == pytest.approx(raw_kpis["avg_resolution_hours"])
+    assert rolled_kpis["sla_breach_rate"] == pytest.approx(raw_kpis["sla_breach_rate"])
+    assert _sorted_hotspots(rolled_cohorts) == _sorted_hotspots(raw_cohorts)
+
+
+def test_no_rollup_writes_once_upkeep_stops(monkeypatch, request_docs, run):
+    monkeypatch.setattr(rollups, "_maintained", True)
+    monkeypatch.setattr(rollups, "analytics_rollups_collection", object())
+    rollups.stop_rollup_upkeep()
+    run(rollups.apply_rollup_changes([(None, request_docs[0])]))
+    assert not run(rollups.rollups_ready())
+
+
+def test_drop_rollups_removes_buckets_and_marker(monkeypatch, seeded_db, run):
+    monkeypatch.setattr(rollups, "_maintained", True)
+    monkeypatch.setattr(rollups, "_built", False)
+    assert rebuild_rollups(seeded_db)
+    assert run(rollups.rollups_ready())
+
+    rollups.stop_rollup_upkeep()
+    run(rollups.drop_rollups())
+    assert "analytics_rollups" not in seeded_db.list_collection_names()
+    rollups._maintained = True
+    assert not run(rollups.rollups_ready())
@@ -0,0 +1,91 @@
+import gzip
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.static_files import IMMUTABLE_CACHE_CONTROL, EvidenceStaticFiles, accepts_gzip
+
+SHA = "cd" * 32
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.5", True),
+    ("GZIP", True),
+    ("x-gzip", True),
+    ("*", True),
+    ("", False),
+    ("identity", False),
+    ("br", False),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000", False),
+    ("gzip;q=0, *", False),
+    ("*;q=0", False),
+    ("br, *;q=0.1", True),
+    ("gzip;q=abc", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+@pytest.fixture
+def client(tmp_path, run):
+    body = b"%PDF-1.4 evidence" * 100
+    (tmp_path / f"{SHA}.pdf").write_bytes(body)
+    (tmp_path / f"{SHA}.pdf.gz").write_bytes(gzip.compress(body))
+    app = FastAPI()
+    app.mount("/uploads", EvidenceStaticFiles(directory=str(tmp_path)))
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    yield lambda **headers: run(client.get(f"/uploads/{SHA}.pdf", headers=headers)), body
+    run(client.aclose())
+
+
+def test_gzip_variant_follows_accept_encoding(client):
+    get, body = client
+    zipped = get(**{"accept-encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] == f'"{SHA}.gz"'
+    assert zipped.content == body  # httpx decodes it
+
+    refused = get(**{"accept-encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in refused.headers
+    assert refused.headers["etag"] == f'"{SHA}"'
+    assert refused.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert refused.headers["vary"] == "Accept-Encoding"
+    assert refused.content == body
+
+
+def test_range_requests_get_identity_bytes(client):
+    get, body = client
+    partial = get(**{"accept-encoding": "gzip", "range": "bytes=0-9"})
+    assert partial.status_code == 206
+    assert "content-encoding" not in partial.headers
+    assert partial.content == body[:10]
+
+
+def test_matching_etag_is_not_modified(client):
+    get, _ = client
+    plain = get(**{"if-none-match": f'"{SHA}"', "accept-encoding": "identity"})
+    assert plain.status_code == 304
+    assert plain.content == b""
+    assert plain.headers["etag"] == f'"{SHA}"'
+
+    # The identity ETag does not validate the gzip variant.
+    assert get(**{"if-none-match": f'"{SHA}"', "accept-encoding": "gzip"}).status_code == 200
+    assert get(**{"if-none-match": f'"{SHA}.gz"', "accept-encoding": "gzip"}).status_code == 304
+
+
+def test_other_names_keep_the_default_etag(tmp_path, run):
+    (tmp_path / "legacy.pdf").write_bytes(b"%PDF-1.4 legacy")
+    app = FastAPI()
+    app.mount("/uploads", EvidenceStaticFiles(directory=str(tmp_path)))
+
+    async def fetch():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/uploads/legacy.pdf")
+    response = run(fetch())
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["etag"] and SHA not in response.headers["etag"]
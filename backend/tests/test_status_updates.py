@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.routers.requests import (
+    ALLOWED_FROM,
+    OPEN_REQUEST_STATUSES,
+    add_milestone,
+    apply_set,
+    transition_request,
+    update_status,
+)
+
+
+def test_closed_is_terminal():
+    assert all("closed" not in allowed for allowed in ALLOWED_FROM.values())
+    assert "closed" not in OPEN_REQUEST_STATUSES
+
+
+def test_open_statuses_may_be_re_entered_but_resolved_may_not():
+    for status in ("new", "triaged", "assigned", "in_progress"):
+        assert status in ALLOWED_FROM[status]
+    assert "resolved" not in ALLOWED_FROM["resolved"]
+    assert "resolved" in ALLOWED_FROM["closed"]
+    assert "resolved" in ALLOWED_FROM["new"]
+
+
+def test_apply_set_follows_dotted_paths_without_touching_the_original():
+    doc = {"status": "new", "timestamps": {"created_at": 1}}
+    after = apply_set(doc, {"status": "resolved", "timestamps.resolved_at": 2, "assignment.agent": "a"})
+    assert after == {
+        "status": "resolved",
+        "timestamps": {"created_at": 1, "resolved_at": 2},
+        "assignment": {"agent": "a"},
+    }
+    assert doc == {"status": "new", "timestamps": {"created_at": 1}}
+
+
+def status_code(run, coroutine):
+    with pytest.raises(HTTPException) as error:
+        run(coroutine)
+    return error.value.status_code
+
+
+def open_request(request_docs):
+    doc = next(doc for doc in request_docs if doc["status"] == "new")
+    return doc["_id"], str(doc["_id"])
+
+
+def test_second_resolve_is_a_conflict_and_keeps_resolved_at(seeded_db, request_docs, run):
+    oid, request_id = open_request(request_docs)
+    run(update_status(request_id, {"status": "resolved"}, None))
+    resolved_at = seeded_db["service_requests"].find_one({"_id": oid})["timestamps"]["resolved_at"]
+
+    assert status_code(run, update_status(request_id, {"status": "resolved"}, None)) == 409
+    assert status_code(run, add_milestone(request_id, {"type": "resolved"}, None)) == 409
+    assert seeded_db["service_requests"].find_one({"_id": oid})["timestamps"]["resolved_at"] == resolved_at
+
+
+def test_repeated_open_updates_succeed(seeded_db, request_docs, run):
+    oid, request_id = open_request(request_docs)
+    for _ in range(2):
+        run(update_status(request_id, {"status": "in_progress"}, None))
+        run(add_milestone(request_id, {"type": "arrived"}, None))
+    assert seeded_db["service_requests"].find_one({"_id": oid})["status"] == "in_progress"
+
+
+def test_closed_requests_refuse_every_transition(seeded_db, request_docs, run):
+    oid, request_id = open_request(request_docs)
+    run(transition_request(request_id, {"new_state": "closed"}))
+    for state in ALLOWED_FROM:
+        assert status_code(run, transition_request(request_id, {"new_state": state})) == 409
+    assert status_code(run, add_milestone(request_id, {"type": "progress"}, None)) == 409
+    assert seeded_db["service_requests"].find_one({"_id": oid})["status"] == "closed"
+
+
+def test_missing_request_is_not_found(seeded_db, run):
+    assert status_code(run, update_status(str(ObjectId()), {"status": "closed"}, None)) == 404
+
+
+def test_concurrent_resolves_apply_once(seeded_db, request_docs, run):
+    _, request_id = open_request(request_docs)
+
+    async def resolve_twice():
+        return await asyncio.gather(
+            *(update_status(request_id, {"status": "resolved"}, None) for _ in range(2)),
+            return_exceptions=True,
+        )
+    results = run(resolve_twice())
+    conflicts = [r for r in results if isinstance(r, HTTPException)]
+    assert len(conflicts) == 1 and conflicts[0].status_code == 409
@@ -0,0 +1,59 @@
+import pytest
+
+from app import tiles
+from app.tiles import encode_polyline, invalidate_request_tiles, tile_bounds, tile_for, tiles_containing
+
+Z = 12
+WEST, SOUTH, EAST, NORTH = tile_bounds(Z, 2456, 1655)
+
+
+def test_encode_polyline_matches_the_reference_encoding():
+    # Google's documented example, given here as (lng, lat).
+    points = [(-120.2, 38.5), (-120.95, 40.7), (-126.453, 43.252)]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_tile_for_is_inside_tile_bounds():
+    for lng, lat in [(35.9, 31.95), (-0.1, 51.5), (179.9, -85), (-180, 85)]:
+        for z in (0, 5, Z, 22):
+            x, y = tile_for(lng, lat, z)
+            west, south, east, north = tile_bounds(z, x, y)
+            assert west <= lng <= east
+            assert south <= max(min(lat, tiles.MAX_MERCATOR_LAT), -tiles.MAX_MERCATOR_LAT) <= north
+
+
+def test_tiles_containing_includes_tiles_sharing_an_edge():
+    middle = (SOUTH + NORTH) / 2
+    assert tiles_containing((WEST + EAST) / 2, middle, Z) == [(2456, 1655)]
+    assert tiles_containing(EAST, middle, Z) == [(2456, 1655), (2457, 1655)]
+    assert tiles_containing(WEST, NORTH, Z) == [(2455, 1654), (2455, 1655), (2456, 1654), (2456, 1655)]
+
+
+def test_edge_change_drops_both_tiles(monkeypatch, run):
+    cache = tiles.ResultCache(ttl=60, stale=0)
+    monkeypatch.setattr(tiles, "tile_cache", cache)
+    renders = []
+
+    async def render(key):
+        renders.append(key)
+        return key
+
+    keys = [(Z, x, 1655, ("new",), None, None) for x in (2455, 2456, 2457, 2458)]
+    for key in keys:
+        run(cache.get(key, lambda: render(key)))
+
+    dropped = invalidate_request_tiles([(None, {"location": {"coordinates": [EAST, (SOUTH + NORTH) / 2]}})])
+    for key in keys:
+        run(cache.get(key, lambda: render(key)))
+
+    assert dropped == 2
+    assert renders == keys + keys[1:3]
+
+
+def test_edge_point_is_served_by_both_tiles(seeded_db, run):
+    seeded_db["service_requests"].insert_one(
+        {"status": "new", "category": "pothole", "location": {"type": "Point", "coordinates": [EAST, (SOUTH + NORTH) / 2]}}
+    )
+    for x in (2456, 2457):
+        tile = run(tiles.render_tile(Z, x, 1655, ("new",), "pothole", None))
+        assert tile["count"] == 1
@@ -0,0 +1,83 @@
+from collections import Counter
+
+import pytest
+from bson import ObjectId
+
+from app import workload
+from app.dispatch import OPEN_WORKLOAD_STATUSES, fill_missing_workloads
+from app.routers.requests import update_status
+from app.workload import apply_workload_change, backfill_workloads, reconcile_workloads, workload_owner
+from tests.conftest import AGENTS
+
+
+def request(status, agent_id="a1"):
+    return {"status": status, "assignment": {"assigned_agent_id": agent_id}}
+
+
+def test_workload_owner_counts_open_assigned_requests_only():
+    assert workload_owner(request("assigned")) == "a1"
+    assert workload_owner(request("in_progress")) == "a1"
+    assert workload_owner(request("new")) is None
+    assert workload_owner(request("resolved")) is None
+    assert workload_owner(request("assigned", None)) is None
+    assert workload_owner({"status": "assigned"}) is None
+    assert workload_owner(None) is None
+
+
+def expected_workloads(request_docs):
+    return Counter(
+        doc["assignment"]["assigned_agent_id"]
+        for doc in request_docs
+        if doc["status"] in OPEN_WORKLOAD_STATUSES and doc.get("assignment")
+    )
+
+
+def test_missing_counters_are_counted_from_requests(seeded_db, request_docs, run):
+    agents = list(seeded_db["service_agents"].find({}))
+    agents[0]["open_workload"] = 99
+    run(fill_missing_workloads(agents))
+
+    expected = expected_workloads(request_docs)
+    assert agents[0]["open_workload"] == 99
+    for agent in agents[1:]:
+        assert agent["open_workload"] == expected[str(agent["_id"])]
+
+
+def test_backfill_only_runs_while_counters_are_missing(seeded_db, request_docs):
+    expected = expected_workloads(request_docs)
+    assert backfill_workloads(seeded_db) == len(AGENTS)
+    stored = {str(agent["_id"]): agent["open_workload"] for agent in seeded_db["service_agents"].find({})}
+    assert stored == {str(agent): expected[str(agent)] for agent in AGENTS}
+
+    seeded_db["service_agents"].update_one({"_id": AGENTS[0]}, {"$inc": {"open_workload": 5}})
+    assert backfill_workloads(seeded_db) == 0
+    assert reconcile_workloads(seeded_db) == 1
+
+
+@pytest.mark.parametrize("before, after, calls", [
+    (None, request("assigned"), [("a1", 1)]),
+    (request("assigned"), request("in_progress"), []),
+    (request("in_progress"), request("resolved"), [("a1", -1)]),
+    (request("assigned"), request("assigned", "a2"), [("a1", -1), ("a2", 1)]),
+    (request("new", None), request("new", None), []),
+    (request("in_progress"), None, [("a1", -1)]),
+])
+def test_change_moves_the_request_between_counters(monkeypatch, run, before, after, calls):
+    adjusted = []
+
+    async def record(agent_id, delta):
+        adjusted.append((agent_id, delta))
+    monkeypatch.setattr(workload, "adjust_workload", record)
+    run(apply_workload_change(before, after))
+    assert adjusted == calls
+
+
+def test_status_updates_keep_counters_in_step(seeded_db, request_docs, run):
+    backfill_workloads(seeded_db)
+    doc = next(d for d in request_docs if d["status"] == "assigned" and d.get("assignment"))
+    agent_id = ObjectId(doc["assignment"]["assigned_agent_id"])
+    before = seeded_db["service_agents"].find_one({"_id": agent_id})["open_workload"]
+
+    run(update_status(str(doc["_id"]), {"status": "resolved"}, None))
+    assert seeded_db["service_agents"].find_one({"_id": agent_id})["open_workload"] == before - 1
+    assert reconcile_workloads(seeded_db) == 0
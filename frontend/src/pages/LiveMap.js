@@ -1,49 +1,144 @@
-import React, { useEffect, useState, useMemo } from "react";
-import { MapContainer, TileLayer, CircleMarker, Tooltip } from "react-leaflet";
+import React, { useCallback, useEffect, useRef, useState } from "react";
+import {
+  MapContainer,
+  TileLayer,
+  CircleMarker,
+  Tooltip,
+  useMapEvents,
+} from "react-leaflet";
 import "leaflet/dist/leaflet.css";
-import { analyticsAPI } from "../services/api";
+import { tilesAPI } from "../services/api";
 
-function bucketPoints(features) {
-  const buckets = new Map();
-  features.forEach((f) => {
-    const [lng, lat] = f.geometry.coordinates;
-    const key = `${lat.toFixed(2)}|${lng.toFixed(2)}`;
-    const existing = buckets.get(key) || { lat, lng, weight: 0, items: [] };
-    existing.weight += f.properties.weight || 1;
-    existing.items.push(f);
-    buckets.set(key, existing);
+// Tiles fetched in the last TILE_TTL_MS are reused while panning around.
+const TILE_TTL_MS = 30000;
+
+function decodePolyline(encoded, precision = 5) {
+  const factor = Math.pow(10, precision);
+  const points = [];
+  let index = 0;
+  let lat = 0;
+  let lng = 0;
+  while (index < encoded.length) {
+    const deltas = [];
+    for (let i = 0; i < 2; i += 1) {
+      let shift = 0;
+      let result = 0;
+      let byte;
+      do {
+        byte = encoded.charCodeAt(index) - 63;
+        index += 1;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+    }
+    lat += deltas[0];
+    lng += deltas[1];
+    points.push([lat / factor, lng / factor]);
+  }
+  return points;
+}
+
+function tileX(lng, z) {
+  return Math.floor(((lng + 180) / 360) * Math.pow(2, z));
+}
+
+function tileY(lat, z) {
+  const clamped = Math.max(Math.min(lat, 85.0511), -85.0511);
+  const rad = (clamped * Math.PI) / 180;
+  return Math.floor(
+    ((1 - Math.log(Math.tan(rad) + 1 / Math.cos(rad)) / Math.PI) / 2) *
+      Math.pow(2, z)
+  );
+}
+
+function visibleTiles(map) {
+  const z = Math.max(0, Math.min(22, Math.round(map.getZoom())));
+  const bounds = map.getBounds();
+  const max = Math.pow(2, z) - 1;
+  const clamp = (v) => Math.max(0, Math.min(max, v));
+  const keys = [];
+  const west = clamp(tileX(bounds.getWest(), z));
+  const east = clamp(tileX(bounds.getEast(), z));
+  const north = clamp(tileY(bounds.getNorth(), z));
+  const south = clamp(tileY(bounds.getSouth(), z));
+  for (let x = west; x <= east; x += 1) {
+    for (let y = north; y <= south; y += 1) {
+      keys.push(`${z}/${x}/${y}`);
+    }
+  }
+  return keys;
+}
+
+function ViewportWatcher({ onChange }) {
+  const map = useMapEvents({
+    moveend: () => onChange(map),
   });
-  return Array.from(buckets.values());
+  useEffect(() => {
+    onChange(map);
+  }, [map, onChange]);
+  return null;
 }
 
 function LiveMap() {
   const [filters, setFilters] = useState({ category: "", zone: "" });
-  const [features, setFeatures] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const [tiles, setTiles] = useState([]);
+  const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
+  const cache = useRef(new Map());
+  const latestLoad = useRef(0);
 
-  const loadHeat = async () => {
-    setLoading(true);
-    setError("");
-    try {
+  const loadTiles = useCallback(
+    async (map) => {
+      const load = ++latestLoad.current;
       const params = {};
       if (filters.category) params.category = filters.category;
       if (filters.zone) params.zone = filters.zone;
-      const res = await analyticsAPI.heatmap(params);
-      setFeatures(res.data.features || []);
-    } catch (err) {
-      console.error(err);
-      setError("Failed to load map data");
-    } finally {
-      setLoading(false);
-    }
-  };
-
-  useEffect(() => {
-    loadHeat();
-  }, [filters.category, filters.zone]);
+      const prefix = JSON.stringify(params);
+      const now = Date.now();
+      cache.current.forEach((tile, key) => {
+        if (now - tile.fetchedAt > TILE_TTL_MS) cache.current.delete(key);
+      });
+      const missing = visibleTiles(map).filter(
+        (key) => !cache.current.has(`${prefix}|${key}`)
+      );
+      setError("");
+      if (missing.length) {
+        setLoading(true);
+        try {
+          await Promise.all(
+            missing.map(async (key) => {
+              const [z, x, y] = key.split("/");
+              const res = await tilesAPI.get(z, x, y, params);
+              const tile = res.data;
+              cache.current.set(`${prefix}|${key}`, {
+                fetchedAt: Date.now(),
+                ...tile,
+                points: decodePolyline(tile.geometry, tile.precision),
+              });
+            })
+          );
+        } catch (err) {
+          console.error(err);
+          setError("Failed to load map data");
+        } finally {
+          setLoading(false);
+        }
+      }
+      // A newer pan, zoom or filter change supersedes this load.
+      if (load === latestLoad.current) {
+        setTiles(
+          visibleTiles(map)
+            .map((key) => cache.current.get(`${prefix}|${key}`))
+            .filter(Boolean)
+        );
+      }
+    },
+    [filters.category, filters.zone]
+  );
 
-  const grouped = useMemo(() => bucketPoints(features), [features]);
+  // A request on a shared tile edge comes back in both tiles; draw it once.
+  const drawn = new Set();
 
   return (
     <div className="container">
@@ -123,64 +218,75 @@ function LiveMap() {
       {error && <div className="error">{error}</div>}
       {loading && <div className="loading">Loading map...</div>}
 
-      {!loading && (
-        <div className="card">
-          <div className="map-container">
-            <MapContainer
-              center={[31.95, 35.21]}
-              zoom={12}
-              scrollWheelZoom
-              style={{ height: "100%", width: "100%" }}
-            >
-              <TileLayer
-                attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OSM</a> contributors'
-                url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
-              />
-              {grouped.map((b, idx) => {
-                const radius = Math.min(40, 6 + b.weight * 2);
-                const opacity = Math.min(0.85, 0.25 + b.weight * 0.05);
+      <div className="card">
+        <div className="map-container">
+          <MapContainer
+            center={[31.95, 35.21]}
+            zoom={12}
+            scrollWheelZoom
+            style={{ height: "100%", width: "100%" }}
+          >
+            <TileLayer
+              attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OSM</a> contributors'
+              url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
+            />
+            <ViewportWatcher onChange={loadTiles} />
+            {tiles.map((tile) =>
+              tile.points.map((point, idx) => {
+                if (tile.kind === "clusters") {
+                  const count = tile.counts[idx];
+                  const radius = Math.min(40, 6 + Math.sqrt(count) * 3);
+                  return (
+                    <CircleMarker
+                      key={`${tile.z}/${tile.x}/${tile.y}/${idx}`}
+                      center={point}
+                      radius={radius}
+                      pathOptions={{
+                        color: "#ef4444",
+                        fillColor: "#ef4444",
+                        fillOpacity: Math.min(0.85, 0.25 + count * 0.01),
+                        opacity: 0.7,
+                      }}
+                    >
+                      <Tooltip direction="top" offset={[0, -radius]}>
+                        <div style={{ fontWeight: 600 }}>
+                          Cluster ({count})
+                        </div>
+                      </Tooltip>
+                    </CircleMarker>
+                  );
+                }
+                if (drawn.has(tile.ids[idx])) return null;
+                drawn.add(tile.ids[idx]);
                 return (
                   <CircleMarker
-                    key={idx}
-                    center={[b.lat, b.lng]}
-                    radius={radius}
+                    key={tile.ids[idx]}
+                    center={point}
+                    radius={6}
                     pathOptions={{
                       color: "#ef4444",
                       fillColor: "#ef4444",
-                      fillOpacity: opacity,
+                      fillOpacity: 0.6,
                       opacity: 0.7,
                     }}
                   >
-                    <Tooltip direction="top" offset={[0, -radius]}>
-                      <div style={{ minWidth: "180px" }}>
-                        <div style={{ fontWeight: 600 }}>
-                          Cluster ({b.items.length})
-                        </div>
-                        {b.items.slice(0, 4).map((f) => (
-                          <div
-                            key={f.properties.request_id}
-                            style={{ fontSize: "0.85rem" }}
-                          >
-                            {f.properties.category} – {f.properties.priority} –{" "}
-                            {f.properties.status}
-                          </div>
-                        ))}
-                        {b.items.length > 4 && (
-                          <div>+{b.items.length - 4} more</div>
-                        )}
+                    <Tooltip direction="top" offset={[0, -6]}>
+                      <div style={{ fontSize: "0.85rem" }}>
+                        {tile.category[idx]} – {tile.priority[idx]} –{" "}
+                        {tile.status[idx]}
                       </div>
                     </Tooltip>
                   </CircleMarker>
                 );
-              })}
-            </MapContainer>
-          </div>
-          <p style={{ color: "#6b7280", marginTop: "0.5rem" }}>
-            Bubbles scale by weight (priority × age). Bucketing approximates
-            clustering without extra plugins.
-          </p>
+              })
+            )}
+          </MapContainer>
         </div>
-      )}
+        <p style={{ color: "#6b7280", marginTop: "0.5rem" }}>
+          Only the visible map tiles are loaded. Zoomed out, bubbles are
+          server-side clusters sized by request count.
+        </p>
+      </div>
     </div>
   );
 }
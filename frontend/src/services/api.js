@@ -106,4 +106,8 @@ export const analyticsAPI = {
   agents: (params = {}) => api.get("/analytics/agents", { params }),
 };
 
+export const tilesAPI = {
+  get: (z, x, y, params = {}) => api.get(`/tiles/${z}/${x}/${y}`, { params }),
+};
+
 export default api;